@@ -1,5 +1,4 @@
-from flask import Flask, request, jsonify, render_template
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,16 +7,36 @@ from flask_cors import CORS
 import os
 import json
 import base64
+import hashlib
+import hmac
+import secrets
 from datetime import datetime
 import logging
+import math
 from werkzeug.utils import secure_filename
-import requests
-import google.generativeai as genai
-from PIL import Image
+from response_cache import ResponseCache
+from upload_ingest import UploadBuffer
+from image_preprocess import ImagePreprocessor
+from models import db, init_db, create_tables, find_upload_analysis, save_file_upload, get_file_upload, update_upload_analysis, list_sessions, get_session_history, user_has_data
+from data_export import export_stream
+from job_queue import JobQueue
+from message_writer import MessageWriter
+from telemetry import TelemetryRecorder, gemini_usage
+from context_builder import ContextBuilder, estimate_tokens, extractive_summary, format_turn, render_context
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from circuit_breaker import ProviderRouter
+from single_flight import SingleFlight, FlightTimeout
+from rate_limit import RateLimiter, ConcurrencyLimiter, MemoryBucketStore, SQLiteBucketStore, parse_limit, retry_after_header
+from providers import ProviderRegistry
+from prompt_templates import Prompt, PromptTemplates
+from json_provider import FastJSONProvider
 import io
-import webbrowser
 import threading
 import time
+import asyncio
+import atexit
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,21 +45,29 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Encode responses with orjson when it is installed (see json_provider.py); history
+# routes then embed stored JSON columns in responses as they are, without decoding them
+FAST_JSON_ENABLED = os.environ.get('FAST_JSON_ENABLED', 'True').lower() == 'true'
+if FAST_JSON_ENABLED:
+    app.json = FastJSONProvider(app)
+
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+# Signs the chat session ids handed to clients; without SECRET_KEY a random key is used,
+# so session ids from before a restart start new sessions
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+
+# Database configuration
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///aarogyalink.db')
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Create upload directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Tables are created by warm_up(), so importing the app doesn't touch the database
+init_db(app)
 
 # API Keys Configuration
 TEACHABLE_API_KEY = os.environ.get('TEACHABLE_API_KEY', 'your-teachable-api-key-here')
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'your-gemini-api-key-here')
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-
 # Teachable API Configuration
 TEACHABLE_BASE_URL = "https://api.teachable.com/v1"  # Update with actual Teachable API URL
 TEACHABLE_HEADERS = {
@@ -48,6 +75,318 @@ TEACHABLE_HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Provider execution configuration
+# 'parallel' sends Gemini and Teachable requests concurrently and returns as soon as
+# the preferred provider answers; 'sequential' keeps the original one-after-the-other calls
+PROVIDER_EXECUTION_MODE = os.environ.get('PROVIDER_EXECUTION_MODE', 'parallel')
+PREFERRED_PROVIDER = os.environ.get('PREFERRED_PROVIDER', 'gemini')
+# Enough workers for both providers of every request admitted at once (see
+# PROVIDER_MAX_CONCURRENCY below), so admitted calls don't queue behind each other
+PROVIDER_MAX_WORKERS = int(os.environ.get('PROVIDER_MAX_WORKERS',
+                                          2 * int(os.environ.get('PROVIDER_MAX_CONCURRENCY', 64))))
+PROVIDER_DEADLINES = {
+    "gemini": float(os.environ.get('GEMINI_DEADLINE_SECONDS', 30)),
+    "teachable": float(os.environ.get('TEACHABLE_DEADLINE_SECONDS', 30))
+}
+# Gemini calls time out at their deadline, so a call nobody waits on anymore frees its
+# pool worker (Teachable's read timeout defaults to its deadline the same way)
+GEMINI_REQUEST_OPTIONS = {"timeout": PROVIDER_DEADLINES["gemini"]}
+
+# Per-provider circuit breakers: a provider whose recent calls mostly failed or were
+# slower than BREAKER_SLOW_CALL_SECONDS is skipped for BREAKER_OPEN_SECONDS, then probed.
+# Requests try the available providers in order of their recent p95 latency
+provider_router = ProviderRouter(
+    ["gemini", "teachable"],
+    preferred=PREFERRED_PROVIDER,
+    window=int(os.environ.get('BREAKER_WINDOW', 20)),
+    min_calls=int(os.environ.get('BREAKER_MIN_CALLS', 5)),
+    error_rate=float(os.environ.get('BREAKER_ERROR_RATE', 0.5)),
+    slow_call_seconds=float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 10)),
+    open_seconds=float(os.environ.get('BREAKER_OPEN_SECONDS', 30)),
+    half_open_probes=int(os.environ.get('BREAKER_HALF_OPEN_PROBES', 1))
+) if os.environ.get('CIRCUIT_BREAKER_ENABLED', 'True').lower() == 'true' else None
+
+# Concurrent requests whose fully built prompt (and image, for uploads) is identical
+# share one provider call; followers stop waiting after SINGLE_FLIGHT_TIMEOUT_SECONDS
+single_flight = SingleFlight(
+    timeout=float(os.environ.get('SINGLE_FLIGHT_TIMEOUT_SECONDS', max(PROVIDER_DEADLINES.values()) + 5))
+) if os.environ.get('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true' else None
+
+# Admission control for the routes that call providers: token buckets per route and
+# client (IP, plus X-User-ID when sent) answer 429 with Retry-After once a client runs
+# out, and at most PROVIDER_MAX_CONCURRENCY requests may be calling providers at once.
+# Limits are 'requests/seconds'; RATE_LIMIT_STORAGE=sqlite shares the buckets between
+# worker processes through the RATE_LIMIT_PATH file (e.g. on /dev/shm)
+RATE_LIMITS = {
+    '/api/chat': parse_limit(os.environ.get('RATE_LIMIT_CHAT', '30/60')),
+    '/api/chat/stream': parse_limit(os.environ.get('RATE_LIMIT_CHAT', '30/60')),
+    '/api/upload': parse_limit(os.environ.get('RATE_LIMIT_UPLOAD', '10/60'))
+}
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
+rate_limiter = RateLimiter(
+    RATE_LIMITS,
+    SQLiteBucketStore(os.environ.get('RATE_LIMIT_PATH', 'rate_limits.db'))
+    if os.environ.get('RATE_LIMIT_STORAGE', 'memory') == 'sqlite' else MemoryBucketStore()
+) if os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true' else None
+provider_concurrency = ConcurrencyLimiter(
+    int(os.environ.get('PROVIDER_MAX_CONCURRENCY', 64))
+) if os.environ.get('PROVIDER_CONCURRENCY_LIMIT_ENABLED', 'True').lower() == 'true' else None
+PROVIDER_BUSY_RETRY_AFTER_SECONDS = int(os.environ.get('PROVIDER_BUSY_RETRY_AFTER_SECONDS', 2))
+
+# Bounded pool shared by all requests for outbound provider calls. Calls are counted
+# from submission until they finish, including those no request is waiting on anymore,
+# so hedged calls are only sent while a worker is free for them
+provider_executor = ThreadPoolExecutor(max_workers=PROVIDER_MAX_WORKERS, thread_name_prefix='provider')
+provider_pool_lock = threading.Lock()
+provider_pool_calls = 0
+
+def submit_provider_call(call, hedge=False):
+    """Submit a call to the provider pool, or return None for a hedge when no worker is free"""
+    global provider_pool_calls
+    with provider_pool_lock:
+        if hedge and provider_pool_calls >= PROVIDER_MAX_WORKERS:
+            return None
+        provider_pool_calls += 1
+    future = provider_executor.submit(call)
+    future.add_done_callback(finish_provider_call)
+    return future
+
+def finish_provider_call(future):
+    global provider_pool_calls
+    with provider_pool_lock:
+        provider_pool_calls -= 1
+
+# Teachable connection settings, shared by the sync pool and the async client
+TEACHABLE_POOL_SIZE = int(os.environ.get('TEACHABLE_POOL_SIZE', PROVIDER_MAX_WORKERS))
+TEACHABLE_MAX_RETRIES = int(os.environ.get('TEACHABLE_MAX_RETRIES', 2))
+TEACHABLE_CONNECT_TIMEOUT = float(os.environ.get('TEACHABLE_CONNECT_TIMEOUT', 3.05))
+TEACHABLE_READ_TIMEOUT = float(os.environ.get('TEACHABLE_READ_TIMEOUT', PROVIDER_DEADLINES["teachable"]))
+
+# FAKE_PROVIDERS=True replaces Gemini and Teachable with offline stand-ins (see
+# fake_providers.py), configured by FAKE_PROVIDER_* or FAKE_GEMINI_* / FAKE_TEACHABLE_*
+FAKE_PROVIDERS = os.environ.get('FAKE_PROVIDERS', 'False').lower() == 'true'
+if FAKE_PROVIDERS:
+    from fake_providers import FakeProvider, FakeGeminiModel, FakeTeachableClient
+    fake_providers = {name: FakeProvider.from_env(name) for name in ("gemini", "teachable")}
+    logger.warning("FAKE_PROVIDERS is on: Gemini and Teachable calls are simulated")
+
+def build_gemini_model(system_instruction=None):
+    """Configure the Gemini SDK and build the model (imports the SDK on first use)"""
+    if FAKE_PROVIDERS:
+        return FakeGeminiModel(fake_providers["gemini"])
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel('gemini-1.5-flash', system_instruction=system_instruction)
+
+def build_teachable_client():
+    """Build the shared keep-alive connection pool for the Teachable LLM backend"""
+    if FAKE_PROVIDERS:
+        return FakeTeachableClient(fake_providers["teachable"])
+    from http_client import PooledHTTPClient
+    return PooledHTTPClient(
+        pool_size=TEACHABLE_POOL_SIZE,
+        max_retries=TEACHABLE_MAX_RETRIES,
+        backoff_factor=float(os.environ.get('TEACHABLE_RETRY_BACKOFF', 0.3)),
+        connect_timeout=TEACHABLE_CONNECT_TIMEOUT,
+        read_timeout=TEACHABLE_READ_TIMEOUT,
+        headers=TEACHABLE_HEADERS
+    )
+
+# Provider clients are built on first use (or by warm_up), so importing the app
+# doesn't load the Gemini SDK or requests
+providers = ProviderRegistry()
+providers.register("gemini", build_gemini_model)
+providers.register("teachable", build_teachable_client)
+
+# Prompts for every mode and language, compiled once. With system instructions on,
+# each template gets a Gemini model holding its preamble, and only the per-request
+# part of a prompt is sent as the message (the SDK still sends the system instruction
+# with every call); Teachable always gets the full prompt.
+prompt_templates = PromptTemplates()
+GEMINI_SYSTEM_INSTRUCTIONS = os.environ.get('GEMINI_SYSTEM_INSTRUCTIONS', 'True').lower() == 'true'
+
+def gemini_template_provider(key):
+    return "gemini:" + ":".join(key)
+
+if GEMINI_SYSTEM_INSTRUCTIONS:
+    for template in prompt_templates:
+        providers.register(gemini_template_provider(template.key),
+                           lambda system=template.system: build_gemini_model(system))
+
+# Cache of text query results keyed on (input source, language, normalized message)
+response_cache = ResponseCache(
+    ttl_seconds=float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 3600)),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+    path=os.environ.get('RESPONSE_CACHE_PATH') or None
+) if os.environ.get('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true' else None
+
+# Downscaling / re-encoding of uploaded images before they are sent to Gemini
+image_preprocessor = ImagePreprocessor(
+    max_edge=int(os.environ.get('IMAGE_MAX_EDGE', 1536)),
+    output_format=os.environ.get('IMAGE_OUTPUT_FORMAT', 'JPEG'),
+    quality=int(os.environ.get('IMAGE_QUALITY', 85))
+) if os.environ.get('IMAGE_PREPROCESSING_ENABLED', 'True').lower() == 'true' else None
+
+# Memo of upload analyses keyed on (content hash, description, language), backed by
+# FileUpload.analysis_results so duplicate uploads are answered after a restart too
+analysis_cache = ResponseCache(
+    ttl_seconds=float(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', 24 * 3600)),
+    max_entries=int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 1000)),
+    max_bytes=int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+)
+
+# Background analysis of uploads submitted in job mode; a full queue answers 429
+job_queue = JobQueue(
+    workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_depth=int(os.environ.get('JOB_QUEUE_DEPTH', 32))
+)
+JOB_MAX_WAIT_SECONDS = 30
+HISTORY_MAX_LIMIT = 100
+# Rows read per query when streaming a user's data export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+# The export endpoint is off unless a token is set; callers send it as "Authorization: Bearer <token>"
+EXPORT_ADMIN_TOKEN = os.environ.get('EXPORT_ADMIN_TOKEN') or None
+JOB_RETRY_AFTER_SECONDS = int(os.environ.get('JOB_RETRY_AFTER_SECONDS', 5))
+
+# Write-behind persistence of chat sessions and messages: requests only queue rows
+# and a background thread commits them in batches (flushed on shutdown)
+message_writer = MessageWriter(
+    app,
+    batch_size=int(os.environ.get('MESSAGE_BATCH_SIZE', 100)),
+    flush_interval=float(os.environ.get('MESSAGE_FLUSH_INTERVAL_SECONDS', 1.0)),
+    max_pending=int(os.environ.get('MESSAGE_MAX_PENDING', 10000))
+) if os.environ.get('CHAT_PERSISTENCE_ENABLED', 'True').lower() == 'true' else None
+if message_writer:
+    atexit.register(message_writer.close)
+
+# Per-call provider telemetry (latency, tokens, cost) buffered in memory and written to
+# ai_analysis_log in batches; prices are USD per million input / output tokens
+telemetry = TelemetryRecorder(
+    app,
+    capacity=int(os.environ.get('TELEMETRY_BUFFER_SIZE', 10000)),
+    batch_size=int(os.environ.get('TELEMETRY_BATCH_SIZE', 200)),
+    flush_interval=float(os.environ.get('TELEMETRY_FLUSH_INTERVAL_SECONDS', 2.0)),
+    prices={
+        "gemini": (float(os.environ.get('GEMINI_INPUT_COST_PER_MTOK', 0.075)),
+                   float(os.environ.get('GEMINI_OUTPUT_COST_PER_MTOK', 0.30))),
+        "teachable": (float(os.environ.get('TEACHABLE_INPUT_COST_PER_MTOK', 0)),
+                      float(os.environ.get('TEACHABLE_OUTPUT_COST_PER_MTOK', 0)))
+    }
+) if os.environ.get('TELEMETRY_ENABLED', 'True').lower() == 'true' else None
+if telemetry:
+    atexit.register(telemetry.close)
+
+# Prometheus metrics served on /metrics; request, provider and upload metrics are
+# updated in place and component stats are read when the endpoint is scraped
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+metrics = MetricsRegistry(prefix='aarogyalink_')
+http_requests = metrics.counter('http_requests_total', 'HTTP requests by route, method and status',
+                                ('route', 'method', 'status'))
+http_latency = metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route and method',
+                                 ('route', 'method'))
+http_in_flight = metrics.gauge('http_requests_in_flight', 'HTTP requests being handled', ('route',))
+provider_calls = metrics.counter('provider_calls_total', 'Provider calls by provider and outcome',
+                                 ('provider', 'outcome'))
+provider_latency = metrics.histogram('provider_call_duration_seconds', 'Provider call latency by provider and outcome',
+                                     ('provider', 'outcome'))
+provider_in_flight = metrics.gauge('provider_calls_in_flight', 'Provider calls in progress', ('provider',))
+provider_tokens = metrics.counter('provider_tokens_total', 'Tokens reported by providers', ('provider', 'kind'))
+provider_cost = metrics.counter('provider_cost_usd_total', 'Estimated provider cost in USD', ('provider',))
+upload_bytes = metrics.counter('upload_bytes_total', 'Bytes received in file uploads', ('type',))
+upload_files = metrics.counter('uploads_total', 'File uploads received', ('type',))
+admission_rejections = metrics.counter('admission_rejections_total', 'Requests answered 429 by admission control',
+                                       ('route', 'reason'))
+
+# Errors recorded for calls abandoned by the caller rather than failed by the provider
+CALL_CANCELLED = "Cancelled"
+STREAM_CLOSED = "Stream closed by client"
+
+def provider_allowed(service):
+    """Whether the provider's circuit breaker lets a call through right now"""
+    return provider_router is None or provider_router.allow(service)
+
+def provider_order(services):
+    """Order providers for a request, skipping any whose circuit is open"""
+    return provider_router.route(services) if provider_router else list(services)
+
+def start_provider_call(service):
+    """Mark a provider call as started, returning the ``time.perf_counter()`` start time"""
+    if METRICS_ENABLED:
+        provider_in_flight.inc(service)
+    return time.perf_counter()
+
+def record_provider_call(service, started, usage=None, error=None, input_data=None, output_data=None):
+    """Record a provider call in its circuit breaker, the metrics and the telemetry buffer
+
+    Never touches the database. Cancelled calls say nothing about the provider's
+    health, so they only give back a half-open probe.
+    """
+    elapsed = time.perf_counter() - started
+    cancelled = error in (CALL_CANCELLED, STREAM_CLOSED)
+    if provider_router is not None:
+        if cancelled:
+            provider_router.release(service)
+        else:
+            provider_router.record(service, elapsed, error is None)
+    if METRICS_ENABLED:
+        outcome = 'success' if error is None else 'cancelled' if cancelled else 'error'
+        provider_in_flight.dec(service)
+        provider_calls.inc(service, outcome)
+        provider_latency.observe(service, outcome, value=elapsed)
+        if usage:
+            provider_tokens.inc(service, 'prompt', amount=usage.get('prompt_tokens', 0))
+            provider_tokens.inc(service, 'output', amount=usage.get('output_tokens', 0))
+            if telemetry is not None:
+                provider_cost.inc(service, amount=telemetry.cost(service, usage))
+    if telemetry is not None:
+        telemetry.record(service, started, usage, error, input_data, output_data)
+
+def teachable_usage(response_json):
+    """Get token counts from a Teachable completion, if it reports them"""
+    usage = (response_json or {}).get("usage") or {}
+    if not isinstance(usage, dict) or not usage:
+        return {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0)
+    }
+
+# Conversation history sent with each chat message, kept within a token budget; older
+# turns are folded into ChatSession.symptoms_summary ('extractive' or 'gemini')
+CONTEXT_SUMMARIZER = os.environ.get('CONTEXT_SUMMARIZER', 'extractive')
+context_builder = ContextBuilder(
+    max_tokens=int(os.environ.get('CONTEXT_MAX_TOKENS', 1500)),
+    summary_tokens=int(os.environ.get('CONTEXT_SUMMARY_TOKENS', 300)),
+    max_messages=int(os.environ.get('CONTEXT_MAX_MESSAGES', 40)),
+    pending=message_writer.pending_messages
+) if message_writer and os.environ.get('CHAT_CONTEXT_ENABLED', 'True').lower() == 'true' else None
+
+# Async client for the ASGI serving mode, created on first use inside the event loop
+teachable_async_client = None
+
+def get_teachable_async_client():
+    """Get the shared async Teachable client, creating it on first use"""
+    global teachable_async_client
+    if teachable_async_client is None:
+        import httpx
+        teachable_async_client = httpx.AsyncClient(
+            headers=TEACHABLE_HEADERS,
+            timeout=httpx.Timeout(TEACHABLE_READ_TIMEOUT, connect=TEACHABLE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=TEACHABLE_POOL_SIZE),
+            transport=providers.get("teachable").async_transport() if FAKE_PROVIDERS
+                      else httpx.AsyncHTTPTransport(retries=TEACHABLE_MAX_RETRIES)
+        )
+    return teachable_async_client
+
+async def close_teachable_async_client():
+    """Close the async Teachable client on shutdown"""
+    global teachable_async_client
+    if teachable_async_client is not None:
+        await teachable_async_client.aclose()
+        teachable_async_client = None
+
 # Allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {
     # Images
@@ -64,6 +403,20 @@ def allowed_file(filename):
     extension = filename.rsplit('.', 1)[1].lower()
     return extension in ALLOWED_EXTENSIONS
 
+# Image formats Gemini accepts as-is; anything else is decoded and re-encoded by the SDK
+GEMINI_IMAGE_MIME_TYPES = {'image/png', 'image/jpeg', 'image/webp'}
+
+def gemini_image_part(image_data, mime_type=None):
+    """Build the Gemini content part for an uploaded image
+
+    Images already in a format Gemini accepts are sent as raw bytes, skipping the
+    decode/re-encode round trip the SDK does for PIL images.
+    """
+    if mime_type in GEMINI_IMAGE_MIME_TYPES:
+        return {"mime_type": mime_type, "data": bytes(image_data)}
+    from PIL import Image
+    return Image.open(io.BytesIO(image_data))
+
 def get_file_type(filename):
     """Determine if file is image or audio based on extension"""
     if '.' not in filename:
@@ -82,16 +435,38 @@ def get_file_type(filename):
         return 'unknown'
 
 class HealthCompanionAPI:
-    def __init__(self):
-        try:
-            # Initialize Gemini model
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini model: {e}")
-            self.gemini_model = None
+    @property
+    def gemini_model(self):
+        """The Gemini model, built on first use; None if it couldn't be initialized"""
+        return providers.get("gemini")
+
+    @gemini_model.setter
+    def gemini_model(self, model):
+        """Replace the Gemini model for every prompt, dropping the per-template models"""
+        providers.set("gemini", model)
+        if GEMINI_SYSTEM_INSTRUCTIONS:
+            for template in prompt_templates:
+                providers.set(gemini_template_provider(template.key), None)
+
+    def gemini_request(self, prompt):
+        """Get the Gemini model for a prompt and the text to send it
+
+        A templated prompt goes to its template's model, which already holds the
+        preamble as its system instruction, so only the per-request part is the message.
+        """
+        if GEMINI_SYSTEM_INSTRUCTIONS and isinstance(prompt, Prompt):
+            model = providers.get(gemini_template_provider(prompt.template))
+            if model:
+                return model, prompt.user
+        return self.gemini_model, str(prompt)
 
     def call_teachable_api(self, prompt, context=None):
         """Call Teachable's LLM API"""
+        if not provider_allowed("teachable"):
+            return None
+        
+        started = start_provider_call("teachable")
+        input_data = {"prompt_chars": len(prompt)}
         try:
             payload = {
                 "prompt": prompt,
@@ -100,114 +475,568 @@ class HealthCompanionAPI:
                 "temperature": 0.7
             }
             
-            response = requests.post(
+            response = providers.get("teachable").post(
                 f"{TEACHABLE_BASE_URL}/completions",  # Update with actual endpoint
-                headers=TEACHABLE_HEADERS,
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             if response.status_code == 200:
-                return response.json()
+                result = response.json()
+                record_provider_call("teachable", started, teachable_usage(result), input_data=input_data,
+                                     output_data={"status": response.status_code})
+                return result
             else:
                 logger.error(f"Teachable API error: {response.status_code} - {response.text}")
+                record_provider_call("teachable", started, error=f"HTTP {response.status_code}", input_data=input_data)
                 return None
                 
         except Exception as e:
             logger.error(f"Error calling Teachable API: {e}")
+            record_provider_call("teachable", started, error=e, input_data=input_data)
             return None
 
-    def call_gemini_api(self, prompt, image_data=None):
+    def call_gemini_api(self, prompt, image_data=None, mime_type=None):
         """Call Gemini API"""
+        if not self.gemini_model or not provider_allowed("gemini"):
+            return None
+        model, text = self.gemini_request(prompt)
+        
+        started = start_provider_call("gemini")
+        input_data = {"prompt_chars": len(text), "image_bytes": len(image_data) if image_data else 0}
         try:
-            if not self.gemini_model:
-                return None
-
             if image_data:
                 # Handle image input
-                image = Image.open(io.BytesIO(image_data))
-                response = self.gemini_model.generate_content([prompt, image])
+                image = gemini_image_part(image_data, mime_type)
+                response = model.generate_content([text, image], request_options=GEMINI_REQUEST_OPTIONS)
             else:
                 # Handle text input
-                response = self.gemini_model.generate_content(prompt)
+                response = model.generate_content(text, request_options=GEMINI_REQUEST_OPTIONS)
             
-            return {
+            result = {
                 "text": response.text,
-                "usage": getattr(response, 'usage_metadata', {}),
+                "usage": gemini_usage(response),
                 "safety_ratings": getattr(response, 'safety_ratings', [])
             }
+            record_provider_call("gemini", started, result["usage"], input_data=input_data,
+                                 output_data={"text_chars": len(result["text"])})
+            return result
             
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
+            record_provider_call("gemini", started, error=e, input_data=input_data)
             return None
 
-    def process_health_query(self, query_type, content, file_data=None, predictions=None, source="text"):
-        """Process health-related queries using both APIs"""
-        
-        # Enhanced health-specific prompt engineering
-        health_context = """
-        You are Dr. AarogyaLink, a friendly AI health companion.
-        Keep responses short and conversational - like texting a doctor friend.
-        
-        **Response style:**
-        - Acknowledge their concern briefly
-        - Ask 1-2 key questions to understand better  
-        - Give quick helpful thoughts
-        - Keep total response under 3-4 sentences
-        
-        **Example format:**
-        "That sounds uncomfortable! When did this start? Have you tried [simple remedy]? If it gets worse or doesn't improve in a day or two, I'd suggest seeing a doctor."
-        
-        **Tone:** Friendly, caring, conversational - like a knowledgeable friend.
+    def provider_calls(self, prompt, call_async=False):
+        """Get the provider calls for a text prompt in routing order
+
+        Providers whose circuit is open are left out, and the first one is the
+        provider whose answer ends the request.
         """
+        calls = {
+            "gemini": self.call_gemini_api_async if call_async else self.call_gemini_api,
+            "teachable": self.call_teachable_api_async if call_async else self.call_teachable_api
+        }
+        return {name: (lambda call=calls[name]: call(prompt)) for name in provider_order(list(calls))}
+
+    def call_providers(self, prompt):
+        """Call Gemini and Teachable, returning once the preferred provider has answered
+
+        The preferred provider is the first in routing order: the available provider
+        with the lowest recent p95 latency. Providers with an open circuit aren't called.
+        In parallel mode the calls are submitted to the shared provider pool; the other
+        providers are only called as a hedge while the pool has a free worker, so calls
+        abandoned by earlier requests can't make this one queue. The result is returned
+        as soon as the preferred provider succeeds, or as soon as another one has once
+        it has failed; slower calls are cancelled if they have not started yet and
+        ignored otherwise (their clients time out at the provider's deadline). Each
+        provider is waited on until its own deadline, counted from when its call starts
+        running, so the worst case is the slowest deadline rather than the sum of both
+        calls.
+        """
+        calls = self.provider_calls(prompt)
+        preferred = next(iter(calls), None)
+
+        if PROVIDER_EXECUTION_MODE != 'parallel':
+            return {name: call() for name, call in calls.items()}
+
+        starts = {}
+
+        def timed(name, call):
+            def run():
+                starts[name] = time.monotonic()
+                return call()
+            return run
+
+        futures = {}
+        for name, call in calls.items():
+            future = submit_provider_call(timed(name, call), hedge=name != preferred)
+            if future is not None:
+                futures[future] = name
+        pending = set(futures)
+        results = {}
+
+        while pending:
+            now = time.monotonic()
+
+            # Stop waiting on providers whose deadline has passed since their call started
+            for future in list(pending):
+                name = futures[future]
+                if name in starts and now - starts[name] >= PROVIDER_DEADLINES[name]:
+                    logger.warning(f"{name} call exceeded its {PROVIDER_DEADLINES[name]}s deadline")
+                    future.cancel()
+                    pending.discard(future)
+            if not pending:
+                break
+
+            # A call that hasn't started can't reach its deadline sooner than a full deadline from now
+            timeout = min(starts[futures[future]] + PROVIDER_DEADLINES[futures[future]] - now
+                          if futures[future] in starts else PROVIDER_DEADLINES[futures[future]]
+                          for future in pending)
+            done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Error calling {futures[future]} provider: {e}")
+                    results[futures[future]] = None
+
+            if results.get(preferred) or (preferred in results and any(results.values())):
+                break
+
+        # Ignore whatever is still running; it will finish in the background
+        for future in pending:
+            future.cancel()
+
+        return results
+
+    async def call_teachable_api_async(self, prompt, context=None):
+        """Async variant of call_teachable_api used by the ASGI serving mode"""
+        if not provider_allowed("teachable"):
+            return None
         
-        # Special handling for voice inputs
-        if source == "voice":
-            health_context += """
-            
-            **Special Note for Voice Input:**
-            The user has provided their health concern via voice input. Please ensure your response is clear and easy to understand when read aloud. 
-            Consider that the user may have speech or hearing difficulties, so avoid complex medical jargon unless necessary.
-            """
-        
-        if query_type == "text":
-            # Use both APIs for text queries
-            full_prompt = f"{health_context}\n\nUser Query: {content}\n\nRemember: Keep response conversational and under 3-4 sentences."
+        started = start_provider_call("teachable")
+        input_data = {"prompt_chars": len(prompt)}
+        try:
+            payload = {
+                "prompt": prompt,
+                "context": context or {},
+                "max_tokens": 1000,
+                "temperature": 0.7
+            }
             
-            # Try Gemini first
-            gemini_response = self.call_gemini_api(full_prompt)
+            response = await get_teachable_async_client().post(
+                f"{TEACHABLE_BASE_URL}/completions",  # Update with actual endpoint
+                json=payload
+            )
             
-            # Try Teachable as backup or for comparison
-            teachable_response = self.call_teachable_api(full_prompt)
+            if response.status_code == 200:
+                result = response.json()
+                record_provider_call("teachable", started, teachable_usage(result), input_data=input_data,
+                                     output_data={"status": response.status_code})
+                return result
+            else:
+                logger.error(f"Teachable API error: {response.status_code} - {response.text}")
+                record_provider_call("teachable", started, error=f"HTTP {response.status_code}", input_data=input_data)
+                return None
+                
+        except asyncio.CancelledError:
+            record_provider_call("teachable", started, error=CALL_CANCELLED, input_data=input_data)
+            raise
+        except Exception as e:
+            logger.error(f"Error calling Teachable API: {e}")
+            record_provider_call("teachable", started, error=e, input_data=input_data)
+            return None
+
+    async def call_gemini_api_async(self, prompt, image_data=None, mime_type=None):
+        """Async variant of call_gemini_api used by the ASGI serving mode"""
+        if not self.gemini_model or not provider_allowed("gemini"):
+            return None
+        model, text = self.gemini_request(prompt)
+        
+        started = start_provider_call("gemini")
+        input_data = {"prompt_chars": len(text), "image_bytes": len(image_data) if image_data else 0}
+        try:
+            if image_data:
+                # Handle image input
+                image = gemini_image_part(image_data, mime_type)
+                response = await model.generate_content_async([text, image])
+            else:
+                # Handle text input
+                response = await model.generate_content_async(text)
             
-            return {
-                "primary_response": gemini_response.get("text") if gemini_response else None,
-                "secondary_response": teachable_response.get("completion") if teachable_response else None,
-                "source": "gemini" if gemini_response else "teachable",
-                "timestamp": datetime.now().isoformat()
+            result = {
+                "text": response.text,
+                "usage": gemini_usage(response),
+                "safety_ratings": getattr(response, 'safety_ratings', [])
             }
+            record_provider_call("gemini", started, result["usage"], input_data=input_data,
+                                 output_data={"text_chars": len(result["text"])})
+            return result
             
-        elif query_type == "image":
-            # Use Gemini for image analysis
-            image_prompt = f"{health_context}\n\nAnalyze this health image briefly: {content}\n\nKeep response under 3 sentences."
-            
-            gemini_response = self.call_gemini_api(image_prompt, file_data)
-            
+        except asyncio.CancelledError:
+            record_provider_call("gemini", started, error=CALL_CANCELLED, input_data=input_data)
+            raise
+        except Exception as e:
+            logger.error(f"Error calling Gemini API: {e}")
+            record_provider_call("gemini", started, error=e, input_data=input_data)
+            return None
+
+    async def call_providers_async(self, prompt):
+        """Async variant of call_providers; slower provider calls are cancelled outright"""
+        calls = self.provider_calls(prompt, call_async=True)
+        preferred = next(iter(calls), None)
+
+        if PROVIDER_EXECUTION_MODE != 'parallel':
+            return {name: await call() for name, call in calls.items()}
+
+        started = time.monotonic()
+        tasks = {asyncio.ensure_future(call()): name for name, call in calls.items()}
+        pending = set(tasks)
+        results = {}
+
+        try:
+            while pending:
+                elapsed = time.monotonic() - started
+
+                # Stop waiting on providers whose deadline has passed
+                for task in list(pending):
+                    if elapsed >= PROVIDER_DEADLINES[tasks[task]]:
+                        logger.warning(f"{tasks[task]} call exceeded its {PROVIDER_DEADLINES[tasks[task]]}s deadline")
+                        task.cancel()
+                        pending.discard(task)
+                if not pending:
+                    break
+
+                timeout = min(PROVIDER_DEADLINES[tasks[task]] for task in pending) - elapsed
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    try:
+                        results[tasks[task]] = task.result()
+                    except Exception as e:
+                        logger.error(f"Error calling {tasks[task]} provider: {e}")
+                        results[tasks[task]] = None
+
+                if results.get(preferred) or (preferred in results and any(results.values())):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return results
+
+    def stream_gemini_api(self, prompt):
+        """Stream a Gemini text response, yielding chunks of text as they are generated"""
+        if not self.gemini_model or not provider_allowed("gemini"):
+            return
+        model, text = self.gemini_request(prompt)
+
+        started = start_provider_call("gemini")
+        usage, chars, error = {}, 0, None
+        try:
+            for chunk in model.generate_content(text, stream=True):
+                # The last chunk carries the usage of the whole response
+                usage = gemini_usage(chunk) or usage
+                if chunk.text:
+                    chars += len(chunk.text)
+                    yield chunk.text
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else STREAM_CLOSED
+            raise
+        finally:
+            record_provider_call("gemini", started, usage, error, {"prompt_chars": len(text), "stream": True},
+                                 {"text_chars": chars})
+
+    async def stream_gemini_api_async(self, prompt):
+        """Async variant of stream_gemini_api used by the ASGI serving mode"""
+        if not self.gemini_model or not provider_allowed("gemini"):
+            return
+        model, text = self.gemini_request(prompt)
+
+        started = start_provider_call("gemini")
+        usage, chars, error = {}, 0, None
+        try:
+            async for chunk in await model.generate_content_async(text, stream=True):
+                usage = gemini_usage(chunk) or usage
+                if chunk.text:
+                    chars += len(chunk.text)
+                    yield chunk.text
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else STREAM_CLOSED
+            raise
+        finally:
+            record_provider_call("gemini", started, usage, error, {"prompt_chars": len(text), "stream": True},
+                                 {"text_chars": chars})
+
+    def preprocess_image(self, image_data, mime_type=None):
+        """Downscale and re-encode an image for Gemini, returning (data, mime_type, stats)"""
+        if image_preprocessor is None:
+            return image_data, mime_type, None
+        return image_preprocessor.process(image_data, mime_type)
+
+    def get_cached_result(self, content, source="text", language="en"):
+        """Get a cached text query result, or None on a miss"""
+        if response_cache is None:
+            return None
+        
+        cached = response_cache.get(ResponseCache.make_key(source, language, content))
+        if cached:
+            return {**cached, "timestamp": datetime.now().isoformat(), "cached": True}
+        return None
+
+    def cache_result(self, content, result, source="text", language="en"):
+        """Cache a successful text query result"""
+        if response_cache is not None and result.get("primary_response"):
+            response_cache.set(ResponseCache.make_key(source, language, content), result)
+
+    def coalesce(self, key_parts, call, default=None):
+        """Run ``call()`` once for all concurrent requests with the same key parts
+
+        A request that joined a call which didn't finish in time gets ``default``.
+        """
+        if single_flight is None:
+            return call()
+        try:
+            return single_flight.do(SingleFlight.make_key(*key_parts), call)
+        except FlightTimeout as e:
+            logger.warning(f"Gave up waiting on a shared provider call: {e}")
+            return default
+
+    async def coalesce_async(self, key_parts, call, default=None):
+        """Async variant of coalesce; ``call()`` returns an awaitable"""
+        if single_flight is None:
+            return await call()
+        try:
+            return await single_flight.do_async(SingleFlight.make_key(*key_parts), call)
+        except FlightTimeout as e:
+            logger.warning(f"Gave up waiting on a shared provider call: {e}")
+            return default
+
+    def analyze_image(self, prompt, file_data, mime_type=None):
+        """Preprocess an image and ask Gemini about it, returning (response, preprocessing)"""
+        file_data, mime_type, preprocessing = self.preprocess_image(file_data, mime_type)
+        return self.call_gemini_api(prompt, file_data, mime_type), preprocessing
+
+    async def analyze_image_async(self, prompt, file_data, mime_type=None):
+        """Async variant of analyze_image"""
+        file_data, mime_type, preprocessing = await asyncio.to_thread(self.preprocess_image, file_data, mime_type)
+        return await self.call_gemini_api_async(prompt, file_data, mime_type), preprocessing
+
+    def build_prompt(self, query_type, content, source="text", context=None, language="en"):
+        """Build the full provider prompt for a text or image query
+
+        ``context`` is a conversation context from ContextBuilder.build for text queries.
+        The prompt comes from the compiled template for the query's mode and language.
+        """
+        if query_type == "image":
+            return prompt_templates.render("image", content, language)
+        mode = "voice" if source == "voice" else "text"
+        return prompt_templates.render(mode, content, language, render_context(context))
+
+    def summarize_turns(self, previous, turns):
+        """Fold conversation turns into the rolling session summary with Gemini"""
+        prompt = (
+            "Update this running summary of a patient's conversation with a health assistant. "
+            "Keep symptoms, durations, medications and advice given, in under 80 words.\n\n"
+            f"Current summary: {previous or 'None'}\n\nNew messages:\n"
+            + "\n".join(format_turn(turn) for turn in turns)
+        )
+        response = self.call_gemini_api(prompt)
+        return response["text"].strip() if response else extractive_summary(previous, turns)
+
+    def prompt_usage(self, prompt, context=None, gemini_response=None):
+        """Report the tokens sent for a text query, counting them in the context stats
+
+        Token counts are estimated from the prompt text; the count Gemini reports is
+        added when the response carries usage metadata. ``system_tokens`` is the part
+        of the prompt that is the template's preamble.
+        """
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "system_tokens": estimate_tokens(prompt.system) if isinstance(prompt, Prompt) else 0,
+            "history_tokens": context["tokens"]["history"] if context else 0,
+            "summary_tokens": context["tokens"]["summary"] if context else 0,
+            "history_turns": len(context["turns"]) if context else 0
+        }
+        reported = ((gemini_response or {}).get("usage") or {}).get("prompt_tokens")
+        if reported:
+            usage["reported_prompt_tokens"] = reported
+        
+        if context_builder:
+            context_builder.record(usage["prompt_tokens"])
+        logger.info(f"Prompt tokens: {usage['prompt_tokens']} ({usage['history_turns']} history turns, "
+                    f"{usage['history_tokens']} history + {usage['summary_tokens']} summary)")
+        return usage
+
+    def build_result(self, query_type, responses):
+        """Build the query result from the raw provider responses"""
+        gemini_response = responses.get("gemini")
+        
+        if query_type == "image":
             return {
                 "primary_response": gemini_response.get("text") if gemini_response else "Unable to analyze image",
+                "success": gemini_response is not None,
                 "source": "gemini",
                 "safety_ratings": gemini_response.get("safety_ratings") if gemini_response else [],
                 "timestamp": datetime.now().isoformat()
             }
+        
+        teachable_response = responses.get("teachable")
+        return {
+            "primary_response": gemini_response.get("text") if gemini_response else
+                                teachable_response.get("completion") if teachable_response else None,
+            "secondary_response": teachable_response.get("completion") if teachable_response else None,
+            "source": "gemini" if gemini_response else "teachable",
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def process_health_query(self, query_type, content, file_data=None, predictions=None, source="text", language="en", mime_type=None, context=None, content_hash=None):
+        """Process health-related queries using both APIs
+
+        Text queries with conversation history in ``context`` bypass the response
+        cache, since the answer depends on the conversation. Concurrent identical
+        queries share one provider call, keyed on the full prompt and, for images,
+        ``content_hash`` of the file (computed from ``file_data`` if not given).
+        """
+        
+        if query_type == "text":
+            stateless = not render_context(context)
+            cached = self.get_cached_result(content, source, language) if stateless else None
+            if cached:
+                return {**cached, "usage": {"prompt_tokens": 0}}
+            
+            # Query Gemini and Teachable (backup / comparison) together
+            prompt = self.build_prompt("text", content, source, context, language)
+            responses = self.coalesce(("text", prompt), lambda: self.call_providers(prompt), {})
+            result = self.build_result("text", responses)
+            if stateless:
+                self.cache_result(content, result, source, language)
+            return {**result, "usage": self.prompt_usage(prompt, context, responses.get("gemini"))}
+            
+        elif query_type == "image":
+            # Use Gemini for image analysis
+            prompt = self.build_prompt("image", content, source, language=language)
+            content_hash = content_hash or hashlib.sha256(file_data).hexdigest()
+            gemini_response, preprocessing = self.coalesce(
+                ("image", prompt, content_hash, mime_type),
+                lambda: self.analyze_image(prompt, file_data, mime_type),
+                (None, None)
+            )
+            result = self.build_result("image", {"gemini": gemini_response})
+            result["preprocessing"] = preprocessing
+            return result
             
         elif query_type == "audio":
             # For audio, convert to text first (you might need speech-to-text service)
             # Then process as text query
             text_content = content  # Assume content is already transcribed
-            return self.process_health_query("text", text_content, source=source)
+            return self.process_health_query("text", text_content, source=source, language=language, context=context)
+
+    def stream_health_query(self, content, source="text", language="en", context=None):
+        """Stream a text query, yielding ("token", text) pairs followed by ("done", result)
+
+        Only Gemini supports streaming, so Teachable is only consulted while Gemini's
+        circuit is open, and its answer is sent as a single token. If the stream fails
+        the final result has no primary response, like a failed Gemini call.
+        A cached result is sent as a single token.
+        """
+        stateless = not render_context(context)
+        cached = self.get_cached_result(content, source, language) if stateless else None
+        if cached:
+            yield "token", cached["primary_response"]
+            yield "done", {**cached, "usage": {"prompt_tokens": 0}}
+            return
+        
+        prompt = self.build_prompt("text", content, source, context, language)
+        if not provider_order(["gemini"]):
+            # Gemini's circuit is open, so answer from the other providers in one piece
+            result = self.build_result("text", self.call_providers(prompt))
+            if result["primary_response"]:
+                yield "token", result["primary_response"]
+        else:
+            chunks = []
+            try:
+                for text in self.stream_gemini_api(prompt):
+                    chunks.append(text)
+                    yield "token", text
+                gemini_response = {"text": "".join(chunks)} if chunks else None
+            except Exception as e:
+                logger.error(f"Error streaming from Gemini API: {e}")
+                gemini_response = None
+            result = self.build_result("text", {"gemini": gemini_response})
+        
+        if stateless:
+            self.cache_result(content, result, source, language)
+        yield "done", {**result, "usage": self.prompt_usage(prompt, context)}
+
+    async def process_health_query_async(self, query_type, content, file_data=None, predictions=None, source="text", language="en", mime_type=None, context=None, content_hash=None):
+        """Async variant of process_health_query used by the ASGI serving mode"""
+        
+        if query_type == "text":
+            stateless = not render_context(context)
+            # The response cache may be backed by SQLite, keep its reads and writes off the loop
+            cached = await asyncio.to_thread(self.get_cached_result, content, source, language) if stateless else None
+            if cached:
+                return {**cached, "usage": {"prompt_tokens": 0}}
+            
+            prompt = self.build_prompt("text", content, source, context, language)
+            responses = await self.coalesce_async(("text", prompt), lambda: self.call_providers_async(prompt), {})
+            result = self.build_result("text", responses)
+            if stateless:
+                await asyncio.to_thread(self.cache_result, content, result, source, language)
+            return {**result, "usage": self.prompt_usage(prompt, context, responses.get("gemini"))}
+            
+        elif query_type == "image":
+            prompt = self.build_prompt("image", content, source, language=language)
+            content_hash = content_hash or hashlib.sha256(file_data).hexdigest()
+            gemini_response, preprocessing = await self.coalesce_async(
+                ("image", prompt, content_hash, mime_type),
+                lambda: self.analyze_image_async(prompt, file_data, mime_type),
+                (None, None)
+            )
+            result = self.build_result("image", {"gemini": gemini_response})
+            result["preprocessing"] = preprocessing
+            return result
+            
+        elif query_type == "audio":
+            return await self.process_health_query_async("text", content, source=source, language=language, context=context)
+
+    async def stream_health_query_async(self, content, source="text", language="en", context=None):
+        """Async variant of stream_health_query used by the ASGI serving mode"""
+        stateless = not render_context(context)
+        cached = await asyncio.to_thread(self.get_cached_result, content, source, language) if stateless else None
+        if cached:
+            yield "token", cached["primary_response"]
+            yield "done", {**cached, "usage": {"prompt_tokens": 0}}
+            return
+        
+        prompt = self.build_prompt("text", content, source, context, language)
+        if not provider_order(["gemini"]):
+            # Gemini's circuit is open, so answer from the other providers in one piece
+            result = self.build_result("text", await self.call_providers_async(prompt))
+            if result["primary_response"]:
+                yield "token", result["primary_response"]
+        else:
+            chunks = []
+            try:
+                async for text in self.stream_gemini_api_async(prompt):
+                    chunks.append(text)
+                    yield "token", text
+                gemini_response = {"text": "".join(chunks)} if chunks else None
+            except Exception as e:
+                logger.error(f"Error streaming from Gemini API: {e}")
+                gemini_response = None
+            result = self.build_result("text", {"gemini": gemini_response})
+        
+        if stateless:
+            await asyncio.to_thread(self.cache_result, content, result, source, language)
+        yield "done", {**result, "usage": self.prompt_usage(prompt, context)}
 
 # Initialize the API handler
 health_api = HealthCompanionAPI()
+if context_builder and CONTEXT_SUMMARIZER == 'gemini':
+    context_builder.summarizer = health_api.summarize_turns
 
 @app.route('/')
 def index():
@@ -235,6 +1064,151 @@ def test_api():
         "version": "1.0.0"
     })
 
+def request_route():
+    """Label for the current request: its URL rule, so path parameters don't add series"""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    if METRICS_ENABLED:
+        g.metrics_route = request_route()
+        g.metrics_started = time.perf_counter()
+        http_in_flight.inc(g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses are timed to their first byte; the in-flight gauge covers the rest
+    if METRICS_ENABLED and 'metrics_started' in g:
+        http_requests.inc(g.metrics_route, request.method, response.status_code)
+        http_latency.observe(g.metrics_route, request.method, value=time.perf_counter() - g.metrics_started)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if METRICS_ENABLED and 'metrics_route' in g:
+        http_in_flight.dec(g.pop('metrics_route'))
+
+def client_identities(remote_addr, headers):
+    """Rate limit identities of a request: its client IP, and its user id if it sends one"""
+    ip = remote_addr
+    if RATE_LIMIT_TRUST_PROXY and headers.get('X-Forwarded-For'):
+        ip = headers['X-Forwarded-For'].split(',')[0].strip()
+    identities = [f"ip:{ip}"]
+    if headers.get('X-User-ID'):
+        identities.append(f"user:{headers['X-User-ID']}")
+    return identities
+
+def admit_request(route, identities, calls_providers=True):
+    """Apply the rate limits and the provider concurrency cap to a request
+
+    Returns ``(slot, rejection)``. ``slot`` is True when the request holds a provider
+    slot, which must be given back with ``release_provider_slot`` once it is done.
+    ``rejection`` is None, or the ``(payload, status, retry_after)`` of a 429 answer.
+    """
+    if rate_limiter is not None:
+        allowed, wait = rate_limiter.check(route, identities)
+        if not allowed:
+            if METRICS_ENABLED:
+                admission_rejections.inc(route, 'rate_limit')
+            logger.warning(f"Rate limited {', '.join(identities)} on {route}")
+            return False, ({"error": "Too many requests. Please slow down."}, 429, retry_after_header(wait))
+
+    if calls_providers and provider_concurrency is not None:
+        if not provider_concurrency.try_acquire():
+            if METRICS_ENABLED:
+                admission_rejections.inc(route, 'provider_concurrency')
+            return False, ({"error": "The service is busy. Please retry shortly."}, 429,
+                           retry_after_header(PROVIDER_BUSY_RETRY_AFTER_SECONDS))
+        return True, None
+    return False, None
+
+def release_provider_slot():
+    if provider_concurrency is not None:
+        provider_concurrency.release()
+
+@app.before_request
+def admit():
+    # Job mode uploads are bounded by the job queue instead of a provider slot
+    if request.method != 'POST' or request_route() not in RATE_LIMITS:
+        return None
+    slot, rejection = admit_request(request_route(), client_identities(request.remote_addr, request.headers),
+                                    not is_job_submission(request_route(), request))
+    g.provider_slot = slot
+    if rejection:
+        payload, status, retry_after = rejection
+        response = jsonify(payload)
+        response.headers['Retry-After'] = retry_after
+        return response, status
+    return None
+
+@app.teardown_request
+def release_admission(error=None):
+    if g.pop('provider_slot', False):
+        release_provider_slot()
+
+@metrics.register_collector
+def component_metrics():
+    """Read cache, queue, writer and pool stats when /metrics is scraped"""
+    families = []
+    caches = {"responses": response_cache, "analyses": analysis_cache}
+    cache_stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    families.append(("cache_hits_total", "counter", "Cache hits",
+                     [({"cache": name}, stats['hits']) for name, stats in cache_stats.items()]))
+    families.append(("cache_misses_total", "counter", "Cache misses",
+                     [({"cache": name}, stats['misses']) for name, stats in cache_stats.items()]))
+    families.append(("cache_hit_ratio", "gauge", "Cache hits over lookups since start",
+                     [({"cache": name}, stats['hit_rate']) for name, stats in cache_stats.items()]))
+    families.append(("cache_entries", "gauge", "Entries held in memory",
+                     [({"cache": name}, stats['entries']) for name, stats in cache_stats.items()]))
+
+    jobs = job_queue.stats()
+    families.append(("jobs", "gauge", "Upload analysis jobs by status",
+                     [({"status": status}, jobs[status]) for status in ('queued', 'processing')]))
+    families.append(("jobs_finished_total", "counter", "Upload analysis jobs finished or rejected",
+                     [({"outcome": outcome}, jobs[outcome]) for outcome in ('completed', 'failed', 'rejected')]))
+
+    if providers.loaded("teachable"):
+        pool = providers.get("teachable").stats.to_dict()
+        families.append(("teachable_pool_requests_total", "counter", "Requests sent through the Teachable pool",
+                         [({}, pool['requests'])]))
+        families.append(("teachable_pool_new_connections_total", "counter", "Connections opened by the Teachable pool",
+                         [({}, pool['new_connections'])]))
+
+    if provider_router:
+        breakers = provider_router.stats()
+        families.append(("circuit_breaker_open", "gauge", "Whether the provider's circuit is open (1) or half-open (0.5)",
+                         [({"provider": name}, {"open": 1, "half_open": 0.5}.get(stats['state'], 0))
+                          for name, stats in breakers.items()]))
+        families.append(("circuit_breaker_rejected_total", "counter", "Provider calls refused by an open circuit",
+                         [({"provider": name}, stats['rejected']) for name, stats in breakers.items()]))
+
+    if provider_concurrency:
+        families.append(("provider_slots_in_use", "gauge", "Requests holding a provider concurrency slot",
+                         [({}, provider_concurrency.stats()['active'])]))
+
+    if single_flight:
+        flights = single_flight.stats()
+        families.append(("coalesced_requests_total", "counter", "Requests that shared another request's provider call",
+                         [({}, flights['coalesced'])]))
+
+    if message_writer:
+        writer = message_writer.stats()
+        families.append(("message_writer_pending", "gauge", "Chat rows waiting to be written",
+                         [({}, writer['pending'])]))
+        families.append(("message_writer_written_total", "counter", "Chat rows written",
+                         [({}, writer['written'])]))
+    if telemetry:
+        families.append(("telemetry_buffered", "gauge", "Provider call records waiting to be written",
+                         [({}, telemetry.stats()['buffered'])]))
+    return families
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -244,8 +1218,455 @@ def health_check():
         "services": {
             "teachable": bool(TEACHABLE_API_KEY != 'your-teachable-api-key-here'),
             "gemini": bool(GEMINI_API_KEY != 'your-gemini-api-key-here')
+        },
+        "connection_pools": {
+            "teachable": providers.get("teachable").stats.to_dict() if providers.loaded("teachable") else None
+        },
+        "providers": providers.stats(),
+        "fake_providers": {name: fake.stats() for name, fake in fake_providers.items()} if FAKE_PROVIDERS else None,
+        "circuit_breakers": provider_router.stats() if provider_router else None,
+        "single_flight": single_flight.stats() if single_flight else None,
+        "admission": {
+            "rate_limits": rate_limiter.stats() if rate_limiter else None,
+            "provider_concurrency": provider_concurrency.stats() if provider_concurrency else None
+        },
+        "jobs": job_queue.stats(),
+        "message_writer": message_writer.stats() if message_writer else None,
+        "context": context_builder.stats() if context_builder else None,
+        "telemetry": telemetry.stats() if telemetry else None,
+        "caches": {
+            "responses": response_cache.stats() if response_cache else None
+        }
+    })
+
+def log_chat_input(message, source):
+    """Log the input source of a chat message for analytics"""
+    if source == 'voice':
+        logger.info(f"Voice input received: {message[:100]}...")
+    else:
+        logger.info(f"Text input received: {message[:100]}...")
+
+def session_token(session_id):
+    """The form of a session id given to clients: the id and a signature of it"""
+    signature = hmac.new(app.config['SECRET_KEY'].encode('utf-8'), session_id.encode('utf-8'), hashlib.sha256)
+    return f"{session_id}.{signature.hexdigest()}"
+
+def session_from_token(token):
+    """Get the session id from a token this server issued, or None for anything else"""
+    session_id, _, signature = str(token or '').partition('.')
+    if signature and hmac.compare_digest(session_token(session_id).encode('utf-8'),
+                                         f"{session_id}.{signature}".encode('utf-8')):
+        return session_id
+    return None
+
+def resolve_chat_session(token=None, language='en'):
+    """Get the chat session id for a request, queueing a new session if needed
+
+    Clients send back the ``session_token`` of a session they were given. A missing
+    token, or one this server didn't sign, starts a new session, so a client can't
+    write to or read the history of a session id it guessed. Returns None when chat
+    persistence is disabled.
+    """
+    if message_writer is None:
+        return None
+    
+    session_id = session_from_token(token)
+    if session_id:
+        return session_id
+    
+    session_id = str(uuid.uuid4())
+    message_writer.add_session({
+        "session_id": session_id,
+        "session_name": f"Health Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "session_language": language,
+        "created_at": datetime.utcnow()
+    })
+    return session_id
+
+def build_chat_context(session_id):
+    """Get the conversation context for a chat session, or None without history support"""
+    if context_builder is None or session_id is None:
+        return None
+    
+    try:
+        with app.app_context():
+            return context_builder.build(session_id)
+    except Exception as e:
+        logger.error(f"Error building chat context: {e}")
+        return None
+
+def chat_message_row(session_id, sender_type, message_type, content, language='en',
+                     ai_source=None, metadata=None, parent_message_id=None):
+    """Build a Message row for the message writer"""
+    return {
+        "message_id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "sender_type": sender_type,
+        "message_type": message_type,
+        "content": content,
+        "ai_source": ai_source,
+        "message_metadata": json.dumps(metadata) if metadata else None,
+        "language": language,
+        "parent_message_id": parent_message_id,
+        "created_at": datetime.utcnow()
+    }
+
+def record_chat_exchange(session_id, content, response, message_type='text', language='en', metadata=None):
+    """Queue a user message and the AI reply to it for write-behind persistence"""
+    if message_writer is None or session_id is None:
+        return
+    
+    try:
+        user_message = chat_message_row(session_id, 'user', message_type, content, language, metadata=metadata)
+        message_writer.add_message(user_message)
+        
+        if response and response.get('primary_response'):
+            message_writer.add_message(chat_message_row(
+                session_id, 'ai', 'text' if message_type == 'text' else 'ai_analysis',
+                response['primary_response'], language,
+                ai_source=response.get('source'),
+                parent_message_id=user_message['message_id']
+            ))
+    except Exception as e:
+        logger.error(f"Error recording chat messages: {e}")
+
+def record_upload_exchange(session_id, upload, description, response, language='en'):
+    """Queue an upload and its analysis as chat messages"""
+    record_chat_exchange(session_id, description or upload['filename'], response,
+                         message_type=upload['type'], language=language, metadata={
+                             "filename": upload['filename'],
+                             "size": upload['size'],
+                             "mime_type": upload['mime_type'],
+                             "content_hash": upload['content_hash']
+                         })
+
+def chat_payload(response, source, session_id=None):
+    """Build the /api/chat JSON payload and status code from a query result"""
+    if response['primary_response']:
+        payload = {
+            "success": True,
+            "response": response['primary_response'],
+            "source": response['source'],
+            "input_source": source,  # Include the input source in response
+            "timestamp": response['timestamp']
+        }
+        if session_id:
+            payload["session_id"] = session_token(session_id)
+        if response.get('usage'):
+            payload["usage"] = response['usage']
+        return payload, 200
+    else:
+        return {"error": "Unable to process your query at the moment"}, 500
+
+def sse_event(event, data):
+    """Format a Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def chat_stream_event(event, value, source, session_id=None):
+    """Convert a stream_health_query item into an SSE frame
+
+    Tokens are sent as ``token`` events; the final summary frame carries the same
+    payload as /api/chat and is sent as ``done`` on success or ``error`` otherwise.
+    """
+    if event == "token":
+        return sse_event("token", {"text": value})
+    
+    payload, status = chat_payload(value, source, session_id)
+    return sse_event("done" if status == 200 else "error", payload)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Stop reverse proxies from buffering the stream
+}
+
+def analysis_cache_key(upload, description, language):
+    """Key of an upload's analysis, in the memo and as FileUpload.analysis_key
+
+    The audio prompt names the file (see ``upload_query``), so an audio key includes it.
+    """
+    source = upload['content_hash'] if upload['type'] == 'image' else f"{upload['content_hash']}:{upload['filename']}"
+    return ResponseCache.make_key(source, language, description)
+
+def get_cached_analysis(upload, description, language='en'):
+    """Get a previous analysis of the same file content, description and language"""
+    key = analysis_cache_key(upload, description, language)
+    cached = analysis_cache.get(key)
+    
+    if cached is None:
+        try:
+            with app.app_context():
+                cached = find_upload_analysis(key)
+        except Exception as e:
+            logger.error(f"Error looking up stored analysis: {e}")
+        if cached:
+            analysis_cache.set(key, cached)
+    
+    if cached:
+        logger.info(f"Duplicate upload {upload['content_hash'][:12]}, returning stored analysis")
+        return {**cached, "timestamp": datetime.now().isoformat(), "cached": True}
+    return None
+
+def record_upload_analysis(upload, description, response, language='en', file_id=None):
+    """Record an upload and its successful analysis in the memo and FileUpload
+
+    With ``file_id`` the existing FileUpload row of a background job is updated
+    instead of a new row being created.
+    """
+    result = analysis_key = None
+    if response and response.get('success', response.get('primary_response') is not None):
+        result = {key: response.get(key) for key in ('primary_response', 'source', 'timestamp', 'preprocessing')}
+        # Only a successful analysis is stored under its key, so lookups never find a failed one
+        analysis_key = analysis_cache_key(upload, description, language)
+        analysis_cache.set(analysis_key, result)
+    
+    try:
+        with app.app_context():
+            if file_id:
+                update_upload_analysis(file_id, {
+                    "description": description,
+                    "language": language,
+                    "response": result,
+                    "error": None if result else "Unable to process file at the moment"
+                }, analysis_key=analysis_key)
+                return
+            
+            save_file_upload(
+                original_filename=upload['filename'],
+                file_type=upload['type'],
+                file_size=upload['size'],
+                mime_type=upload['mime_type'],
+                content_hash=upload['content_hash'],
+                analysis_results={
+                    "description": description,
+                    "language": language,
+                    "response": result
+                } if result else None,
+                analysis_key=analysis_key
+            )
+    except Exception as e:
+        logger.error(f"Error saving file upload: {e}")
+
+def prepare_upload(file, query_type, description='', language='en'):
+    """Validate an uploaded file in a single pass over its spooled body
+
+    Returns ``(upload, None)`` on success, where ``upload`` holds the filename,
+    resolved query type, mime type, size, content hash and an ``UploadBuffer`` over
+    the file bytes, or ``(None, (payload, status))`` describing the error response.
+    The same buffer is used for validation and handed to the provider, so the body is
+    never copied into intermediate bytes objects. If the same content was analysed
+    before with this description and language, ``upload['cached_response']`` holds
+    that analysis and validation is skipped. Call ``release_upload`` once the request
+    is done.
+    """
+    if not (file and allowed_file(file.filename)):
+        logger.info(f"Rejected file: {file.filename}, Content-Type: {file.content_type}")
+        allowed_exts = ', '.join(sorted(ALLOWED_EXTENSIONS))
+        return None, ({
+            "error": f"File type not allowed. Supported formats: {allowed_exts}"
+        }, 400)
+    
+    buffer = UploadBuffer(file.stream)
+    filename = secure_filename(file.filename)
+    
+    # Log file details for debugging
+    logger.info(f"Received file: {file.filename}, Content-Type: {file.content_type}, "
+                f"Detected: {buffer.mime_type}, Size: {buffer.size} bytes")
+    
+    # Auto-detect file type if not specified, trusting the file header over the extension
+    if query_type == 'auto':
+        query_type = buffer.file_type if buffer.file_type != 'unknown' else get_file_type(filename)
+        logger.info(f"Auto-detected file type: {query_type}")
+    
+    if METRICS_ENABLED:
+        upload_files.inc(query_type)
+        upload_bytes.inc(query_type, amount=buffer.size)
+    
+    upload = {
+        "filename": filename,
+        "type": query_type,
+        "mime_type": buffer.mime_type or file.mimetype,
+        "size": buffer.size,
+        "content_hash": buffer.content_hash,
+        "buffer": buffer,
+        "cached_response": None
+    }
+    
+    # Validate file size
+    if buffer.size == 0:
+        release_upload(upload)
+        return None, ({"error": "File is empty"}, 400)
+    
+    if buffer.size > app.config['MAX_CONTENT_LENGTH']:
+        release_upload(upload)
+        return None, ({"error": "File too large. Maximum size is 16MB."}, 413)
+    
+    if query_type in ('image', 'audio'):
+        upload['cached_response'] = get_cached_analysis(upload, description, language)
+        if upload['cached_response']:
+            return upload, None
+    
+    if query_type == 'image':
+        # Validate image file straight from the spooled stream
+        try:
+            from PIL import Image
+            img = Image.open(buffer.open())
+            img.verify()  # Verify it's a valid image
+            upload['mime_type'] = Image.MIME.get(img.format, upload['mime_type'])
+            logger.info(f"Valid image file: {img.format}, {img.size}")
+        except Exception as e:
+            logger.error(f"Invalid image file: {e}")
+            release_upload(upload)
+            return None, ({"error": "Invalid image file"}, 400)
+    
+    elif query_type != 'audio':
+        release_upload(upload)
+        return None, ({"error": f"Unsupported file type: {query_type}"}, 400)
+    
+    return upload, None
+
+def upload_query(upload, description, language='en'):
+    """Get the process_health_query arguments for an upload"""
+    if upload['type'] == 'image':
+        return {
+            "query_type": "image",
+            "content": description,
+            "file_data": upload['buffer'].view,
+            "mime_type": upload['mime_type'],
+            "content_hash": upload['content_hash']
         }
+    
+    # For audio files, we need speech-to-text conversion
+    # For now, provide a helpful response about audio processing
+    audio_description = f"Audio file received: {upload['filename']} ({upload['size']} bytes). "
+    if description:
+        audio_description += f"Description: {description}"
+    else:
+        audio_description += "Please describe your symptoms or health concerns from the audio recording."
+    
+    # Note: You can integrate speech-to-text services here
+    # For example, Google Speech-to-Text, Azure Speech Services, etc.
+    return {"query_type": "text", "content": audio_description, "language": language}
+
+def run_upload_job(job_id, upload, description, language='en', session_id=None):
+    """Analyse an upload on a job worker and persist the result on its FileUpload row"""
+    try:
+        response = health_api.process_health_query(**upload_query(upload, description, language))
+    except Exception as e:
+        logger.error(f"Error processing {upload['type']} file in job {job_id}: {e}")
+        response = None
+    finally:
+        release_upload(upload)
+    record_upload_analysis(upload, description, response, language, file_id=job_id)
+    record_upload_exchange(session_id, upload, description, response, language)
+
+def submit_upload_job(upload, description, language='en', session_id=None):
+    """Queue an upload for background analysis
+
+    Returns the JSON payload and status code: 202 with the job id, or 429 when the
+    queue is full. The job gets its own copy of the upload's bytes, so the request's
+    buffer is still released by the caller.
+    """
+    # Check before creating the job record; submit() re-checks atomically below
+    if job_queue.full():
+        job_queue.record_rejection()
+        return {"error": "Too many uploads in progress. Please retry shortly."}, 429
+    
+    try:
+        with app.app_context():
+            job_id = str(save_file_upload(
+                original_filename=upload['filename'],
+                file_type=upload['type'],
+                file_size=upload['size'],
+                mime_type=upload['mime_type'],
+                content_hash=upload['content_hash']
+            ).file_id)
+    except Exception as e:
+        logger.error(f"Error creating upload job: {e}")
+        return {"error": "Failed to queue file"}, 500
+    
+    job_upload = {**upload, "buffer": upload['buffer'].detach()}
+    if not job_queue.submit(job_id, run_upload_job, job_id, job_upload, description, language, session_id):
+        release_upload(job_upload)
+        with app.app_context():
+            update_upload_analysis(job_id, {"description": description, "language": language,
+                                            "response": None, "error": "Job queue full"})
+        return {"error": "Too many uploads in progress. Please retry shortly."}, 429
+    
+    payload = {
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}"
+    }
+    if session_id:
+        payload["session_id"] = session_token(session_id)
+    return payload, 202
+
+def is_job_request(req):
+    """Check whether an upload request asked for background job mode"""
+    value = req.form.get('async', req.args.get('async', 'false'))
+    return value.lower() in ('1', 'true', 'yes')
+
+def is_job_submission(route, req):
+    """Check whether a request is an upload job, which the job queue bounds instead of a provider slot
+
+    Only /api/upload has a job mode; ``async`` on any other route is ignored.
+    """
+    return route == '/api/upload' and is_job_request(req)
+
+def job_payload(job_id):
+    """Build the /api/jobs/<id> JSON payload and status code from the persisted job"""
+    with app.app_context():
+        record = get_file_upload(job_id)
+        if record is None:
+            return {"error": "Job not found"}, 404
+        record = record.to_dict()
+    
+    if not record['is_processed']:
+        # After a restart a job that never finished has no live state left
+        return {"job_id": job_id, "status": job_queue.status(job_id) or "pending"}, 200
+    
+    results = record['analysis_results'] or {}
+    if not results.get('response'):
+        return {"job_id": job_id, "status": "failed",
+                "error": results.get('error') or "Unable to process file at the moment"}, 200
+    
+    payload, status = upload_payload(results['response'], {
+        "filename": record['original_filename'],
+        "type": record['file_type'],
+        "size": record['file_size']
     })
+    payload.update({"job_id": job_id, "status": "done"})
+    return payload, status
+
+def release_upload(upload):
+    """Release the buffer over an uploaded file so Werkzeug can close it"""
+    try:
+        upload['buffer'].release()
+    except Exception as e:
+        logger.warning(f"Failed to release upload buffer: {e}")
+
+def upload_payload(response, upload, session_id=None):
+    """Build the /api/upload JSON payload and status code from a query result"""
+    if response and response.get('primary_response'):
+        payload = {
+            "success": True,
+            "response": response['primary_response'],
+            "source": response['source'],
+            "timestamp": response['timestamp'],
+            "file_info": {
+                "filename": upload['filename'],
+                "type": upload['type'],
+                "size": upload['size'],
+                "preprocessing": response.get('preprocessing'),
+                "cached": bool(response.get('cached'))
+            }
+        }
+        if session_id:
+            payload["session_id"] = session_token(session_id)
+        return payload, 200
+    else:
+        return {"error": "Unable to process file at the moment"}, 500
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -257,34 +1678,63 @@ def chat():
             return jsonify({"error": "Message is required"}), 400
         
         message = data['message']
-        context = data.get('context', {})
         source = data.get('source', 'text')  # 'text' or 'voice'
+        language = data.get('language', 'en')
         
-        # Log the input source for analytics
-        if source == 'voice':
-            logger.info(f"Voice input received: {message[:100]}...")
-        else:
-            logger.info(f"Text input received: {message[:100]}...")
+        log_chat_input(message, source)
+        
+        session_id = resolve_chat_session(data.get('session_id'), language)
         
         # Process the query as text (voice is already transcribed)
         # Pass the source information to customize the response for voice inputs
-        response = health_api.process_health_query("text", message, source=source)
-        
-        if response['primary_response']:
-            return jsonify({
-                "success": True,
-                "response": response['primary_response'],
-                "source": response['source'],
-                "input_source": source,  # Include the input source in response
-                "timestamp": response['timestamp']
-            })
-        else:
-            return jsonify({"error": "Unable to process your query at the moment"}), 500
+        response = health_api.process_health_query("text", message, source=source, language=language,
+                                                    context=build_chat_context(session_id))
+        
+        record_chat_exchange(session_id, message, response, language=language,
+                             metadata={"input_source": source} if source != 'text' else None)
+        
+        payload, status = chat_payload(response, source, session_id)
+        return jsonify(payload), status
             
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream a reply to a text-based health query as Server-Sent Events"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'message' not in data:
+            return jsonify({"error": "Message is required"}), 400
+        
+        message = data['message']
+        source = data.get('source', 'text')  # 'text' or 'voice'
+        language = data.get('language', 'en')
+        session_id = resolve_chat_session(data.get('session_id'), language)
+        
+        log_chat_input(message, source)
+            
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+    
+    def generate():
+        try:
+            context = build_chat_context(session_id)
+            for event, value in health_api.stream_health_query(message, source=source, language=language,
+                                                               context=context):
+                if event == "done":
+                    record_chat_exchange(session_id, message, value, language=language,
+                                         metadata={"input_source": source} if source != 'text' else None)
+                yield chat_stream_event(event, value, source, session_id)
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {e}")
+            yield sse_event("error", {"error": "Internal server error"})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Handle file uploads (images/audio)"""
@@ -295,107 +1745,215 @@ def upload_file():
         file = request.files['file']
         query_type = request.form.get('type', 'auto')  # auto-detect if not specified
         description = request.form.get('description', '')
+        language = request.form.get('language', 'en')
         
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
         
-        # Log file details for debugging
-        logger.info(f"Received file: {file.filename}, Content-Type: {file.content_type}, Size: {len(file.read())} bytes")
-        file.seek(0)  # Reset file pointer after reading for size
+        upload, error = prepare_upload(file, query_type, description, language)
+        if error:
+            return jsonify(error[0]), error[1]
         
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_data = file.read()
-            
-            # Auto-detect file type if not specified
-            if query_type == 'auto':
-                query_type = get_file_type(filename)
-                logger.info(f"Auto-detected file type: {query_type}")
-            
-            # Validate file size
-            if len(file_data) == 0:
-                return jsonify({"error": "File is empty"}), 400
-            
-            if len(file_data) > app.config['MAX_CONTENT_LENGTH']:
-                return jsonify({"error": "File too large. Maximum size is 16MB."}), 413
-            
-            # Save file temporarily
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(file_data)
-                logger.info(f"File saved temporarily to: {file_path}")
-            except Exception as e:
-                logger.error(f"Error saving file: {e}")
-                return jsonify({"error": "Failed to save file"}), 500
-            
-            # Process based on file type
-            try:
-                if query_type == 'image':
-                    # Validate image file
-                    try:
-                        img = Image.open(io.BytesIO(file_data))
-                        img.verify()  # Verify it's a valid image
-                        logger.info(f"Valid image file: {img.format}, {img.size}")
-                    except Exception as e:
-                        logger.error(f"Invalid image file: {e}")
-                        return jsonify({"error": "Invalid image file"}), 400
-                    
-                    response = health_api.process_health_query("image", description, file_data)
-                    
-                elif query_type == 'audio':
-                    # For audio files, we need speech-to-text conversion
-                    # For now, provide a helpful response about audio processing
-                    audio_description = f"Audio file received: {filename} ({len(file_data)} bytes). "
-                    if description:
-                        audio_description += f"Description: {description}"
-                    else:
-                        audio_description += "Please describe your symptoms or health concerns from the audio recording."
-                    
-                    # Note: You can integrate speech-to-text services here
-                    # For example, Google Speech-to-Text, Azure Speech Services, etc.
-                    response = health_api.process_health_query("text", audio_description)
-                    
-                else:
-                    return jsonify({"error": f"Unsupported file type: {query_type}"}), 400
-                
-            except Exception as e:
-                logger.error(f"Error processing {query_type} file: {e}")
-                return jsonify({"error": f"Failed to process {query_type} file"}), 500
-            
-            # Clean up temporary file
+        session_id = resolve_chat_session(request.form.get('session_id'), language)
+        
+        # In job mode the analysis runs on a worker and the client polls /api/jobs/<id>
+        if is_job_request(request) and not upload['cached_response']:
             try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"Cleaned up temporary file: {file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file: {e}")
-            
-            # Return response
-            if response and response.get('primary_response'):
-                return jsonify({
-                    "success": True,
-                    "response": response['primary_response'],
-                    "source": response['source'],
-                    "timestamp": response['timestamp'],
-                    "file_info": {
-                        "filename": filename,
-                        "type": query_type,
-                        "size": len(file_data)
-                    }
-                })
-            else:
-                return jsonify({"error": "Unable to process file at the moment"}), 500
-        else:
-            allowed_exts = ', '.join(sorted(ALLOWED_EXTENSIONS))
-            return jsonify({
-                "error": f"File type not allowed. Supported formats: {allowed_exts}"
-            }), 400
+                payload, status = submit_upload_job(upload, description, language, session_id)
+            finally:
+                release_upload(upload)
+            response = jsonify(payload)
+            if status == 429:
+                response.headers['Retry-After'] = str(JOB_RETRY_AFTER_SECONDS)
+            return response, status
+        
+        # Process based on file type, unless this exact file was analysed already
+        try:
+            response = upload['cached_response']
+            if not response:
+                response = health_api.process_health_query(**upload_query(upload, description, language))
+                record_upload_analysis(upload, description, response, language)
+        except Exception as e:
+            logger.error(f"Error processing {upload['type']} file: {e}")
+            return jsonify({"error": f"Failed to process {upload['type']} file"}), 500
+        finally:
+            release_upload(upload)
+        
+        record_upload_exchange(session_id, upload, description, response, language)
+        payload, status = upload_payload(response, upload, session_id)
+        return jsonify(payload), status
             
     except Exception as e:
         logger.error(f"Error in upload endpoint: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status or result of a background upload job
+
+    ``?wait=N`` holds the request for up to N seconds (capped) until the job finishes.
+    """
+    try:
+        wait = job_wait_seconds()
+        if wait > 0:
+            job_queue.wait(job_id, wait)
+        
+        payload, status = job_payload(job_id)
+        return jsonify(payload), status
+        
+    except ValueError:
+        return jsonify({"error": "Invalid query parameter"}), 400
+    except Exception as e:
+        logger.error(f"Error in jobs endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def job_wait_seconds():
+    """Read the ``?wait=`` query parameter as finite seconds within [0, JOB_MAX_WAIT_SECONDS]"""
+    wait = float(request.args.get('wait', 0))
+    if not math.isfinite(wait):
+        raise ValueError(f"wait must be a finite number, got {wait}")
+    return max(0.0, min(wait, JOB_MAX_WAIT_SECONDS))
+
+def history_limit(name, default):
+    """Read a non-negative integer query parameter capped at HISTORY_MAX_LIMIT"""
+    return max(0, min(int(request.args.get(name, default)), HISTORY_MAX_LIMIT))
+
+def export_authorized(authorization):
+    """Check an Authorization header against EXPORT_ADMIN_TOKEN (never true when it isn't set)"""
+    scheme, _, token = (authorization or '').partition(' ')
+    return bool(EXPORT_ADMIN_TOKEN) and scheme.lower() == 'bearer' and \
+        hmac.compare_digest(token.encode('utf-8'), EXPORT_ADMIN_TOKEN.encode('utf-8'))
+
+def unauthorized():
+    return jsonify({"error": "Unauthorized"}), 401, {'WWW-Authenticate': 'Bearer'}
+
+@app.route('/api/sessions', methods=['GET'])
+def get_sessions():
+    """List chat sessions of a user (``?user_id=``) or by id (``?ids=a,b``)
+
+    Clients list their own sessions by the session ids they were given; a user's
+    sessions and bare session ids need the admin token. ``?messages=N`` includes
+    the latest N messages of each session.
+    """
+    try:
+        user_id = request.args.get('user_id')
+        ids = request.args.get('ids')
+        if not user_id and not ids:
+            return jsonify({"error": "user_id or ids is required"}), 400
+        
+        admin = export_authorized(request.headers.get('Authorization'))
+        if user_id and not admin:
+            return unauthorized()
+        session_ids = [value for value in ids.split(',') if value] if ids else None
+        if session_ids and not admin:
+            session_ids = [session_from_token(value) for value in session_ids]
+            if None in session_ids:
+                return unauthorized()
+        
+        limit = history_limit('limit', 20)
+        messages = history_limit('messages', 0)
+        
+        # Make sure messages still queued by the writer are visible
+        if message_writer and messages:
+            message_writer.flush()
+        
+        with app.app_context():
+            sessions = list_sessions(
+                user_id=user_id,
+                session_ids=session_ids,
+                limit=limit,
+                messages_per_session=messages,
+                raw_json=FAST_JSON_ENABLED
+            )
+        return jsonify({"success": True, "sessions": sessions})
+        
+    except ValueError:
+        return jsonify({"error": "Invalid query parameter"}), 400
+    except Exception as e:
+        logger.error(f"Error in sessions endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/sessions/<session_id>/history', methods=['GET'])
+def get_history(session_id):
+    """Get a chat session with a page of its messages
+
+    ``session_id`` is the id the client was given; a bare session id needs the admin
+    token. Pages hold ``?limit=`` messages (default 50). Without a cursor the newest
+    page is returned; pass ``?cursor=`` with ``?direction=older`` or ``newer`` to page
+    from one of the cursors in the previous response.
+    """
+    if not export_authorized(request.headers.get('Authorization')):
+        session_id = session_from_token(session_id)
+        if not session_id:
+            return unauthorized()
+    
+    try:
+        limit = max(1, history_limit('limit', 50))
+        
+        if message_writer:
+            message_writer.flush()
+        
+        with app.app_context():
+            session = get_session_history(session_id, limit=limit,
+                                          cursor=request.args.get('cursor'),
+                                          direction=request.args.get('direction', 'older'),
+                                          raw_json=FAST_JSON_ENABLED)
+        if session is None:
+            return jsonify({"error": "Session not found"}), 404
+        return jsonify({"success": True, "session": session})
+        
+    except ValueError:
+        return jsonify({"error": "Invalid query parameter"}), 400
+    except Exception as e:
+        logger.error(f"Error in history endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/users/<user_id>/export', methods=['GET'])
+def export_user(user_id):
+    """Stream everything stored for a user as NDJSON (see data_export.py)
+
+    Only served when EXPORT_ADMIN_TOKEN is set, to callers that send it. The body is
+    gzip-compressed on the fly when the client accepts gzip. It ends with an ``end``
+    record; a download without one was cut short by an error.
+    """
+    if not EXPORT_ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not export_authorized(request.headers.get('Authorization')):
+        return unauthorized()
+    
+    try:
+        if message_writer:
+            message_writer.flush()
+        
+        with app.app_context():
+            if not user_has_data(user_id):
+                return jsonify({"error": "User not found"}), 404
+        
+    except ValueError:
+        return jsonify({"error": "Invalid user id"}), 400
+    except Exception as e:
+        logger.error(f"Error in export endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+    
+    compress = request.accept_encodings['gzip'] > 0
+    
+    def generate():
+        try:
+            with app.app_context():
+                yield from export_stream(user_id, app.json.dumps, batch_size=EXPORT_BATCH_SIZE,
+                                         compress=compress, raw_json=FAST_JSON_ENABLED)
+        except Exception as e:
+            logger.error(f"Error in export endpoint: {e}")
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename="aarogyalink-export-{secure_filename(user_id)}.ndjson"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
 @app.route('/api/contact', methods=['POST'])
 def contact():
     """Handle contact form submissions"""
@@ -432,8 +1990,44 @@ def not_found(e):
 def internal_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
+def after_fork():
+    """Replace resources inherited from a pre-fork server's master in a new worker
+
+    Pooled database connections and SQLite handles must not be shared between
+    processes. Background threads start on first use, so none were inherited.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if response_cache is not None:
+        response_cache.reopen()
+    if rate_limiter is not None:
+        rate_limiter.store.reopen()
+
+def warm_up():
+    """Create any missing database tables and build the provider clients ahead of the
+    first request
+
+    Every entry point calls this before serving. The production server calls it before
+    it forks, so every worker inherits the imported SDKs instead of importing them on
+    its first request.
+    """
+    try:
+        create_tables(app)
+    except Exception as e:
+        logger.error(f"Failed to create database tables: {e}")
+    providers.warm_up()
+
+def close_background_writers():
+    """Write queued chat messages and telemetry before a worker exits"""
+    if message_writer:
+        message_writer.close()
+    if telemetry:
+        telemetry.close()
+
 def open_browser(url, delay=1.5):
     """Open the URL in Microsoft Edge browser after a delay"""
+    import webbrowser
+
     def open_browser_delayed():
         time.sleep(delay)
         try:
@@ -488,5 +2082,12 @@ if __name__ == '__main__':
     # Commented out browser auto-open for production
     # open_browser(server_url)
     
-    # Start the Flask server with debug disabled for production
-    app.run(debug=debug, host=host, port=port)
\ No newline at end of file
+    if os.environ.get('SERVER_MODE', 'dev') == 'production':
+        # Pre-fork gunicorn workers sharing this preloaded app (see production.py)
+        from production import serve, production_options
+        warm_up()
+        serve(app, production_options(host, port), post_fork=after_fork, worker_exit=close_background_writers)
+    else:
+        # Start the Flask server with debug disabled for production
+        warm_up()
+        app.run(debug=debug, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,403 @@
+"""
+AarogyaLink ASGI Entry Point
+Async serving mode: /api/chat and /api/upload run on asyncio so a slow provider call
+doesn't pin an OS thread. Every other route is delegated to the Flask app.
+
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextvars
+import io
+import sys
+import time
+
+from werkzeug.wrappers import Request
+
+from app import (
+    app as flask_app,
+    health_api,
+    logger,
+    log_chat_input,
+    resolve_chat_session,
+    build_chat_context,
+    record_chat_exchange,
+    record_upload_exchange,
+    chat_payload,
+    chat_stream_event,
+    sse_event,
+    SSE_HEADERS,
+    prepare_upload,
+    upload_query,
+    record_upload_analysis,
+    is_job_request,
+    is_job_submission,
+    submit_upload_job,
+    JOB_RETRY_AFTER_SECONDS,
+    release_upload,
+    upload_payload,
+    close_teachable_async_client,
+    message_writer,
+    telemetry,
+    METRICS_ENABLED,
+    http_requests,
+    http_latency,
+    http_in_flight,
+    client_identities,
+    admit_request,
+    release_provider_slot,
+    warm_up
+)
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request body exceeds MAX_CONTENT_LENGTH"""
+
+
+async def read_body(receive, limit=None):
+    """Read the full request body from the ASGI receive channel"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected")
+
+        body = message.get('body', b'')
+        size += len(body)
+        if limit is not None and size > limit:
+            raise RequestTooLarge()
+        chunks.append(body)
+
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def wsgi_environ(scope, body):
+    """Build a WSGI environ for an ASGI HTTP scope and its buffered body"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f"HTTP_{key}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ and key.startswith('HTTP_') else value
+
+    return environ
+
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200, headers=None):
+    """Send a JSON response encoded the same way as Flask's jsonify"""
+    body = (flask_app.json.dumps(payload, separators=(",", ":")) + "\n").encode('utf-8')
+    await send_response(send, status, [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(body))),
+        ('Access-Control-Allow-Origin', '*')
+    ] + (headers or []), body)
+
+
+async def handle_chat(request, send):
+    """Async /api/chat with the same JSON contract as the Flask route"""
+    try:
+        data = request.get_json()
+
+        if not data or 'message' not in data:
+            return await send_json(send, {"error": "Message is required"}, 400)
+
+        message = data['message']
+        source = data.get('source', 'text')  # 'text' or 'voice'
+        language = data.get('language', 'en')
+
+        log_chat_input(message, source)
+
+        session_id = resolve_chat_session(data.get('session_id'), language)
+        context = await asyncio.to_thread(build_chat_context, session_id)
+
+        response = await health_api.process_health_query_async("text", message, source=source, language=language,
+                                                               context=context)
+
+        record_chat_exchange(session_id, message, response, language=language,
+                             metadata={"input_source": source} if source != 'text' else None)
+        payload, status = chat_payload(response, source, session_id)
+
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {e}")
+        payload, status = {"error": "Internal server error"}, 500
+
+    await send_json(send, payload, status)
+
+
+async def handle_chat_stream(request, send):
+    """Async /api/chat/stream, forwarding Gemini tokens as Server-Sent Events"""
+    try:
+        data = request.get_json()
+
+        if not data or 'message' not in data:
+            return await send_json(send, {"error": "Message is required"}, 400)
+
+        message = data['message']
+        source = data.get('source', 'text')  # 'text' or 'voice'
+        language = data.get('language', 'en')
+        session_id = resolve_chat_session(data.get('session_id'), language)
+
+        log_chat_input(message, source)
+
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        return await send_json(send, {"error": "Internal server error"}, 500)
+
+    headers = [('Content-Type', 'text/event-stream; charset=utf-8'), ('Access-Control-Allow-Origin', '*')]
+    headers += list(SSE_HEADERS.items())
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+
+    try:
+        context = await asyncio.to_thread(build_chat_context, session_id)
+        async for event, value in health_api.stream_health_query_async(message, source=source, language=language,
+                                                                       context=context):
+            if event == "done":
+                record_chat_exchange(session_id, message, value, language=language,
+                                     metadata={"input_source": source} if source != 'text' else None)
+            frame = chat_stream_event(event, value, source, session_id)
+            await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        frame = sse_event("error", {"error": "Internal server error"})
+        await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def handle_upload(request, send):
+    """Async /api/upload with the same JSON contract as the Flask route"""
+    try:
+        if 'file' not in request.files:
+            return await send_json(send, {"error": "No file provided"}, 400)
+
+        file = request.files['file']
+        query_type = request.form.get('type', 'auto')  # auto-detect if not specified
+        description = request.form.get('description', '')
+        language = request.form.get('language', 'en')
+
+        if file.filename == '':
+            return await send_json(send, {"error": "No file selected"}, 400)
+
+        # Validation touches the spooled file, PIL and the database, keep it off the loop
+        upload, error = await asyncio.to_thread(prepare_upload, file, query_type, description, language)
+        if error:
+            return await send_json(send, error[0], error[1])
+
+        session_id = resolve_chat_session(request.form.get('session_id'), language)
+
+        # In job mode the analysis runs on a worker and the client polls /api/jobs/<id>
+        if is_job_request(request) and not upload['cached_response']:
+            try:
+                payload, status = await asyncio.to_thread(submit_upload_job, upload, description, language, session_id)
+            finally:
+                release_upload(upload)
+            headers = [('Retry-After', str(JOB_RETRY_AFTER_SECONDS))] if status == 429 else None
+            return await send_json(send, payload, status, headers)
+
+        try:
+            response = upload['cached_response']
+            if not response:
+                response = await health_api.process_health_query_async(**upload_query(upload, description, language))
+                await asyncio.to_thread(record_upload_analysis, upload, description, response, language)
+        except Exception as e:
+            logger.error(f"Error processing {upload['type']} file: {e}")
+            return await send_json(send, {"error": f"Failed to process {upload['type']} file"}, 500)
+        finally:
+            release_upload(upload)
+
+        record_upload_exchange(session_id, upload, description, response, language)
+        payload, status = upload_payload(response, upload, session_id)
+
+    except Exception as e:
+        logger.error(f"Error in upload endpoint: {e}")
+        payload, status = {"error": f"Internal server error: {str(e)}"}, 500
+
+    await send_json(send, payload, status)
+
+
+def close_body(result):
+    if hasattr(result, 'close'):
+        result.close()
+
+
+async def call_flask(environ, send):
+    """Serve a request through the Flask WSGI app on worker threads
+
+    A body of known length is read in one go and sent in one piece. One without a
+    Content-Length (a streamed response such as the data export) is forwarded chunk
+    by chunk with ``more_body``, so it is never held in memory whole.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    def run():
+        result = flask_app(environ, start_response)
+        if not any(name.lower() == 'content-length' for name, _ in response['headers']):
+            return result, None
+        try:
+            return None, b''.join(result)
+        finally:
+            close_body(result)
+
+    # Every step runs in one context, so app contexts a streamed body pushes stay visible
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+
+    def in_context(func, *args):
+        return loop.run_in_executor(None, context.run, func, *args)
+
+    result, body = await in_context(run)
+    if result is None:
+        return await send_response(send, response['status'], response['headers'], body)
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': response['status'],
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response['headers']]
+        })
+        chunks = iter(result)
+        while True:
+            chunk = await in_context(next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await in_context(close_body, result)
+
+
+def admit(request):
+    """Parse the request body and apply admission control, on a worker thread
+
+    Multipart parsing of a large upload and a SQLite-backed rate limiter both
+    block, so handlers only ever read the body Werkzeug has already cached.
+    """
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        request.form
+    else:
+        request.get_json(silent=True)
+    return admit_request(request.path, client_identities(request.remote_addr, request.headers),
+                         not is_job_submission(request.path, request))
+
+
+async def call_admitted(handler, request, send):
+    """Run an async route handler if admission control lets the request in"""
+    slot, rejection = await asyncio.to_thread(admit, request)
+    if rejection:
+        payload, status, retry_after = rejection
+        return await send_json(send, payload, status, [('Retry-After', retry_after)])
+    try:
+        await handler(request, send)
+    finally:
+        if slot:
+            release_provider_slot()
+
+
+async def call_handler(handler, route, request, send):
+    """Run an async route handler, recording the same request metrics as the Flask hooks"""
+    if not METRICS_ENABLED:
+        return await handler(request, send)
+
+    status = {'code': 500}
+
+    async def send_with_status(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+        await send(message)
+
+    started = time.perf_counter()
+    http_in_flight.inc(route)
+    try:
+        await handler(request, send_with_status)
+    finally:
+        http_in_flight.dec(route)
+        http_requests.inc(route, request.method, status['code'])
+        http_latency.observe(route, request.method, value=time.perf_counter() - started)
+
+
+ASYNC_ROUTES = {
+    '/api/chat': handle_chat,
+    '/api/chat/stream': handle_chat_stream,
+    '/api/upload': handle_upload
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.to_thread(warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_teachable_async_client()
+            if message_writer:
+                await asyncio.to_thread(message_writer.close)
+            if telemetry:
+                await asyncio.to_thread(telemetry.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application callable"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    try:
+        body = await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+    except RequestTooLarge:
+        return await send_json(send, {"error": "File too large"}, 413)
+    except ConnectionError:
+        return
+
+    environ = wsgi_environ(scope, body)
+    handler = ASYNC_ROUTES.get(scope['path'])
+
+    # CORS preflight and any other method fall through to Flask
+    if handler and scope['method'] == 'POST':
+        await call_handler(lambda request, send: call_admitted(handler, request, send),
+                           scope['path'], Request(environ), send)
+    else:
+        await call_flask(environ, send)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Export Memory Benchmark
+Peak Python memory and time of exporting one user's history at increasing sizes:
+loading it all (get_user_sessions, every session's messages and to_dict, then one
+JSON document) vs the streaming NDJSON export in data_export.py.
+
+For each size in --messages, a temporary SQLite database gets one user with that
+many messages spread over sessions of --per-session messages, plus an upload and a
+health record per session. Both exports are written to a null sink; peak memory is
+measured with tracemalloc, so it covers the Python objects each way builds.
+
+Usage:
+    python benchmarks/export_memory.py [--messages 1000,10000,100000] [--per-session 200] [--gzip]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+from flask import Flask  # noqa: E402
+
+from data_export import export_stream  # noqa: E402
+from json_provider import FastJSONProvider  # noqa: E402
+from models import (db, init_db, User, ChatSession, Message, FileUpload, HealthRecord,  # noqa: E402
+                    get_user_sessions)
+
+USER_ID = "00000000-0000-4000-9000-000000000001"
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    return app
+
+
+def generate(app, messages, per_session):
+    started = datetime(2020, 1, 1)
+    metadata = json.dumps({"input_source": "text", "tokens": {"prompt": 120, "output": 80}})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(user_id=USER_ID, username='benchmark'))
+        sessions, rows, uploads, records = [], [], [], []
+        for index in range(messages):
+            if index % per_session == 0:
+                session_id = str(uuid.uuid4())
+                sessions.append({'session_id': session_id, 'user_id': USER_ID,
+                                 'created_at': started + timedelta(days=len(sessions))})
+                uploads.append({'user_id': USER_ID, 'original_filename': 'rash.png', 'file_type': 'image',
+                                'file_size': 2048, 'analysis_results': json.dumps({"response": "A mild rash"})})
+                records.append({'user_id': USER_ID, 'session_id': session_id, 'record_type': 'symptom',
+                                'record_data': json.dumps({"symptom": "fever", "days": 2})})
+            rows.append({'session_id': session_id, 'sender_type': 'user' if index % 2 == 0 else 'ai',
+                         'message_type': 'text', 'message_metadata': metadata,
+                         'content': f"Message {index}: I have had a mild fever since yesterday evening.",
+                         'created_at': started + timedelta(days=len(sessions) - 1, seconds=index % per_session)})
+        db.session.execute(db.insert(ChatSession), sessions)
+        db.session.execute(db.insert(Message), rows)
+        db.session.execute(db.insert(FileUpload), uploads)
+        db.session.execute(db.insert(HealthRecord), records)
+        db.session.commit()
+
+
+def load_all_export(app, compress):
+    """Everything in memory at once, the way the existing helpers would build it"""
+    sessions = []
+    for session in get_user_sessions(USER_ID, limit=None):
+        data = session.to_dict()
+        data['messages'] = [message.to_dict() for message in session.messages]
+        data['health_records'] = [record.to_dict() for record in session.health_records]
+        sessions.append(data)
+    uploads = [upload.to_dict() for upload in FileUpload.query.filter_by(user_id=USER_ID)]
+    body = app.json.dumps({'user_id': USER_ID, 'sessions': sessions, 'file_uploads': uploads}).encode('utf-8')
+    if compress:
+        import gzip
+        body = gzip.compress(body)
+    return len(body)
+
+
+def streaming_export(app, compress):
+    return sum(len(chunk) for chunk in export_stream(USER_ID, app.json.dumps, compress=compress, raw_json=True))
+
+
+def measure(app, export, compress):
+    with app.app_context():
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = export(app, compress)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    return {'peak_mb': round(peak / 1024 / 1024, 1), 'wall_s': round(elapsed, 2), 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', default='1000,10000,100000', help='comma-separated history sizes')
+    parser.add_argument('--per-session', type=int, default=200, help='messages per session')
+    parser.add_argument('--gzip', action='store_true', help='gzip-compress both exports')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for messages in [int(value) for value in args.messages.split(',')]:
+        with tempfile.TemporaryDirectory() as directory:
+            app = make_app(os.path.join(directory, 'export.db'))
+            generate(app, messages, args.per_session)
+            results.append({
+                'messages': messages,
+                'load_all': measure(app, load_all_export, args.gzip),
+                'streaming': measure(app, streaming_export, args.gzip)
+            })
+            with app.app_context():
+                db.engine.dispose()
+
+    print(f"{args.per_session} messages per session{', gzip' if args.gzip else ''}")
+    print("=" * 72)
+    print(f"{'messages':>10}{'export MB':>11}{'load-all peak MB':>18}{'s':>7}{'streaming peak MB':>19}{'s':>7}")
+    print("=" * 72)
+    for row in results:
+        print(f"{row['messages']:>10}{row['streaming']['bytes'] / 1024 / 1024:>11.1f}"
+              f"{row['load_all']['peak_mb']:>18}{row['load_all']['wall_s']:>7}"
+              f"{row['streaming']['peak_mb']:>19}{row['streaming']['wall_s']:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'per_session': args.per_session, 'gzip': args.gzip, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink History Paging Benchmark
+Latency of fetching one page of a chat session's history at increasing depth:
+OFFSET paging vs keyset paging (models.get_message_page) on a generated SQLite table.
+
+The table holds --messages rows spread evenly over --sessions sessions. Three ways of
+reading a page are timed at several depths of one session:
+
+    offset-unindexed  ORDER BY created_at OFFSET n without the composite index (the
+                      plan get_chat_history had before ix_messages_session_created)
+    offset-indexed    the same OFFSET query using the composite index
+    keyset            get_message_page with a cursor for that depth
+
+The generated database is kept at --database and reused when it already holds the
+requested number of messages, since generating 10M rows takes a few minutes.
+
+Usage:
+    python benchmarks/history_paging.py [--messages 10000000] [--sessions 100] [--page-size 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+from flask import Flask  # noqa: E402
+from sqlalchemy.orm import raiseload, selectinload  # noqa: E402
+
+from models import db, init_db, create_tables, Message, get_message_page, encode_cursor  # noqa: E402
+
+SESSION_ID = "00000000-0000-4000-9000-{:012d}"
+CHUNK = 1_000_000
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    return app
+
+
+def generate(app, messages, sessions):
+    """Fill the messages table, building the composite index after the rows are in"""
+    per_session = messages // sessions
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.text("DROP INDEX IF EXISTS ix_messages_session_created"))
+        db.session.execute(db.text("PRAGMA journal_mode=OFF"))
+        db.session.execute(db.text("PRAGMA synchronous=OFF"))
+
+        db.session.execute(db.text(
+            "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < :sessions) "
+            "INSERT INTO chat_sessions (session_id, session_name, created_at) "
+            "SELECT printf('00000000-0000-4000-9000-%012d', i), 'Generated session', '2024-01-01 00:00:00.000000' FROM n"
+        ), {"sessions": sessions})
+
+        # Messages are interleaved across sessions like concurrent conversations
+        for start in range(0, messages, CHUNK):
+            started = time.perf_counter()
+            db.session.execute(db.text(
+                "WITH RECURSIVE n(i) AS (SELECT :start UNION ALL SELECT i + 1 FROM n WHERE i + 1 < :stop) "
+                "INSERT INTO messages (message_id, session_id, sender_type, message_type, content, language, "
+                "is_sensitive, created_at) "
+                "SELECT printf('00000000-0000-4000-8000-%012d', i), "
+                "printf('00000000-0000-4000-9000-%012d', i % :sessions), "
+                "CASE i % 2 WHEN 0 THEN 'user' ELSE 'ai' END, 'text', "
+                "'Generated message ' || i || ': mild headache since this morning, no fever.', 'en', 0, "
+                "datetime('2024-01-01', '+' || (i / :sessions) || ' seconds') || '.000000' FROM n"
+            ), {"start": start, "stop": min(start + CHUNK, messages), "sessions": sessions})
+            db.session.commit()
+            print(f"  {min(start + CHUNK, messages):>12,} messages ({time.perf_counter() - started:.1f} s)")
+
+        started = time.perf_counter()
+        create_tables(app)
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+        print(f"  indexes built ({time.perf_counter() - started:.1f} s)")
+    return per_session
+
+
+def offset_page(session_id, limit, offset, indexed):
+    if indexed:
+        query = db.select(Message).where(Message.session_id == session_id)\
+                  .order_by(Message.created_at, Message.id).offset(offset).limit(limit)
+    else:
+        # SQLAlchemy doesn't render SQLite index hints, so spell the query out
+        query = db.select(Message).from_statement(db.text(
+            "SELECT * FROM messages NOT INDEXED WHERE session_id = :session_id "
+            "ORDER BY created_at, id LIMIT :limit OFFSET :offset"
+        ).bindparams(session_id=session_id, limit=limit, offset=offset))
+    return list(db.session.execute(
+        query.options(selectinload(Message.file_uploads), raiseload('*'))
+    ).scalars())
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+        db.session.expunge_all()
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--unindexed-repeats', type=int, default=1,
+                        help='repeats for the unindexed OFFSET query, which scans the whole table')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'aarogyalink_history_bench.db'))
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = make_app(args.database)
+    with app.app_context():
+        db.create_all()
+        existing = db.session.scalar(db.select(db.func.max(Message.id))) or 0
+    if existing != args.messages:
+        print(f"Generating {args.messages:,} messages in {args.database}")
+        with app.app_context():
+            db.drop_all()
+        generate(app, args.messages, args.sessions)
+
+    per_session = args.messages // args.sessions
+    session_id = SESSION_ID.format(args.sessions // 2)
+    depths = sorted({0, per_session // 100, per_session // 10, per_session // 2, per_session - args.page_size})
+
+    results = []
+    with app.app_context():
+        for depth in depths:
+            # Keyset cursor for the same position: the message just before the page
+            cursor = None
+            if depth:
+                cursor = encode_cursor(offset_page(session_id, 1, depth - 1, indexed=True)[0])
+
+            expected = [message.message_id for message in offset_page(session_id, args.page_size, depth, True)]
+            page = get_message_page(session_id, args.page_size, cursor, direction='newer')
+            assert [message['message_id'] for message in page['messages']] == expected
+
+            results.append({
+                'depth': depth,
+                'offset_unindexed_ms': timed(lambda: offset_page(session_id, args.page_size, depth, False),
+                                             args.unindexed_repeats),
+                'offset_indexed_ms': timed(lambda: offset_page(session_id, args.page_size, depth, True), args.repeats),
+                'keyset_ms': timed(lambda: get_message_page(session_id, args.page_size, cursor, 'newer'), args.repeats)
+            })
+
+    print(f"{args.messages:,} messages, {per_session:,} per session, page size {args.page_size}")
+    print("=" * 68)
+    print(f"{'depth':>10}{'offset unindexed ms':>22}{'offset indexed ms':>20}{'keyset ms':>14}")
+    print("=" * 68)
+    for result in results:
+        print(f"{result['depth']:>10,}{result['offset_unindexed_ms']:>22}"
+              f"{result['offset_indexed_ms']:>20}{result['keyset_ms']:>14}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'messages': args.messages, 'sessions': args.sessions, 'page_size': args.page_size,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink History Serialization Benchmark
+Cost of turning a chat history of --messages messages (default 5,000) into a JSON
+response body, with Flask's default JSON provider vs json_provider.FastJSONProvider.
+
+The messages are generated in a temporary SQLite database with a metadata JSON column
+of --metadata-items entries each, and a file upload with analysis results on every
+tenth message, then loaded once. Each variant builds the response body from the loaded
+rows (to_dict, then encoding):
+
+    stdlib             json.loads of every JSON column and Flask's default provider
+                       (the path before FastJSONProvider)
+    orjson             FastJSONProvider, JSON columns decoded with orjson
+    orjson-cached      the same rows serialized again, reusing the decoded columns
+    orjson-fragments   FastJSONProvider with JSON columns embedded as they are stored
+                       (raw_json, what the history routes use)
+
+Without orjson installed, FastJSONProvider falls back to the default provider and the
+orjson rows measure that fallback.
+
+Usage:
+    python benchmarks/history_serialization.py [--messages 5000] [--metadata-items 20] [--repeat 5]
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+import json_provider  # noqa: E402
+from json_provider import FastJSONProvider  # noqa: E402
+from models import db, init_db, ChatSession, Message, FileUpload  # noqa: E402
+
+SESSION_ID = "00000000-0000-4000-9000-000000000001"
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    return app
+
+
+def generate(app, messages, metadata_items):
+    """One session with ``messages`` messages, and an analysed upload on every tenth"""
+    started = datetime(2024, 1, 1)
+    with app.app_context():
+        db.create_all()
+        db.session.add(ChatSession(session_id=SESSION_ID, session_name="Benchmark"))
+        rows, uploads = [], []
+        for index in range(messages):
+            message_id = f"00000000-0000-4000-8000-{index:012d}"
+            metadata = {f"field_{item}": {"position": index, "score": item / 10, "tags": ["fever", "cough"]}
+                        for item in range(metadata_items)}
+            rows.append({
+                'message_id': message_id, 'session_id': SESSION_ID,
+                'sender_type': 'user' if index % 2 == 0 else 'ai', 'message_type': 'text',
+                'content': f"Message {index}: I have had a mild fever since yesterday evening.",
+                'message_metadata': json.dumps(metadata), 'language': 'en',
+                'created_at': started + timedelta(seconds=index)
+            })
+            if index % 10 == 0:
+                uploads.append({
+                    'file_id': f"00000000-0000-4000-a000-{index:012d}", 'message_id': message_id,
+                    'original_filename': f"rash-{index}.png", 'stored_filename': f"rash-{index}.png",
+                    'upload_path': f"uploads/rash-{index}.png", 'file_type': 'image', 'mime_type': 'image/png',
+                    'file_size': 2048, 'is_processed': True,
+                    'analysis_results': json.dumps({'analysis': "A mild rash, likely contact dermatitis. " * 5,
+                                                    'source': 'gemini', 'confidence': 0.9})
+                })
+        db.session.execute(db.insert(Message), rows)
+        db.session.execute(db.insert(FileUpload), uploads)
+        db.session.commit()
+
+
+def clear_decoded(messages):
+    """Forget the decoded JSON columns, as for rows freshly loaded from the database"""
+    for message in messages:
+        vars(message).pop('_decoded_json', None)
+        for upload in message.file_uploads:
+            vars(upload).pop('_decoded_json', None)
+
+
+def run_variant(messages, provider, raw_json, cached, fallback, repeat):
+    to_dict_times, encode_times = [], []
+    size = 0
+    for _ in range(repeat):
+        if cached:
+            [message.to_dict(include_files=True) for message in messages]
+        else:
+            clear_decoded(messages)
+        orjson = json_provider.orjson
+        if fallback:
+            json_provider.orjson = None
+        try:
+            gc.disable()
+            started = time.perf_counter()
+            data = [message.to_dict(include_files=True, raw_json=raw_json) for message in messages]
+            built = time.perf_counter()
+            body = provider.response({"success": True, "session": {"messages": data}}).get_data()
+            finished = time.perf_counter()
+        finally:
+            gc.enable()
+            json_provider.orjson = orjson
+        to_dict_times.append(built - started)
+        encode_times.append(finished - built)
+        size = len(body)
+    to_dict_ms = statistics.median(to_dict_times) * 1000
+    encode_ms = statistics.median(encode_times) * 1000
+    return {'to_dict_ms': round(to_dict_ms, 2), 'encode_ms': round(encode_ms, 2),
+            'total_ms': round(to_dict_ms + encode_ms, 2), 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help='messages in the history')
+    parser.add_argument('--metadata-items', type=int, default=20, help='entries in each message metadata column')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per variant (the median is reported)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(os.path.join(directory, 'history.db'))
+        generate(app, args.messages, args.metadata_items)
+        default_provider = DefaultJSONProvider(app)
+        fast_provider = FastJSONProvider(app)
+
+        with app.app_context():
+            messages = db.session.execute(
+                db.select(Message).where(Message.session_id == SESSION_ID)
+                .options(selectinload(Message.file_uploads)).order_by(Message.created_at, Message.id)
+            ).scalars().all()
+
+            variants = [
+                ('stdlib', default_provider, False, False, True),
+                ('orjson', fast_provider, False, False, False),
+                ('orjson-cached', fast_provider, False, True, False),
+                ('orjson-fragments', fast_provider, True, False, False),
+            ]
+            results = {}
+            for name, provider, raw_json, cached, fallback in variants:
+                results[name] = run_variant(messages, provider, raw_json, cached, fallback, args.repeat)
+
+    print(f"{args.messages} messages, {args.metadata_items} metadata items each, "
+          f"orjson {'installed' if json_provider.orjson else 'not installed'}")
+    print("=" * 70)
+    print(f"{'Variant':<20}{'to_dict ms':>12}{'encode ms':>12}{'total ms':>12}{'KB':>8}{'speedup':>9}")
+    print("=" * 70)
+    baseline = results['stdlib']['total_ms']
+    for name, row in results.items():
+        row['speedup'] = round(baseline / row['total_ms'], 2)
+        print(f"{name:<20}{row['to_dict_ms']:>12.2f}{row['encode_ms']:>12.2f}{row['total_ms']:>12.2f}"
+              f"{row['bytes'] / 1024:>8.0f}{row['speedup']:>8.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'messages': args.messages, 'metadata_items': args.metadata_items,
+                       'orjson': json_provider.orjson is not None, 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
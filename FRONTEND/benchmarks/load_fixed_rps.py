@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Fixed-RPS Load Test
+Throughput, latency percentiles and error rates of /api/chat and /api/upload at a
+fixed request rate, against a server running the offline fake providers
+(FAKE_PROVIDERS=True, see fake_providers.py), so no API keys or quota are needed.
+
+Requests are sent open-loop: one every 1/--rps seconds whether or not earlier ones
+have finished, and latency is measured from each request's scheduled send time, so
+a server that falls behind shows it in the percentiles instead of slowing the load.
+Chat messages and upload images are unique per request, so no cache answers them.
+
+The server is started in --server mode (dev: Werkzeug threaded, asgi: uvicorn,
+production: pre-fork gunicorn) with a fresh SQLite database and rate limiting off;
+--url targets a server that is already running instead. Provider behaviour is set
+with --latency, --error-rate and --output-tokens (distributions as accepted by
+fake_providers.parse_distribution, e.g. lognormal:0.8,0.5 or uniform:0.2,1.0).
+
+Results are written as JSON to --output for tracking regressions between runs.
+
+Usage:
+    python benchmarks/load_fixed_rps.py [--server dev] [--rps 20] [--duration 30] [--routes chat,upload]
+"""
+
+import argparse
+import asyncio
+import collections
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+ROUTES = ('chat', 'upload')
+
+
+def serve(mode, port, workers, threads):
+    """Run the app in the given server mode; providers are faked through the environment"""
+    import logging
+    import app as backend
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    backend.warm_up()
+
+    if mode == 'dev':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', port, backend.app, threaded=True)
+        server.socket.listen(4096)
+        server.serve_forever()
+    elif mode == 'asgi':
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+    else:
+        from production import serve as serve_production, production_options
+        options = {**production_options('127.0.0.1', port, workers, threads), 'loglevel': 'warning'}
+        serve_production(backend.app, options, post_fork=backend.after_fork,
+                         worker_exit=backend.close_background_writers)
+
+
+def make_images(count):
+    """Small PNGs that differ in one pixel, so each upload has its own content hash"""
+    from PIL import Image
+
+    images = []
+    for index in range(count):
+        image = Image.new('RGB', (64, 64), (220, 180, 170))
+        image.putpixel((index % 64, index // 64 % 64), (index % 256, index // 256 % 256, 0))
+        data = io.BytesIO()
+        image.save(data, 'PNG')
+        images.append(data.getvalue())
+    return images
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run_route(base_url, route, rps, duration, timeout):
+    import httpx
+
+    total = int(rps * duration)
+    images = make_images(total) if route == 'upload' else None
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def one(index, scheduled):
+            try:
+                if route == 'chat':
+                    response = await client.post('/api/chat', json={
+                        "message": f"I have had a headache for {index} hours, what should I do?"})
+                else:
+                    response = await client.post('/api/upload', data={'type': 'image'},
+                                                 files={'file': (f"rash-{index}.png", images[index], 'image/png')})
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            return status, time.perf_counter() - scheduled
+
+        tasks = []
+        started = time.perf_counter()
+        for index in range(total):
+            scheduled = started + index / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(index, scheduled)))
+        sent_for = time.perf_counter() - started
+        outcomes = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    statuses = collections.Counter(str(status) for status, _ in outcomes)
+    latencies = [latency for status, latency in outcomes if status == 200]
+    errors = total - len(latencies)
+    return {
+        'route': route,
+        'target_rps': rps,
+        'sent_rps': round(total / sent_for, 2) if sent_for else None,
+        'requests': total,
+        'ok': len(latencies),
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+        'statuses': dict(statuses)
+    }
+
+
+def wait_ready(base_url, timeout=30):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/test", timeout=1).status_code == 200:
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['dev', 'asgi', 'production'], default='dev')
+    parser.add_argument('--url', help='load an already running server instead of starting one')
+    parser.add_argument('--rps', type=float, default=20.0, help='requests per second per route')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load per route')
+    parser.add_argument('--routes', default='chat,upload', help=f"comma-separated, from {', '.join(ROUTES)}")
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request timeout in seconds')
+    parser.add_argument('--latency', default='lognormal:0.8,0.5', help='fake provider latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fake provider failure probability')
+    parser.add_argument('--output-tokens', default='uniform:40,120', help='fake provider reply tokens')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4, help='production worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='production threads per worker')
+    parser.add_argument('--port', type=int, default=5057)
+    parser.add_argument('--output', default='load_results.json', help='JSON results file')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.server, args.port, args.workers, args.threads)
+
+    routes = args.routes.split(',')
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    config = {
+        'server': 'external' if args.url else args.server, 'rps': args.rps, 'duration_s': args.duration,
+        'latency': args.latency, 'error_rate': args.error_rate, 'output_tokens': args.output_tokens,
+        'seed': args.seed
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        if not args.url:
+            env = {
+                **os.environ,
+                'PYTHONPATH': FRONTEND_DIR,
+                'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'load.db')}",
+                'FAKE_PROVIDERS': 'True',
+                'FAKE_PROVIDER_LATENCY': args.latency,
+                'FAKE_PROVIDER_ERROR_RATE': str(args.error_rate),
+                'FAKE_PROVIDER_OUTPUT_TOKENS': args.output_tokens,
+                'FAKE_PROVIDER_SEED': str(args.seed),
+                'RATE_LIMIT_ENABLED': 'False'
+            }
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve', '--server', args.server,
+                 '--port', str(args.port), '--workers', str(args.workers), '--threads', str(args.threads)],
+                cwd=directory, env=env
+            )
+        try:
+            if not wait_ready(base_url):
+                print(f"❌ server at {base_url} is not answering")
+                return 1
+            results = [asyncio.run(run_route(base_url, route, args.rps, args.duration, args.timeout))
+                       for route in routes]
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    print(f"{config['server']} server, {args.rps} req/s for {args.duration:.0f} s per route, "
+          f"provider latency {args.latency}, error rate {args.error_rate}")
+    print("=" * 80)
+    print(f"{'route':<8}{'requests':>9}{'errors':>8}{'err %':>7}{'ok req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>8}")
+    print("=" * 80)
+    for row in results:
+        print(f"{row['route']:<8}{row['requests']:>9}{row['errors']:>8}{row['error_rate'] * 100:>7.1f}"
+              f"{row['throughput_rps']:>10}{str(row['p50_ms']):>10}{str(row['p95_ms']):>10}"
+              f"{str(row['p99_ms']):>10}{str(row['max_ms']):>8}")
+        if row['errors']:
+            print(f"        statuses: {row['statuses']}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'timestamp': datetime.now().isoformat(), 'config': config, 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
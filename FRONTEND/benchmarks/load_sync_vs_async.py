@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Sync vs Async Load Test
+Compares concurrency vs server memory for the threaded Flask server and the ASGI mode.
+
+Provider calls are replaced with a fixed sleep so no API quota is used. For each
+concurrency level, N chat requests are fired at once and the server's peak RSS and
+thread count are sampled from /proc while they are in flight (Linux only).
+
+Usage:
+    python benchmarks/load_sync_vs_async.py [--latency 2.0] [--levels 50,200,1000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+
+def serve(mode, port, latency):
+    """Run the app in the given mode with provider calls replaced by a sleep"""
+    import logging
+    import app as backend
+
+    backend.warm_up()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    fake = {"text": "Simulated provider response", "usage": {}, "safety_ratings": []}
+
+    def gemini(prompt, image_data=None):
+        time.sleep(latency)
+        return fake
+
+    async def gemini_async(prompt, image_data=None):
+        await asyncio.sleep(latency)
+        return fake
+
+    backend.health_api.call_gemini_api = gemini
+    backend.health_api.call_gemini_api_async = gemini_async
+    backend.health_api.call_teachable_api = lambda prompt, context=None: None
+
+    async def teachable_async(prompt, context=None):
+        return None
+
+    backend.health_api.call_teachable_api_async = teachable_async
+
+    if mode == 'sync':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', port, backend.app, threaded=True)
+        server.socket.listen(4096)
+        server.serve_forever()
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def read_proc_status(pid):
+    """Return (rss_kb, threads) for a process from /proc"""
+    rss, threads = 0, 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, threads
+
+
+async def run_level(base_url, pid, concurrency):
+    import httpx
+
+    peak = {'rss_kb': 0, 'threads': 0}
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            rss, threads = read_proc_status(pid)
+            peak['rss_kb'] = max(peak['rss_kb'], rss)
+            peak['threads'] = max(peak['threads'], threads)
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            try:
+                response = await client.post('/api/chat', json={"message": "I have a headache"})
+                return response.status_code == 200
+            except Exception:
+                return False
+
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+
+    return {
+        'concurrency': concurrency,
+        'ok': sum(results),
+        'errors': concurrency - sum(results),
+        'wall_s': round(elapsed, 3),
+        'peak_rss_mb': round(peak['rss_kb'] / 1024, 1),
+        'peak_threads': peak['threads']
+    }
+
+
+def wait_ready(base_url, timeout=30):
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/test", timeout=1).status_code == 200:
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=2.0, help='simulated provider latency in seconds')
+    parser.add_argument('--levels', default='50,200,1000', help='comma-separated concurrency levels')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port, args.latency)
+
+    levels = [int(level) for level in args.levels.split(',')]
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+
+    for mode in ('sync', 'async'):
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', mode,
+             '--port', str(args.port), '--latency', str(args.latency)],
+            cwd=FRONTEND_DIR,
+            # Don't let the provider pool cap the sync server below the tested concurrency
+            env={**os.environ, 'PROVIDER_MAX_WORKERS': str(max(levels))}
+        )
+        try:
+            if not wait_ready(base_url):
+                print(f"❌ {mode} server did not start")
+                continue
+            idle_rss, idle_threads = read_proc_status(server.pid)
+            results[mode] = {'idle_rss_mb': round(idle_rss / 1024, 1), 'idle_threads': idle_threads, 'levels': []}
+            for concurrency in levels:
+                results[mode]['levels'].append(asyncio.run(run_level(base_url, server.pid, concurrency)))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print("=" * 72)
+    print(f"{'mode':<7}{'concurrency':>12}{'ok':>7}{'errors':>8}{'wall s':>9}{'peak RSS MB':>14}{'threads':>10}")
+    print("=" * 72)
+    for mode, data in results.items():
+        print(f"{mode:<7}{'idle':>12}{'':>7}{'':>8}{'':>9}{data['idle_rss_mb']:>14}{data['idle_threads']:>10}")
+        for row in data['levels']:
+            print(f"{mode:<7}{row['concurrency']:>12}{row['ok']:>7}{row['errors']:>8}{row['wall_s']:>9}"
+                  f"{row['peak_rss_mb']:>14}{row['peak_threads']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'latency_s': args.latency, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
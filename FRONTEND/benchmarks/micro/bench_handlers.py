@@ -0,0 +1,85 @@
+"""
+AarogyaLink Request Handler Micro-Benchmarks
+Filename checks, the upload validation path, chat JSON building and the /api/chat
+and /api/upload handlers through Flask's test client, with fake zero-latency
+providers so only the in-process work is measured
+"""
+
+import io
+import itertools
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from conftest import IMAGE_SIDES, png_bytes
+
+FILENAMES = [f"scan_{index}.{extension}" for index, extension in
+             enumerate(itertools.islice(itertools.cycle(['png', 'JPG', 'webp', 'wav', 'm4a', 'exe', 'tar.gz', '']),
+                                        1000))]
+
+
+def test_allowed_file_and_get_file_type(benchmark, backend):
+    def check():
+        return [(backend.allowed_file(name), backend.get_file_type(name)) for name in FILENAMES]
+    assert len(benchmark(check)) == 1000
+
+
+@pytest.mark.parametrize('side', IMAGE_SIDES, ids=lambda side: f"{side}px")
+def test_prepare_upload(benchmark, backend, side):
+    """Single-pass validation: spooling, hashing, cached-analysis lookup and Pillow verify"""
+    data = png_bytes(side)
+
+    def validate():
+        file = FileStorage(stream=io.BytesIO(data), filename='rash.png', content_type='image/png')
+        upload, error = backend.prepare_upload(file, 'auto')
+        backend.release_upload(upload)
+        return upload, error
+
+    upload, error = benchmark(validate)
+    assert error is None and upload['size'] == len(data)
+
+
+@pytest.mark.parametrize('chars', (200, 2000, 20000), ids=lambda chars: f"{chars}chars")
+def test_chat_payload_json(benchmark, backend, chars):
+    """Building and encoding /api/chat's response body from a query result"""
+    response = {
+        "primary_response": "That sounds uncomfortable! " * (chars // 27),
+        "secondary_response": None,
+        "source": "gemini",
+        "timestamp": "2024-01-01T12:00:00",
+        "usage": {"prompt_tokens": 230, "system_tokens": 141, "history_tokens": 40, "summary_tokens": 0,
+                  "history_turns": 2}
+    }
+
+    def build():
+        with backend.app.test_request_context():
+            payload, status = backend.chat_payload(response, 'text', 's' * 36)
+            return backend.jsonify(payload), status
+
+    body, status = benchmark(build)
+    assert status == 200 and body.get_json()['success']
+
+
+@pytest.mark.parametrize('chars', (50, 2000), ids=lambda chars: f"{chars}chars")
+def test_chat_endpoint(benchmark, client, chars):
+    counter = itertools.count()
+    message = "I have had a headache since yesterday " * (chars // 38 + 1)
+
+    def post():
+        return client.post('/api/chat', json={"message": f"{next(counter)} {message[:chars]}"})
+
+    assert benchmark(post).status_code == 200
+
+
+@pytest.mark.parametrize('side', IMAGE_SIDES[:2], ids=lambda side: f"{side}px")
+def test_upload_endpoint(benchmark, client, side):
+    """Each round uploads a new image, so the analysis memo never answers"""
+    seeds = itertools.count()
+
+    def setup():
+        data = png_bytes(side, seed=next(seeds))
+        return (), {'data': {'type': 'image', 'file': (io.BytesIO(data), 'rash.png', 'image/png')},
+                    'content_type': 'multipart/form-data'}
+
+    response = benchmark.pedantic(lambda **kwargs: client.post('/api/upload', **kwargs), setup=setup, rounds=30)
+    assert response.status_code == 200
@@ -0,0 +1,39 @@
+"""
+AarogyaLink Model Serialization Micro-Benchmarks
+to_dict on Message, FileUpload and HealthRecord, each of which decodes its JSON
+column on every call, for JSON columns of 10, 100 and 1000 items
+"""
+
+from datetime import datetime
+
+from models import Message, FileUpload, HealthRecord
+
+CREATED = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def test_message_to_dict(benchmark, json_column):
+    message = Message(message_id='m' * 36, session_id='s' * 36, sender_type='ai', message_type='text',
+                      content='That sounds uncomfortable! When did this start?', ai_source='gemini',
+                      message_metadata=json_column, language='en', created_at=CREATED)
+    assert benchmark(message.to_dict)['metadata']
+
+
+def test_file_upload_to_dict(benchmark, json_column):
+    upload = FileUpload(file_id='f' * 36, message_id='m' * 36, original_filename='rash.png',
+                        file_type='image', file_size=51200, mime_type='image/png', content_hash='0' * 64,
+                        analysis_results=json_column, is_processed=True, created_at=CREATED)
+    assert benchmark(upload.to_dict)['analysis_results']
+
+
+def test_health_record_to_dict(benchmark, json_column):
+    record = HealthRecord(record_id='r' * 36, user_id='u' * 36, record_type='symptom', record_data=json_column,
+                          severity=3, source='ai_analysis', confidence_score=0.8, date_recorded=CREATED)
+    assert benchmark(record.to_dict)['record_data']
+
+
+def test_message_page_to_dict(benchmark, json_column):
+    """A 50-message history page, as /api/sessions/<id>/history serializes it"""
+    messages = [Message(message_id=f"{index:036d}", session_id='s' * 36, sender_type='user',
+                        message_type='text', content=f"Message {index}", message_metadata=json_column,
+                        created_at=CREATED) for index in range(50)]
+    assert len(benchmark(lambda: [message.to_dict() for message in messages])) == 50
@@ -0,0 +1,76 @@
+"""
+AarogyaLink Micro-Benchmark Fixtures
+The app with fake zero-latency providers and no rate limit or response cache, and
+synthetic JSON payloads and images of increasing size
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, FRONTEND_DIR)
+
+# Items in the synthetic JSON columns, and image sides in pixels (random noise PNGs
+# of about 1 KB, 50 KB and 770 KB)
+JSON_ITEMS = (10, 100, 1000)
+IMAGE_SIDES = (16, 128, 512)
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """The app module, imported with its settings pointed at a scratch database"""
+    directory = tmp_path_factory.mktemp('micro')
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in {
+            'DATABASE_URL': f"sqlite:///{directory / 'micro.db'}",
+            'FAKE_PROVIDERS': 'True',
+            'FAKE_PROVIDER_LATENCY': '0',
+            'FAKE_PROVIDER_OUTPUT_TOKENS': '100',
+            'FAKE_PROVIDER_SEED': '1',
+            'RATE_LIMIT_ENABLED': 'False',
+            'RESPONSE_CACHE_ENABLED': 'False'
+        }.items():
+            patch.setenv(name, value)
+        logging.disable(logging.WARNING)
+        import app as backend
+
+        backend.warm_up()
+        yield backend
+        backend.close_background_writers()
+
+
+@pytest.fixture(scope='session')
+def client(backend):
+    return backend.app.test_client()
+
+
+def json_payload(items):
+    """A JSON-column value shaped like stored analysis results, with ``items`` predictions"""
+    return {
+        "source": "gemini",
+        "primary_response": "That sounds uncomfortable! When did this start?",
+        "predictions": [{"label": f"condition {index}", "confidence": round(index / items, 4),
+                         "notes": ["seen in similar images", "low severity"]} for index in range(items)]
+    }
+
+
+def png_bytes(side, seed=0):
+    """A random-noise PNG of side x side pixels"""
+    import random
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.frombytes('RGB', (side, side), rng.randbytes(side * side * 3))
+    data = io.BytesIO()
+    image.save(data, 'PNG')
+    return data.getvalue()
+
+
+@pytest.fixture(params=JSON_ITEMS, ids=lambda items: f"{items}items")
+def json_column(request):
+    return json.dumps(json_payload(request.param))
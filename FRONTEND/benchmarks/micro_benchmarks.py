@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Micro-Benchmarks
+Runs the pytest-benchmark suite in benchmarks/micro (filename checks, upload
+validation, chat JSON building, the /api/chat and /api/upload handlers and the
+models' to_dict with JSON columns of 10-1000 items) and manages its baselines.
+
+Baselines are stored under benchmarks/micro/baselines, one folder per machine type
+(pytest-benchmark's machine id); compare runs on the machine that saved them.
+
+    (no flags)   run and print the table
+    --save       run and store the results as a new baseline
+    --compare    run and compare with the latest baseline; lists and exits non-zero
+                 on any benchmark whose --stat got more than --threshold percent slower
+
+Usage:
+    python benchmarks/micro_benchmarks.py [--save | --compare [--threshold 25] [--stat median]] [-k chat]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+
+MICRO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro')
+BASELINES_DIR = os.path.join(MICRO_DIR, 'baselines')
+
+
+def latest_baseline():
+    """The newest baseline saved on this machine type, or None"""
+    from pytest_benchmark.utils import get_machine_id
+
+    paths = sorted(glob.glob(os.path.join(BASELINES_DIR, get_machine_id(), '*.json')))
+    return paths[-1] if paths else None
+
+
+def regressions(baseline, results, stat, threshold):
+    """``(name, before, after, percent)`` of each benchmark more than ``threshold`` percent slower"""
+    before = {bench['fullname']: bench['stats'][stat] for bench in baseline['benchmarks']}
+    slower = []
+    for bench in results['benchmarks']:
+        old = before.get(bench['fullname'])
+        if old:
+            change = (bench['stats'][stat] - old) / old * 100
+            if change > threshold:
+                slower.append((bench['name'], old, bench['stats'][stat], change))
+    return slower
+
+
+def compare(pytest_args, stat, threshold):
+    """Run against the latest baseline and print a summary of any regressions"""
+    import pytest
+
+    baseline_path = latest_baseline()
+    if baseline_path is None:
+        print("❌ No baseline saved for this machine type yet, run with --save first")
+        return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        results_path = os.path.join(directory, 'results.json')
+        status = pytest.main(pytest_args + ['--benchmark-compare', f"--benchmark-json={results_path}"])
+        if not os.path.exists(results_path):
+            return status
+        with open(results_path) as f:
+            results = json.load(f)
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    name = os.path.basename(baseline_path)
+    slower = regressions(baseline, results, stat, threshold)
+    if not slower:
+        print(f"✅ No benchmark's {stat} is more than {threshold:g}% slower than {name}")
+        return status
+    print(f"❌ {len(slower)} benchmark(s) with a {stat} more than {threshold:g}% slower than {name}:")
+    for bench, old, new, change in slower:
+        print(f"    {bench:<48}{old * 1e6:>10.1f} us -> {new * 1e6:>10.1f} us  (+{change:.1f}%)")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save', action='store_true', help='store the results as a new baseline')
+    mode.add_argument('--compare', action='store_true', help='compare with the latest baseline')
+    parser.add_argument('--threshold', type=float, default=25.0, help='allowed slowdown in percent')
+    parser.add_argument('--stat', default='median', choices=['min', 'median', 'mean'],
+                        help='statistic compared against the baseline')
+    parser.add_argument('-k', dest='keyword', help='only run benchmarks matching this pytest -k expression')
+    args = parser.parse_args()
+
+    try:
+        import pytest
+        import pytest_benchmark  # noqa: F401
+    except ImportError:
+        print("❌ The micro-benchmarks need pytest-benchmark (pip install pytest-benchmark)")
+        return 1
+
+    pytest_args = [MICRO_DIR, '-q', f"--benchmark-storage=file://{BASELINES_DIR}",
+                   '--benchmark-columns=min,median,mean,ops,rounds', '--benchmark-sort=name']
+    if args.keyword:
+        pytest_args += ['-k', args.keyword]
+    if args.compare:
+        return compare(pytest_args, args.stat, args.threshold)
+    if args.save:
+        pytest_args.append('--benchmark-save=baseline')
+    return pytest.main(pytest_args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Prompt Template Benchmark
+Tokens sent per request and prompt build time: the original build_prompt (preamble
+string rebuilt and concatenated into every prompt) vs the compiled templates in
+prompt_templates.py, whose preamble goes in each model's Gemini system instruction
+(still sent, and billed, with every call).
+
+Offline (default), prompts for a mix of text, voice and image queries in every
+language are built both ways and their tokens estimated the way the app does
+(~4 characters per token). Columns:
+
+    build us        mean time to build one prompt
+    full tokens     the whole prompt (what Teachable receives)
+    message tokens  what is sent to Gemini as the message; for templates, the
+                    preamble lives in the model's system instruction instead
+
+With --live and GEMINI_API_KEY set, --requests text queries are also sent to Gemini
+both ways, reporting the prompt tokens Gemini bills (usage_metadata, which counts
+the system instruction too) and call latency.
+
+Usage:
+    python benchmarks/prompt_templates.py [--prompts 10000] [--live --requests 20]
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+from context_builder import estimate_tokens  # noqa: E402
+from prompt_templates import LANGUAGES, PromptTemplates  # noqa: E402
+
+# The preamble as build_prompt wrote it inline, indentation and all
+LEGACY_PREAMBLE = """
+        You are Dr. AarogyaLink, a friendly AI health companion.
+        Keep responses short and conversational - like texting a doctor friend.
+        
+        **Response style:**
+        - Acknowledge their concern briefly
+        - Ask 1-2 key questions to understand better  
+        - Give quick helpful thoughts
+        - Keep total response under 3-4 sentences
+        
+        **Example format:**
+        "That sounds uncomfortable! When did this start? Have you tried [simple remedy]? If it gets worse or doesn't improve in a day or two, I'd suggest seeing a doctor."
+        
+        **Tone:** Friendly, caring, conversational - like a knowledgeable friend.
+        """
+
+LEGACY_VOICE_NOTE = """
+            
+            **Special Note for Voice Input:**
+            The user has provided their health concern via voice input. Please ensure your response is clear and easy to understand when read aloud. 
+            Consider that the user may have speech or hearing difficulties, so avoid complex medical jargon unless necessary.
+            """
+
+QUERIES = [
+    ("text", "text", "I have had a headache and mild fever since yesterday evening"),
+    ("text", "voice", "my knee hurts when I climb stairs and it is a bit swollen"),
+    ("image", "text", "Please analyze this medical image"),
+]
+
+HISTORY = ("Summary of earlier conversation: Patient reports a dry cough for three days.\n"
+           "Patient: It gets worse at night\nDr. AarogyaLink: Are you running a fever?")
+
+
+def legacy_prompt(query_type, content, source="text", history=None):
+    """The prompt build_prompt produced before the template registry"""
+    health_context = LEGACY_PREAMBLE
+    if source == "voice":
+        health_context += LEGACY_VOICE_NOTE
+    if query_type == "image":
+        return f"{health_context}\n\nAnalyze this health image briefly: {content}\n\nKeep response under 3 sentences."
+    if history:
+        health_context += f"\n\n{history}"
+    return f"{health_context}\n\nUser Query: {content}\n\nRemember: Keep response conversational and under 3-4 sentences."
+
+
+def template_prompt(templates, query_type, content, source="text", language="en", history=None):
+    if query_type == "image":
+        return templates.render("image", content, language)
+    return templates.render("voice" if source == "voice" else "text", content, language, history)
+
+
+def cases():
+    for query_type, source, content in QUERIES:
+        for language in LANGUAGES:
+            for history in (None, HISTORY) if query_type == "text" else (None,):
+                yield query_type, source, content, language, history
+
+
+def measure_offline(count):
+    templates = PromptTemplates()
+    all_cases = list(cases())
+    work = [all_cases[index % len(all_cases)] for index in range(count)]
+    results = {}
+    for name in ('legacy', 'templates'):
+        gc.collect()
+        gc.disable()
+        started = time.perf_counter()
+        if name == 'legacy':
+            prompts = [legacy_prompt(query_type, content, source, history)
+                       for query_type, source, content, language, history in work]
+        else:
+            prompts = [template_prompt(templates, query_type, content, source, language, history)
+                       for query_type, source, content, language, history in work]
+        elapsed = time.perf_counter() - started
+        gc.enable()
+        results[name] = {
+            'prompts': count,
+            'build_us': round(elapsed / count * 1e6, 2),
+            'full_tokens': round(statistics.mean(estimate_tokens(prompt) for prompt in prompts), 1),
+            'message_tokens': round(statistics.mean(estimate_tokens(getattr(prompt, 'user', prompt))
+                                                    for prompt in prompts), 1)
+        }
+    return results
+
+
+def measure_live(requests):
+    """Send the same text queries to Gemini both ways; needs GEMINI_API_KEY"""
+    import app as backend
+
+    templates = backend.prompt_templates
+    base = backend.build_gemini_model()
+    template_models = {template.key: backend.build_gemini_model(template.system) for template in templates}
+    results = {}
+    for name in ('legacy', 'templates'):
+        tokens, latencies, errors = [], [], 0
+        for index in range(requests):
+            content = f"{QUERIES[0][2]} ({index})"
+            if name == 'legacy':
+                model, text = base, legacy_prompt("text", content)
+            else:
+                prompt = templates.render("text", content)
+                model, text = template_models[prompt.template], prompt.user
+            started = time.perf_counter()
+            try:
+                response = model.generate_content(text)
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            tokens.append(response.usage_metadata.prompt_token_count)
+        results[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'billed_prompt_tokens': round(statistics.mean(tokens), 1) if tokens else None,
+            'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            'p95_ms': round(sorted(latencies)[min(int(0.95 * len(latencies)), len(latencies) - 1)] * 1000, 1)
+                      if latencies else None
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--prompts', type=int, default=10000, help='prompts built per variant offline')
+    parser.add_argument('--live', action='store_true', help='also call Gemini (needs GEMINI_API_KEY)')
+    parser.add_argument('--requests', type=int, default=20, help='Gemini calls per variant with --live')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    output = {'offline': measure_offline(args.prompts)}
+    print("=" * 60)
+    print(f"{'prompts':<12}{'build us':>12}{'full tokens':>16}{'message tokens':>18}")
+    print("=" * 60)
+    for name, result in output['offline'].items():
+        print(f"{name:<12}{result['build_us']:>12}{result['full_tokens']:>16}{result['message_tokens']:>18}")
+
+    if args.live:
+        if not os.environ.get('GEMINI_API_KEY'):
+            print("❌ --live needs GEMINI_API_KEY")
+        else:
+            output['live'] = measure_live(args.requests)
+            print()
+            print("=" * 60)
+            print(f"{'gemini':<12}{'requests':>10}{'errors':>8}{'billed tokens':>15}{'p50 ms':>8}{'p95 ms':>8}")
+            print("=" * 60)
+            for name, result in output['live'].items():
+                print(f"{name:<12}{result['requests']:>10}{result['errors']:>8}{str(result['billed_prompt_tokens']):>15}"
+                      f"{str(result['p50_ms']):>8}{str(result['p95_ms']):>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Dev Server vs Production Server Benchmark
+Requests per second and latency percentiles of Werkzeug's development server
+(app.run(threaded=True), as started by run.py in dev mode) and the pre-fork gunicorn
+mode (run.py --mode production).
+
+Provider calls are replaced with a fixed sleep so no API quota is used, and rate
+limiting and the response cache are turned off so every request does the full work.
+Each server gets a fresh SQLite database. For each route, --concurrency clients send
+requests back to back for --duration seconds after a short warm-up:
+
+    chat   POST /api/chat with a unique message (session, prompt, persistence)
+    test   GET /api/test (routing and JSON only)
+
+Usage:
+    python benchmarks/serve_dev_vs_production.py [--workers 4] [--threads 8] [--concurrency 32] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+ROUTES = {
+    'chat': ('POST', '/api/chat'),
+    'test': ('GET', '/api/test')
+}
+
+
+def serve(mode, port, latency, workers, threads):
+    """Run the app with the given server and provider calls replaced by a sleep"""
+    import logging
+    import app as backend
+
+    backend.warm_up()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    fake = {"text": "Simulated provider response", "usage": {}, "safety_ratings": []}
+
+    def gemini(prompt, image_data=None, mime_type=None):
+        time.sleep(latency)
+        return fake
+
+    backend.health_api.call_gemini_api = gemini
+    backend.health_api.call_teachable_api = lambda prompt, context=None: None
+
+    if mode == 'dev':
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', port, backend.app, threaded=True).serve_forever()
+    else:
+        from production import serve as serve_production, production_options
+        options = {**production_options('127.0.0.1', port, workers, threads), 'loglevel': 'warning'}
+        serve_production(backend.app, options, post_fork=backend.after_fork,
+                         worker_exit=backend.close_background_writers)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run_route(base_url, route, concurrency, duration, warmup):
+    import httpx
+
+    method, path = ROUTES[route]
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one():
+            if method == 'POST':
+                return await client.post(path, json={"message": f"I have had a headache for {next(counter)} hours"})
+            return await client.get(path)
+
+        async def worker(stop_at, latencies, errors):
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await one()
+                    ok = response.status_code == 200
+                except Exception:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors.append(1)
+
+        await asyncio.gather(*(worker(time.perf_counter() + warmup, [], []) for _ in range(concurrency)))
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(started + duration, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'route': route,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def wait_ready(base_url, timeout=30):
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/test", timeout=1).status_code == 200:
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated provider latency in seconds')
+    parser.add_argument('--workers', type=int, default=4, help='production worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='production threads per worker')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds measured per route')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--routes', default='chat,test', help=f"comma-separated, from {', '.join(ROUTES)}")
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--serve', choices=['dev', 'production'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port, args.latency, args.workers, args.threads)
+
+    routes = args.routes.split(',')
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+
+    for mode in ('dev', 'production'):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                'RATE_LIMIT_ENABLED': 'False',
+                'RESPONSE_CACHE_ENABLED': 'False',
+                'PROVIDER_MAX_CONCURRENCY': str(args.concurrency * 4),
+                'PROVIDER_MAX_WORKERS': str(args.concurrency * 2)
+            }
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(args.port),
+                 '--latency', str(args.latency), '--workers', str(args.workers), '--threads', str(args.threads)],
+                cwd=directory, env={**env, 'PYTHONPATH': FRONTEND_DIR}
+            )
+            try:
+                if not wait_ready(base_url):
+                    print(f"❌ {mode} server did not start")
+                    continue
+                results[mode] = [asyncio.run(run_route(base_url, route, args.concurrency, args.duration, args.warmup))
+                                 for route in routes]
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"concurrency {args.concurrency}, provider latency {args.latency * 1000:.0f} ms, "
+          f"production {args.workers} workers x {args.threads} threads")
+    print("=" * 78)
+    print(f"{'server':<12}{'route':<7}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print("=" * 78)
+    for mode, rows in results.items():
+        for row in rows:
+            print(f"{mode:<12}{row['route']:<7}{row['requests']:>10}{row['errors']:>8}{row['req_per_s']:>9}"
+                  f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'latency_s': args.latency, 'concurrency': args.concurrency, 'workers': args.workers,
+                       'threads': args.threads, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Upload Memory Benchmark
+Peak Python memory for concurrent ~16 MB image uploads: the original ingestion steps
+(read for size, re-read, write to disk, BytesIO for verify, BytesIO decode and
+re-encode for Gemini) vs the single-pass UploadBuffer pipeline in app.py.
+
+Each worker parses a real multipart request with Werkzeug and runs ingestion up to
+the point where the payload would be handed to Gemini. Peak memory is measured with
+tracemalloc, so memory-mapped upload files are (correctly) not counted.
+
+Usage:
+    python benchmarks/upload_memory.py [--concurrency 8] [--side 2290]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+from PIL import Image  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+from werkzeug.wrappers import Request  # noqa: E402
+
+import app as backend  # noqa: E402
+
+backend.warm_up()
+
+
+def make_body(side):
+    """Build a multipart request body holding a random-noise PNG of side x side pixels"""
+    png = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(png, 'PNG', compress_level=0)
+    builder = EnvironBuilder(method='POST', data={'file': (io.BytesIO(png.getvalue()), 'rash.png')})
+    environ = builder.get_environ()
+    return environ['CONTENT_TYPE'], environ['wsgi.input'].read(), len(png.getvalue())
+
+
+def parse(content_type, body):
+    environ = EnvironBuilder(method='POST', input_stream=io.BytesIO(body), content_type=content_type,
+                             content_length=len(body)).get_environ()
+    return Request(environ).files['file']
+
+
+def legacy_ingest(file, upload_dir):
+    """The ingestion steps /api/upload performed before the single-pass pipeline"""
+    len(file.read())  # logged size
+    file.seek(0)
+    file_data = file.read()
+    path = os.path.join(upload_dir, f"{threading.get_ident()}.png")
+    with open(path, 'wb') as f:
+        f.write(file_data)
+    img = Image.open(io.BytesIO(file_data))
+    img.verify()
+    # call_gemini_api decoded again and the SDK re-encoded the PIL image
+    image = Image.open(io.BytesIO(file_data))
+    encoded = io.BytesIO()
+    image.save(encoded, format='PNG')
+    os.remove(path)
+    return len(encoded.getvalue())
+
+
+def single_pass_ingest(file, upload_dir):
+    """The current pipeline: UploadBuffer validation and a raw blob for Gemini"""
+    upload, error = backend.prepare_upload(file, 'auto')
+    assert error is None, error
+    try:
+        part = backend.gemini_image_part(upload['buffer'].view, upload['mime_type'])
+        return len(part['data']) if isinstance(part, dict) else 0
+    finally:
+        backend.release_upload(upload)
+
+
+def run(ingest, content_type, body, concurrency):
+    files = [parse(content_type, body) for _ in range(concurrency)]
+    barrier = threading.Barrier(concurrency)
+    upload_dir = tempfile.mkdtemp()
+
+    def worker(file):
+        barrier.wait()
+        ingest(file, upload_dir)
+
+    threads = [threading.Thread(target=worker, args=(file,)) for file in files]
+    tracemalloc.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for file in files:
+        file.close()
+    os.rmdir(upload_dir)
+    return {'peak_mb': round(peak / 1024 / 1024, 1), 'wall_s': round(elapsed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--side', type=int, default=2290, help='image side in pixels (2290 ~ 15.7 MB PNG)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    content_type, body, size = make_body(args.side)
+    print(f"Upload size: {size / 1024 / 1024:.1f} MB, concurrency: {args.concurrency}")
+
+    results = {
+        'legacy': run(legacy_ingest, content_type, body, args.concurrency),
+        'single_pass': run(single_pass_ingest, content_type, body, args.concurrency)
+    }
+
+    print("=" * 48)
+    print(f"{'pipeline':<14}{'peak MB':>12}{'per upload MB':>15}{'wall s':>7}")
+    print("=" * 48)
+    for name, result in results.items():
+        print(f"{name:<14}{result['peak_mb']:>12}{result['peak_mb'] / args.concurrency:>15.1f}{result['wall_s']:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'upload_bytes': size, 'concurrency': args.concurrency, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+AarogyaLink Circuit Breakers
+Per-provider breakers that stop calling a failing or slow provider, and routing that
+prefers the available provider with the better recent p95 latency
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class CircuitBreaker:
+    """Track the recent outcomes of one provider and decide whether to call it
+
+    The last ``window`` calls are kept. A call fails if it raised or returned an
+    error, or took longer than ``slow_call_seconds``. Once at least ``min_calls``
+    are recorded and the failure rate reaches ``error_rate`` the breaker opens and
+    ``allow`` refuses calls for ``open_seconds``. It then goes half-open and lets
+    ``half_open_probes`` calls through: if they all succeed the breaker closes with a
+    fresh window, and any failure opens it again.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, error_rate=0.5, slow_call_seconds=10.0,
+                 open_seconds=30.0, half_open_probes=1, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def _update_state(self):
+        # Called with the lock held; an open breaker turns half-open once its time is up
+        if self.state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info(f"{self.name} circuit half-open, probing")
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
+        logger.warning(f"{self.name} circuit opened for {self.open_seconds}s")
+
+    def available(self):
+        """Whether a call would be considered, without reserving a half-open probe"""
+        with self._lock:
+            self._update_state()
+            return self.state == CLOSED or (self.state == HALF_OPEN and self._probes < self.half_open_probes)
+
+    def allow(self):
+        """Whether to make a call now; in the half-open state this reserves a probe"""
+        with self._lock:
+            self._update_state()
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, seconds, success):
+        """Record the outcome of an allowed call"""
+        failed = not success or seconds >= self.slow_call_seconds
+        with self._lock:
+            if success:
+                self._latencies.append(seconds)
+
+            if self.state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if failed:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.state = CLOSED
+                        self._outcomes.clear()
+                        logger.info(f"{self.name} circuit closed")
+                return
+
+            if self.state == OPEN:
+                # A call that was already running when the breaker opened
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def release(self):
+        """Give back a half-open probe whose call was cancelled before it finished"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+
+    def p95(self):
+        """95th percentile latency of recent successful calls, in seconds"""
+        with self._lock:
+            return percentile(list(self._latencies), 0.95)
+
+    def stats(self):
+        """Get breaker state and counters for the health endpoint"""
+        with self._lock:
+            self._update_state()
+            calls = len(self._outcomes)
+            p95 = percentile(list(self._latencies), 0.95)
+            return {
+                'state': self.state,
+                'recent_calls': calls,
+                'error_rate': round(sum(self._outcomes) / calls, 4) if calls else 0.0,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retry_in_seconds': round(max(self.open_seconds - (self.clock() - self._opened_at), 0), 1)
+                if self.state == OPEN else None
+            }
+
+
+class ProviderRouter:
+    """Circuit breakers for a set of providers, plus the order to try them in"""
+
+    def __init__(self, names, preferred=None, **breaker_options):
+        self.preferred = preferred
+        self.breakers = {name: CircuitBreaker(name, **breaker_options) for name in names}
+
+    def allow(self, name):
+        breaker = self.breakers.get(name)
+        return breaker.allow() if breaker else True
+
+    def record(self, name, seconds, success):
+        if name in self.breakers:
+            self.breakers[name].record(seconds, success)
+
+    def release(self, name):
+        if name in self.breakers:
+            self.breakers[name].release()
+
+    def route(self, names):
+        """Order providers for a request: open ones are dropped, the rest sorted by p95
+
+        Providers without recent latency samples keep their place after any that have
+        them, with the configured preferred provider first on ties.
+        """
+        available = [name for name in names if name not in self.breakers or self.breakers[name].available()]
+
+        def key(name):
+            p95 = self.breakers[name].p95() if name in self.breakers else None
+            return (p95 is None, p95 or 0.0, name != self.preferred, names.index(name))
+        return sorted(available, key=key)
+
+    def stats(self):
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
@@ -0,0 +1,50 @@
+"""
+AarogyaLink Test Fixtures
+A bare Flask app bound to a scratch SQLite database, for tests of the models and the
+helpers built on them, and the full app module with offline providers
+"""
+
+import logging
+
+import pytest
+from flask import Flask
+
+from json_provider import FastJSONProvider
+from models import db, init_db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """The app module, imported with a scratch database and fake zero-latency providers"""
+    directory = tmp_path_factory.mktemp('backend')
+    with pytest.MonkeyPatch.context() as patch:
+        # Undone after the session, so later subprocesses don't inherit the test settings
+        for name, value in {
+            'DATABASE_URL': f"sqlite:///{directory / 'backend.db'}",
+            'FAKE_PROVIDERS': 'True',
+            'FAKE_PROVIDER_LATENCY': '0',
+            'FAKE_PROVIDER_SEED': '1',
+            'RESPONSE_CACHE_ENABLED': 'False'
+        }.items():
+            patch.setenv(name, value)
+        logging.disable(logging.WARNING)
+        import app as backend
+
+        backend.warm_up()
+        yield backend
+        backend.close_background_writers()
+        logging.disable(logging.NOTSET)
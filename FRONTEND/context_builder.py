@@ -0,0 +1,150 @@
+"""
+AarogyaLink Context Builder
+Fit a chat session's recent turns into a token budget, folding older turns into a
+rolling summary stored on the session
+"""
+
+import logging
+import math
+import threading
+
+from models import db, ChatSession, Message
+
+logger = logging.getLogger(__name__)
+
+ROLE_LABELS = {'user': 'Patient', 'ai': 'Dr. AarogyaLink'}
+
+
+def estimate_tokens(text):
+    """Estimate the token count of a text (~4 characters per token for Gemini)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keep the end of a text within max_tokens, cutting at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    tail = text[-max_tokens * 4:]
+    return tail.split(' ', 1)[-1] if ' ' in tail else tail
+
+
+def format_turn(turn):
+    return f"{ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['content']}"
+
+
+def render_context(context):
+    """Render a built context as prompt text, or '' when there is no history"""
+    if not context:
+        return ''
+    parts = []
+    if context['summary']:
+        parts.append(f"Summary of the earlier conversation: {context['summary']}")
+    if context['turns']:
+        parts.append("Recent conversation:\n" + "\n".join(format_turn(turn) for turn in context['turns']))
+    return "\n\n".join(parts)
+
+
+def extractive_summary(previous, turns):
+    """Fold turns into a summary by keeping what the patient reported"""
+    notes = [turn['content'].strip() for turn in turns if turn['role'] == 'user' and turn['content']]
+    return ' '.join(([previous] if previous else []) + [f"Patient said: {note}" for note in notes])
+
+
+class ContextBuilder:
+    """Assemble the conversation context sent with a chat message
+
+    The newest turns of the session are kept verbatim while they fit in
+    ``max_tokens - summary_tokens``. Stored turns that fall out of that window are
+    folded into ``ChatSession.symptoms_summary`` by ``summarizer(previous, turns)``
+    and ``ChatSession.summary_message_id`` records the last folded message, so each
+    turn is summarized once and the summary is only recomputed when turns leave the
+    window. At most ``max_messages`` unsummarized turns are read per call.
+    ``pending(session_id)`` supplies queued messages that haven't been written to the
+    database yet. ``build`` must run inside an app context.
+    """
+
+    def __init__(self, max_tokens=1500, summary_tokens=300, max_messages=40, summarizer=None, pending=None):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_messages = max_messages
+        self.summarizer = summarizer or extractive_summary
+        self.pending = pending
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.summaries = 0
+
+    def build(self, session_id):
+        """Get the context for a session
+
+        Returns a dict with the ``summary`` (or None), the ``turns`` kept verbatim as
+        ``{"role", "content"}`` dicts, ``tokens`` for each part and how many turns
+        were ``summarized`` by this call.
+        """
+        # Queued messages are read first; any committed meanwhile are deduplicated below
+        pending = self.pending(session_id) if self.pending else []
+
+        session = db.session.execute(
+            db.select(ChatSession).where(ChatSession.session_id == session_id)
+        ).scalar_one_or_none()
+        summary = session.symptoms_summary if session else None
+
+        query = db.select(Message).where(Message.session_id == session_id)
+        if session and session.summary_message_id:
+            query = query.where(Message.id > session.summary_message_id)
+        stored = db.session.execute(
+            query.order_by(Message.created_at.desc(), Message.id.desc()).limit(self.max_messages)
+        ).scalars().all()
+
+        turns = [{'id': message.id, 'message_id': str(message.message_id), 'role': message.sender_type,
+                  'content': message.content} for message in reversed(stored)]
+        seen = {turn['message_id'] for turn in turns}
+        turns += [{'id': None, 'message_id': row['message_id'], 'role': row['sender_type'],
+                   'content': row['content']} for row in pending if row['message_id'] not in seen]
+        turns = [turn for turn in turns if turn['content']]
+
+        # Fill the window from the newest turn backwards
+        budget = self.max_tokens - self.summary_tokens
+        window, used = [], 0
+        for turn in reversed(turns):
+            cost = estimate_tokens(format_turn(turn))
+            if used + cost > budget:
+                break
+            window.append(turn)
+            used += cost
+        window.reverse()
+
+        # Only stored turns can be folded; queued ones have no id to mark progress with
+        fallen = [turn for turn in turns[:len(turns) - len(window)] if turn['id'] is not None]
+        if fallen and session:
+            summary = truncate_to_tokens(self.summarizer(summary, fallen), self.summary_tokens)
+            session.symptoms_summary = summary
+            session.summary_message_id = fallen[-1]['id']
+            db.session.commit()
+            with self._lock:
+                self.summaries += 1
+            logger.info(f"Folded {len(fallen)} turns into the summary of session {session_id}")
+
+        return {
+            'summary': summary or None,
+            'turns': [{'role': turn['role'], 'content': turn['content']} for turn in window],
+            'tokens': {'summary': estimate_tokens(summary), 'history': used},
+            'summarized': len(fallen)
+        }
+
+    def record(self, prompt_tokens):
+        """Count the prompt tokens sent for a chat request"""
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+
+    def stats(self):
+        """Get context counters for the health endpoint"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'avg_prompt_tokens': round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+                'summaries': self.summaries,
+                'max_tokens': self.max_tokens
+            }
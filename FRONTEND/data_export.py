@@ -0,0 +1,70 @@
+"""
+AarogyaLink Data Export
+Streams everything stored for a user (sessions, messages, file upload metadata and
+health records) as NDJSON, optionally gzip-compressed on the fly, for data
+portability requests
+"""
+
+import zlib
+from datetime import datetime
+
+from models import iter_user_data
+
+EXPORT_FORMAT_VERSION = 1
+
+
+def export_records(user_id, batch_size=500, raw_json=False):
+    """Yield the export's records: a header, one record per stored row, then a trailer
+
+    Every record is a dict with a ``type``; rows carry their ``to_dict`` under
+    ``data``. The trailer (``type: 'end'``) holds the number of rows of each type, so
+    a consumer can tell a complete export from one cut short by an error.
+    """
+    yield {
+        'type': 'export',
+        'version': EXPORT_FORMAT_VERSION,
+        'user_id': str(user_id),
+        'exported_at': datetime.utcnow().isoformat()
+    }
+    counts = {}
+    for record_type, data in iter_user_data(user_id, batch_size=batch_size, raw_json=raw_json):
+        counts[record_type] = counts.get(record_type, 0) + 1
+        yield {'type': record_type, 'data': data}
+    yield {'type': 'end', 'counts': counts}
+
+
+def ndjson_chunks(records, dumps, chunk_size=64 * 1024):
+    """Encode records one JSON document per line, in chunks of about ``chunk_size`` bytes"""
+    buffer = []
+    size = 0
+    for record in records:
+        line = dumps(record).encode('utf-8') + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip stream as it goes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(user_id, dumps, batch_size=500, compress=False, raw_json=False):
+    """A user's export as NDJSON byte chunks, gzip-compressed when ``compress`` is set
+
+    ``dumps`` encodes one record to a string (e.g. ``app.json.dumps``); pass
+    ``raw_json`` only when it can write JSONFragments. Must be consumed inside an
+    app context.
+    """
+    chunks = ndjson_chunks(export_records(user_id, batch_size, raw_json), dumps)
+    return gzip_chunks(chunks) if compress else chunks
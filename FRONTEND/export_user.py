@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink User Data Export
+Write everything stored for a user (sessions, messages, file upload metadata and
+health records) as NDJSON to a file or stdout, the same stream the
+/api/users/<user_id>/export endpoint serves
+
+Usage:
+    python export_user.py <user_id> [-o export.ndjson.gz] [--gzip] [--batch-size 500]
+"""
+
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export a user's stored data as NDJSON")
+    parser.add_argument('user_id')
+    parser.add_argument('-o', '--output', help="file to write (default: stdout); a .gz name implies --gzip")
+    parser.add_argument('--gzip', action='store_true', help='gzip-compress the output')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('EXPORT_BATCH_SIZE', 500)),
+                        help='rows read per query (default: $EXPORT_BATCH_SIZE or 500)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    compress = args.gzip or bool(args.output and args.output.endswith('.gz'))
+
+    from app import app, FAST_JSON_ENABLED
+    from models import create_tables, user_has_data
+    from data_export import export_stream
+
+    create_tables(app)
+    with app.app_context():
+        if not user_has_data(args.user_id):
+            print(f"❌ Nothing is stored for user {args.user_id}", file=sys.stderr)
+            return 1
+
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in export_stream(args.user_id, app.json.dumps, batch_size=args.batch_size,
+                                       compress=compress, raw_json=FAST_JSON_ENABLED):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+    if args.output:
+        print(f"✅ Exported user {args.user_id} to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
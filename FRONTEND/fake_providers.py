@@ -0,0 +1,228 @@
+"""
+AarogyaLink Fake Providers
+Offline stand-ins for the Gemini model and the Teachable client with configurable
+latency, error rate and token counts, for load tests and profiling without API
+keys or quota
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+
+from context_builder import estimate_tokens
+
+FILLER = ("Thanks for sharing that. How long has this been going on, and is it getting better or worse? "
+          "Rest, fluids and a light meal often help; see a doctor if it doesn't improve in a day or two. ")
+
+
+class FakeProviderError(Exception):
+    """A simulated provider failure"""
+
+
+def parse_distribution(spec):
+    """Parse a distribution into a function of a ``random.Random`` returning a sample >= 0
+
+    Accepted forms: a plain number, ``fixed:x``, ``uniform:low,high``,
+    ``normal:mean,stddev``, ``lognormal:median,sigma`` and ``exponential:mean``.
+    """
+    kind, _, args = str(spec).partition(':')
+    if not args:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(arg) for arg in args.split(',')]
+    if kind == 'fixed':
+        return lambda rng: params[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda rng: max(rng.gauss(params[0], params[1]), 0.0)
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / params[0])
+    raise ValueError(f"Unknown distribution: {spec}")
+
+
+class FakeProvider:
+    """Draws the latency, outcome and output size of simulated provider calls
+
+    ``latency`` (seconds) and ``output_tokens`` are distributions as accepted by
+    ``parse_distribution``; a call fails with probability ``error_rate``. Draws
+    come from one seeded generator, so a run is repeatable for a given seed.
+    """
+
+    def __init__(self, name, latency='lognormal:0.8,0.5', error_rate=0.0, output_tokens='uniform:40,120', seed=None):
+        self.name = name
+        self.latency = parse_distribution(latency)
+        self.error_rate = error_rate
+        self.output_tokens = parse_distribution(output_tokens)
+        self.config = {'latency': str(latency), 'error_rate': error_rate, 'output_tokens': str(output_tokens),
+                       'seed': seed}
+        # Seeded per provider, so providers sharing a seed still fail independently
+        self._rng = random.Random(f"{seed}:{name}" if seed is not None else None)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, name, environ=os.environ):
+        """Configure from FAKE_<NAME>_* variables, falling back to FAKE_PROVIDER_*"""
+        def setting(key, default):
+            return environ.get(f"FAKE_{name.upper()}_{key}", environ.get(f"FAKE_PROVIDER_{key}", default))
+
+        seed = setting('SEED', None)
+        return cls(
+            name,
+            latency=setting('LATENCY', 'lognormal:0.8,0.5'),
+            error_rate=float(setting('ERROR_RATE', 0.0)),
+            output_tokens=setting('OUTPUT_TOKENS', 'uniform:40,120'),
+            seed=int(seed) if seed is not None else None
+        )
+
+    def draw(self, prompt):
+        """Draw one call: (latency seconds, failed, reply text, prompt tokens, output tokens)"""
+        with self._lock:
+            latency = self.latency(self._rng)
+            failed = self._rng.random() < self.error_rate
+            output_tokens = max(int(self.output_tokens(self._rng)), 1)
+            self.calls += 1
+            self.errors += failed
+        repeats = output_tokens * 4 // len(FILLER) + 1
+        text = (FILLER * repeats)[:output_tokens * 4].rstrip()
+        return latency, failed, text, estimate_tokens(prompt), output_tokens
+
+    def to_dict(self):
+        """Get call counters, in the shape of the Teachable pool's stats"""
+        with self._lock:
+            return {'requests': self.calls, 'new_connections': 0, 'errors': self.errors}
+
+    def stats(self):
+        return {**self.to_dict(), **self.config}
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _GeminiResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+        self.safety_ratings = []
+
+
+def prompt_text(contents):
+    """The text part of generate_content's contents (a string or [text, image])"""
+    if isinstance(contents, str):
+        return contents
+    return next((part for part in contents if isinstance(part, str)), '')
+
+
+class FakeGeminiModel:
+    """Stands in for ``genai.GenerativeModel`` in generate_content(_async), streaming or not
+
+    Streams split the reply into ``chunks`` chunks spread over the call's latency,
+    with the usage on the last chunk as Gemini does. A ``timeout`` in
+    ``request_options`` cuts calls slower than it short with an error.
+    """
+
+    def __init__(self, provider, chunks=4):
+        self.provider = provider
+        self.chunks = chunks
+
+    def _chunks(self, text, usage):
+        size = math.ceil(len(text) / self.chunks)
+        parts = [text[start:start + size] for start in range(0, len(text), size)]
+        return [_GeminiResponse(part, usage if index == len(parts) - 1 else None) for index, part in enumerate(parts)]
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        latency, failed, text, prompt_tokens, output_tokens = self.provider.draw(prompt_text(contents))
+        usage = _Usage(prompt_tokens, output_tokens)
+        if not stream:
+            timeout = (request_options or {}).get('timeout')
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise FakeProviderError("Simulated Gemini timeout")
+            time.sleep(latency)
+            if failed:
+                raise FakeProviderError("Simulated Gemini failure")
+            return _GeminiResponse(text, usage)
+        return self._stream(latency, failed, text, usage)
+
+    def _stream(self, latency, failed, text, usage):
+        for chunk in self._chunks(text, usage):
+            time.sleep(latency / self.chunks)
+            if failed:
+                raise FakeProviderError("Simulated Gemini failure")
+            yield chunk
+
+    async def generate_content_async(self, contents, stream=False, request_options=None):
+        latency, failed, text, prompt_tokens, output_tokens = self.provider.draw(prompt_text(contents))
+        usage = _Usage(prompt_tokens, output_tokens)
+        if not stream:
+            await asyncio.sleep(latency)
+            if failed:
+                raise FakeProviderError("Simulated Gemini failure")
+            return _GeminiResponse(text, usage)
+        return self._stream_async(latency, failed, text, usage)
+
+    async def _stream_async(self, latency, failed, text, usage):
+        for chunk in self._chunks(text, usage):
+            await asyncio.sleep(latency / self.chunks)
+            if failed:
+                raise FakeProviderError("Simulated Gemini failure")
+            yield chunk
+
+
+class _HTTPResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+class FakeTeachableClient:
+    """Stands in for the Teachable ``PooledHTTPClient``; failed calls return HTTP 503
+
+    ``async_transport()`` gives an httpx transport answering the same way for the
+    async client used in the ASGI mode.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.stats = provider
+
+    def _respond(self, payload):
+        latency, failed, text, prompt_tokens, output_tokens = self.provider.draw((payload or {}).get('prompt', ''))
+        if failed:
+            return latency, 503, {"error": "Simulated Teachable failure"}
+        return latency, 200, {
+            "completion": text,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens,
+                      "total_tokens": prompt_tokens + output_tokens}
+        }
+
+    def post(self, url, json=None, **kwargs):
+        latency, status, body = self._respond(json)
+        time.sleep(latency)
+        return _HTTPResponse(status, body)
+
+    def async_transport(self):
+        import json
+        import httpx
+
+        async def handle(request):
+            latency, status, body = self._respond(json.loads(request.content or b'{}'))
+            await asyncio.sleep(latency)
+            return httpx.Response(status, json=body)
+
+        return httpx.MockTransport(handle)
@@ -0,0 +1,111 @@
+"""
+AarogyaLink HTTP Client
+Shared, connection-pooled HTTP client for outbound LLM provider calls
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+class PoolStats:
+    """Thread-safe counters describing how pooled connections are used"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_checkout(self, wait_seconds):
+        with self._lock:
+            self.requests += 1
+            self.wait_time_total += wait_seconds
+            self.wait_time_max = max(self.wait_time_max, wait_seconds)
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def to_dict(self):
+        """Convert stats to dictionary"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': max(self.requests - self.new_connections, 0),
+                'pool_wait_ms_total': round(self.wait_time_total * 1000, 3),
+                'pool_wait_ms_avg': round(self.wait_time_total * 1000 / self.requests, 3) if self.requests else 0.0,
+                'pool_wait_ms_max': round(self.wait_time_max * 1000, 3)
+            }
+
+
+def _instrumented_pool(base, stats):
+    """Build a connection pool class that reports checkouts and new connections to stats"""
+
+    class InstrumentedPool(base):
+        def _get_conn(self, timeout=None):
+            started = time.perf_counter()
+            conn = super()._get_conn(timeout=timeout)
+            stats.record_checkout(time.perf_counter() - started)
+            return conn
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+    return InstrumentedPool
+
+
+class PooledHTTPClient:
+    """Thread-safe keep-alive HTTP client with per-host connection pooling and retries
+
+    A single instance is meant to be shared by every Flask worker thread so TCP/TLS
+    connections to a provider are reused across requests instead of being set up
+    for each chat message.
+    """
+
+    def __init__(self, pool_size=10, pool_block=True, max_retries=2, backoff_factor=0.3,
+                 connect_timeout=3.05, read_timeout=30, headers=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = PoolStats()
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=None,  # Retry POST as well; completions have no side effects
+            backoff_factor=backoff_factor,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                              pool_block=pool_block, max_retries=retry)
+        adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _instrumented_pool(HTTPConnectionPool, self.stats),
+            'https': _instrumented_pool(HTTPSConnectionPool, self.stats)
+        }
+
+        self.session = requests.Session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        if headers:
+            self.session.headers.update(headers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
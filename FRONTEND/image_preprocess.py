@@ -0,0 +1,114 @@
+"""
+AarogyaLink Image Preprocessing
+Downscale and re-encode uploaded images before they are sent to Gemini
+"""
+
+import io
+import logging
+import math
+import time
+
+
+from upload_ingest import MemoryReader
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png'
+}
+
+
+class ImagePreprocessor:
+    """Shrink images to a maximum edge, strip EXIF and re-encode them compactly
+
+    JPEGs are opened in draft mode so the decoder does the bulk of the downscale
+    (DCT scaling by 1/2, 1/4 or 1/8) instead of decoding every pixel at full size.
+    """
+
+    def __init__(self, max_edge=1536, output_format='JPEG', quality=85):
+        self.max_edge = max_edge
+        self.output_format = output_format.upper()
+        self.quality = quality
+
+        if self.output_format not in OUTPUT_MIME_TYPES:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+    def process(self, image_data, mime_type=None):
+        """Preprocess an image
+
+        Returns ``(data, mime_type, stats)``. The original bytes are returned when the
+        re-encoded image isn't smaller and there was no EXIF data to strip, or if the
+        image can't be processed.
+        """
+        started = time.perf_counter()
+        original_bytes = len(image_data)
+        stats = {
+            'original_bytes': original_bytes,
+            'output_bytes': original_bytes,
+            'bytes_saved': 0,
+            'time_ms': 0.0,
+            'applied': False
+        }
+
+        try:
+            # Pillow is imported on the first image, not at app import
+            from PIL import Image, ImageOps
+            with io.BufferedReader(MemoryReader(image_data)) as reader:
+                img = Image.open(reader)
+                stats['original_size'] = list(img.size)
+                has_exif = bool(img.info.get('exif'))
+
+                scale = self.max_edge / max(img.size)
+                if img.format == 'JPEG' and scale < 1:
+                    img.draft('RGB', (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+                img.load()
+
+                # Apply the EXIF orientation before the EXIF data is dropped
+                img = ImageOps.exif_transpose(img)
+                if max(img.size) > self.max_edge:
+                    img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS, reducing_gap=2.0)
+
+            img = self._convert_mode(img)
+            output = io.BytesIO()
+            save_args = {'quality': self.quality} if self.output_format in ('JPEG', 'WEBP') else {'optimize': True}
+            img.save(output, format=self.output_format, **save_args)
+            data = output.getvalue()
+
+            stats['output_size'] = list(img.size)
+            if len(data) < original_bytes or has_exif:
+                stats.update({
+                    'output_bytes': len(data),
+                    'bytes_saved': original_bytes - len(data),
+                    'applied': True
+                })
+                return data, OUTPUT_MIME_TYPES[self.output_format], self._finish(stats, started)
+
+        except Exception as e:
+            logger.warning(f"Image preprocessing failed, sending original: {e}")
+            stats['error'] = str(e)
+
+        return image_data, mime_type, self._finish(stats, started)
+
+    def _convert_mode(self, img):
+        """Convert to a mode the output format can store"""
+        if self.output_format == 'JPEG' and img.mode != 'RGB':
+            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                from PIL import Image
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                return background
+            return img.convert('RGB')
+
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            return img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        return img
+
+    @staticmethod
+    def _finish(stats, started):
+        stats['time_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"Image preprocessing: {stats['original_bytes']} -> {stats['output_bytes']} bytes "
+                    f"({stats['bytes_saved']} saved) in {stats['time_ms']} ms")
+        return stats
@@ -0,0 +1,106 @@
+"""
+AarogyaLink Job Queue
+In-process, bounded job queue with a worker thread pool for slow upload analysis
+"""
+
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Bounded FIFO job queue served by a fixed pool of worker threads
+
+    Only live state (queued / processing) is tracked here; the job function is
+    responsible for persisting its result. ``submit`` returns False instead of
+    blocking when the queue is full so callers can apply backpressure.
+    """
+
+    def __init__(self, workers=4, max_depth=32):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._jobs = {}  # job_id -> {'status': str, 'done': threading.Event}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start(self):
+        # Workers are started on first use so importing the app doesn't spawn threads
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id, func, *args, **kwargs):
+        """Queue a job, returning False if the queue is full"""
+        with self._lock:
+            self._start()
+            try:
+                self._queue.put_nowait((job_id, func, args, kwargs))
+            except queue.Full:
+                self.rejected += 1
+                return False
+            self._jobs[job_id] = {'status': 'queued', 'done': threading.Event()}
+            return True
+
+    def full(self):
+        """Check whether the queue is at its maximum depth"""
+        return self._queue.full()
+
+    def record_rejection(self):
+        """Count a job turned away before it was submitted"""
+        with self._lock:
+            self.rejected += 1
+
+    def status(self, job_id):
+        """Get 'queued' or 'processing' for a live job, or None if it isn't in the queue"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job['status'] if job else None
+
+    def wait(self, job_id, timeout):
+        """Wait up to timeout seconds for a live job to finish"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job:
+            job['done'].wait(timeout)
+
+    def _work(self):
+        while True:
+            job_id, func, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job['status'] = 'processing'
+            try:
+                func(*args, **kwargs)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                with self._lock:
+                    self.failed += 1
+            finally:
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                job['done'].set()
+                self._queue.task_done()
+
+    def stats(self):
+        """Get queue counters for the health endpoint"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_depth': self.max_depth,
+                'queued': sum(1 for job in self._jobs.values() if job['status'] == 'queued'),
+                'processing': sum(1 for job in self._jobs.values() if job['status'] == 'processing'),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,77 @@
+"""
+AarogyaLink JSON Provider
+Flask JSON provider that encodes and decodes with orjson when it is installed, and
+JSON fragments that embed already-serialized JSON (such as a JSON text column) in a
+response without decoding and re-encoding it
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
+
+
+class JSONFragment:
+    """Serialized JSON to be written into a response as is
+
+    The text must be valid JSON; it is trusted, not validated. Without orjson the
+    provider decodes it and encodes it with the rest of the response.
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __repr__(self):
+        return f"JSONFragment({self.raw!r})"
+
+
+def loads(data):
+    """Decode JSON text with the fastest available decoder"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _default(o):
+    if isinstance(o, JSONFragment):
+        return orjson.Fragment(o.raw) if orjson else json.loads(o.raw)
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's default provider with orjson doing the encoding and decoding
+
+    Output matches the default provider's (sorted keys, datetimes as HTTP dates,
+    compact responses), except that non-ASCII text is written as UTF-8 instead of
+    ``\\u`` escapes. Calls with extra json.dumps/json.loads arguments, pretty-printed
+    debug responses, and everything when orjson isn't installed, go through the
+    default provider.
+    """
+
+    default = staticmethod(_default)
+
+    @property
+    def _orjson_option(self):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        return option | orjson.OPT_SORT_KEYS if self.sort_keys else option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,164 @@
+"""
+AarogyaLink Message Writer
+Write-behind buffer that persists chat sessions and messages in batched transactions
+"""
+
+import logging
+import threading
+import time
+
+from models import save_chat_batch
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """Buffer chat rows in memory and write them in grouped transactions
+
+    Requests only append to the buffer; a background thread commits everything pending
+    once ``batch_size`` rows are waiting or ``flush_interval`` seconds have passed, so
+    no request waits on a database commit. ``close()`` writes whatever is left and is
+    meant to be called on shutdown. When more than ``max_pending`` rows pile up (the
+    database is slower than the traffic) the caller flushes synchronously instead of
+    letting the buffer grow without bound.
+    """
+
+    def __init__(self, app, batch_size=100, flush_interval=1.0, max_pending=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._sessions = []
+        self._messages = []
+        self._inflight = []  # messages taken by a flush that hasn't committed yet
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps batches in order
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    def _start(self):
+        # Started on first use so importing the app doesn't spawn threads
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+            self._thread.start()
+
+    def add_session(self, row):
+        """Queue a new chat session row"""
+        self._add(self._sessions, row)
+
+    def add_message(self, row):
+        """Queue a message row"""
+        self._add(self._messages, row)
+
+    def _add(self, rows, row):
+        with self._lock:
+            if self._closed:
+                # Nothing will flush after close(), so write through
+                overflow = True
+            else:
+                self._start()
+                overflow = self._pending() >= self.max_pending
+            rows.append(row)
+            if self._pending() >= self.batch_size:
+                self._wakeup.notify()
+        if overflow:
+            self.flush()
+
+    def pending_messages(self, session_id):
+        """Get the queued messages of a session that aren't readable from the database yet"""
+        with self._lock:
+            return [row for row in self._inflight + self._messages if row['session_id'] == session_id]
+
+    def _pending(self):
+        return len(self._sessions) + len(self._messages)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and self._pending() < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write everything pending in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                sessions, self._sessions = self._sessions, []
+                messages, self._messages = self._messages, []
+                self._inflight = messages
+            if not sessions and not messages:
+                return
+
+            started = time.perf_counter()
+            with self.app.app_context():
+                dropped = self._save(sessions, messages)
+
+            with self._lock:
+                self._inflight = []
+                if dropped is None:
+                    self.batches += 1
+                else:
+                    self.failed += 1
+                    self.dropped += dropped
+                self.written += len(sessions) + len(messages) - (dropped or 0)
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _save(self, sessions, messages):
+        """Write a batch, retrying it once and then row by row if it keeps failing
+
+        Returns None when the batch went in whole, otherwise the number of rows that
+        couldn't be written on their own (only those are dropped).
+        """
+        for attempt in range(2):
+            try:
+                save_chat_batch(sessions, messages)
+                return None
+            except Exception as e:
+                logger.warning(f"Failed to write {len(sessions)} sessions and {len(messages)} messages "
+                               f"(attempt {attempt + 1}): {e}")
+
+        # Sessions first, so their messages have a session to belong to
+        dropped = 0
+        for batch in [([row], []) for row in sessions] + [([], [row]) for row in messages]:
+            try:
+                save_chat_batch(*batch)
+            except Exception as e:
+                logger.error(f"Dropped a chat row that can't be written: {e}")
+                dropped += 1
+        return dropped
+
+    def close(self):
+        """Stop the background thread and write any pending rows"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        """Get writer counters for the health endpoint"""
+        with self._lock:
+            return {
+                'pending': self._pending(),
+                'written': self.written,
+                'batches': self.batches,
+                'failed_batches': self.failed,
+                'dropped': self.dropped,
+                'last_flush_ms': self.last_flush_ms,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval
+            }
@@ -0,0 +1,164 @@
+"""
+AarogyaLink Metrics
+Thread-safe counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+import bisect
+import math
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers cache hits through slow provider calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """A named metric with a fixed set of label names; one lock guards all its series"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines += self._render_series(series)
+        return lines
+
+    def _render_series(self, series):
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}" for key, value in series]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative histogram; each series holds per-bucket counts, a sum and a count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, series):
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.label_names, key, [('le', format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics plus collectors that read other components' stats at scrape time
+
+    A collector is a callable returning ``(name, kind, documentation, samples)`` tuples,
+    where ``samples`` is a list of ``(labels dict, value)`` pairs.
+    """
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(self.prefix + name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(self.prefix + name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, documentation, labels, buckets))
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                name = self.prefix + name
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(list(labels), list(labels.values()))} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
@@ -4,18 +4,24 @@ SQLAlchemy models for health companion application
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.orm import raiseload, selectinload
 from datetime import datetime
+import os
 import uuid
 import json
+import base64
 
-# Try to import PostgreSQL-specific types, fallback to standard types for SQLite
-try:
+from json_provider import JSONFragment, loads as json_loads
+
+# Use PostgreSQL-specific types only when the configured database is PostgreSQL,
+# fallback to standard types for SQLite
+use_postgresql = os.environ.get('DATABASE_URL', '').startswith('postgres')
+if use_postgresql:
     from sqlalchemy.dialects.postgresql import UUID, JSONB
-    use_postgresql = True
-except ImportError:
+else:
     from sqlalchemy import String as UUID
     from sqlalchemy import Text as JSONB
-    use_postgresql = False
 
 db = SQLAlchemy()
 
@@ -23,6 +29,28 @@ db = SQLAlchemy()
 def generate_uuid():
     return str(uuid.uuid4()) if not use_postgresql else uuid.uuid4()
 
+class JSONColumns:
+    """Reading of JSON columns, which hold JSON text on SQLite and decoded values on PostgreSQL"""
+
+    def json_column(self, name, raw_json=False):
+        """Get the value of a JSON column, decoded once per row instance
+
+        The decoded value is kept on the instance until the column is assigned a new
+        text, so serializing the same row again doesn't decode it again; treat it as
+        read-only. With ``raw_json`` the stored text is returned as a JSONFragment,
+        which a JSON response embeds verbatim without decoding it at all.
+        """
+        value = getattr(self, name)
+        if not value or not isinstance(value, str):
+            return value
+        if raw_json:
+            return JSONFragment(value)
+        decoded = vars(self).setdefault('_decoded_json', {})
+        cached = decoded.get(name)
+        if cached is None or cached[0] is not value:
+            cached = decoded[name] = (value, json_loads(value))
+        return cached[1]
+
 class User(db.Model):
     """User model for storing patient information"""
     __tablename__ = 'users'
@@ -73,6 +101,9 @@ class User(db.Model):
 class ChatSession(db.Model):
     """Chat session model for organizing conversations"""
     __tablename__ = 'chat_sessions'
+    __table_args__ = (
+        db.Index('ix_chat_sessions_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36) if not use_postgresql else UUID(as_uuid=True), 
@@ -82,7 +113,8 @@ class ChatSession(db.Model):
     
     # Session metadata
     session_name = db.Column(db.String(255))
-    symptoms_summary = db.Column(db.Text)
+    symptoms_summary = db.Column(db.Text)  # Rolling summary of turns that left the context window
+    summary_message_id = db.Column(db.Integer)  # Last Message.id folded into symptoms_summary
     diagnosis_suggestions = db.Column(db.Text if not use_postgresql else JSONB)
     severity_level = db.Column(db.Integer)  # 1-10 scale
     session_language = db.Column(db.String(10), default='en')
@@ -100,8 +132,19 @@ class ChatSession(db.Model):
     messages = db.relationship('Message', backref='session', lazy=True, cascade='all, delete-orphan')
     health_records = db.relationship('HealthRecord', backref='session', lazy=True)
 
-    def to_dict(self):
-        """Convert session object to dictionary"""
+    def to_dict(self, message_count=None):
+        """Convert session object to dictionary
+
+        Pass ``message_count`` when it was fetched in bulk; otherwise it is taken from
+        loaded messages or counted with a COUNT query rather than loading every row.
+        """
+        if message_count is None:
+            if 'messages' not in inspect(self).unloaded:
+                message_count = len(self.messages)
+            else:
+                message_count = db.session.scalar(
+                    db.select(db.func.count(Message.id)).where(Message.session_id == self.session_id)
+                )
         return {
             'session_id': str(self.session_id),
             'user_id': str(self.user_id) if self.user_id else None,
@@ -113,12 +156,16 @@ class ChatSession(db.Model):
             'ended_at': self.ended_at.isoformat() if self.ended_at else None,
             'is_emergency': self.is_emergency,
             'follow_up_required': self.follow_up_required,
-            'message_count': len(self.messages) if self.messages else 0
+            'message_count': message_count
         }
 
-class Message(db.Model):
+class Message(JSONColumns, db.Model):
     """Message model for storing chat interactions"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Backs keyset pagination of a session's history in either direction
+        db.Index('ix_messages_session_created', 'session_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     message_id = db.Column(db.String(36) if not use_postgresql else UUID(as_uuid=True), 
@@ -134,7 +181,8 @@ class Message(db.Model):
     # AI-specific fields
     ai_source = db.Column(db.String(50))  # 'gemini', 'teachable_machine', 'teachable_llm'
     confidence_score = db.Column(db.Float)
-    metadata = db.Column(db.Text if not use_postgresql else JSONB)  # File info, predictions, etc.
+    # 'metadata' is reserved on declarative models, so the column is mapped under another name
+    message_metadata = db.Column('metadata', db.Text if not use_postgresql else JSONB)  # File info, predictions, etc.
     
     # Language and sensitivity
     language = db.Column(db.String(10), default='en')
@@ -151,9 +199,14 @@ class Message(db.Model):
     file_uploads = db.relationship('FileUpload', backref='message', lazy=True)
     replies = db.relationship('Message', backref=db.backref('parent', remote_side=[message_id]))
 
-    def to_dict(self):
-        """Convert message object to dictionary"""
-        return {
+    def to_dict(self, include_files=False, raw_json=False):
+        """Convert message object to dictionary
+
+        ``include_files`` adds the message's file uploads; load them eagerly first.
+        ``raw_json`` leaves JSON columns as fragments for a JSON response (see
+        ``JSONColumns.json_column``).
+        """
+        data = {
             'message_id': str(self.message_id),
             'session_id': str(self.session_id),
             'sender_type': self.sender_type,
@@ -161,13 +214,16 @@ class Message(db.Model):
             'content': self.content,
             'ai_source': self.ai_source,
             'confidence_score': self.confidence_score,
-            'metadata': json.loads(self.metadata) if self.metadata and isinstance(self.metadata, str) else self.metadata,
+            'metadata': self.json_column('message_metadata', raw_json),
             'language': self.language,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'parent_message_id': str(self.parent_message_id) if self.parent_message_id else None
         }
+        if include_files:
+            data['file_uploads'] = [upload.to_dict(raw_json) for upload in self.file_uploads]
+        return data
 
-class FileUpload(db.Model):
+class FileUpload(JSONColumns, db.Model):
     """File upload model for storing uploaded files metadata"""
     __tablename__ = 'file_uploads'
     
@@ -186,6 +242,8 @@ class FileUpload(db.Model):
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
     upload_path = db.Column(db.Text)
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the file bytes
+    analysis_key = db.Column(db.String(64), index=True)  # Set with a successful analysis, see app.analysis_cache_key
     
     # Analysis results
     analysis_results = db.Column(db.Text if not use_postgresql else JSONB)
@@ -195,7 +253,7 @@ class FileUpload(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)  # For automatic cleanup
 
-    def to_dict(self):
+    def to_dict(self, raw_json=False):
         """Convert file upload object to dictionary"""
         return {
             'file_id': str(self.file_id),
@@ -204,14 +262,18 @@ class FileUpload(db.Model):
             'file_type': self.file_type,
             'file_size': self.file_size,
             'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
             'is_processed': self.is_processed,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'analysis_results': json.loads(self.analysis_results) if self.analysis_results and isinstance(self.analysis_results, str) else self.analysis_results
+            'analysis_results': self.json_column('analysis_results', raw_json)
         }
 
-class HealthRecord(db.Model):
+class HealthRecord(JSONColumns, db.Model):
     """Health record model for storing structured health data"""
     __tablename__ = 'health_records'
+    __table_args__ = (
+        db.Index('ix_health_records_user_date', 'user_id', 'date_recorded'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     record_id = db.Column(db.String(36) if not use_postgresql else UUID(as_uuid=True), 
@@ -235,14 +297,14 @@ class HealthRecord(db.Model):
     # Timestamps
     date_recorded = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def to_dict(self):
+    def to_dict(self, raw_json=False):
         """Convert health record object to dictionary"""
         return {
             'record_id': str(self.record_id),
             'user_id': str(self.user_id) if self.user_id else None,
             'session_id': str(self.session_id) if self.session_id else None,
             'record_type': self.record_type,
-            'record_data': json.loads(self.record_data) if self.record_data and isinstance(self.record_data, str) else self.record_data,
+            'record_data': self.json_column('record_data', raw_json),
             'severity': self.severity,
             'source': self.source,
             'confidence_score': self.confidence_score,
@@ -298,9 +360,24 @@ def init_db(app):
     db.init_app(app)
     
 def create_tables(app):
-    """Create all database tables"""
+    """Create all database tables, and any columns or indexes missing from existing tables"""
     with app.app_context():
         db.create_all()
+        add_missing_columns()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+
+def add_missing_columns():
+    """Add nullable columns declared on the models but missing from existing tables"""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable and column.server_default is None:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
         
 def drop_tables(app):
     """Drop all database tables (use with caution!)"""
@@ -326,13 +403,40 @@ def save_message(session_id, sender_type, message_type, content, ai_source=None,
         message_type=message_type,
         content=content,
         ai_source=ai_source,
-        metadata=json.dumps(metadata) if metadata and not isinstance(metadata, str) else metadata,
+        message_metadata=json.dumps(metadata) if metadata and not isinstance(metadata, str) else metadata,
         language=language
     )
     db.session.add(message)
     db.session.commit()
     return message
 
+def _uuid_value(value):
+    """Convert a UUID string to the type the UUID columns expect"""
+    return uuid.UUID(str(value)) if use_postgresql and value is not None else value
+
+def save_chat_batch(sessions, messages):
+    """Insert chat sessions and messages in a single transaction
+
+    ``sessions`` and ``messages`` are lists of column dicts using the model attribute
+    names (e.g. ``message_metadata``). Messages must belong to a session in the batch
+    or already stored; sessions are only ever created by the server.
+    """
+    uuid_fields = ('session_id', 'message_id', 'parent_message_id', 'user_id')
+    sessions = [{key: _uuid_value(value) if key in uuid_fields else value for key, value in row.items()}
+                for row in sessions]
+    messages = [{key: _uuid_value(value) if key in uuid_fields else value for key, value in row.items()}
+                for row in messages]
+
+    try:
+        if sessions:
+            db.session.execute(db.insert(ChatSession), sessions)
+        if messages:
+            db.session.execute(db.insert(Message), messages)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
 def get_chat_history(session_id, limit=50):
     """Get chat history for a session"""
     return Message.query.filter_by(session_id=session_id)\
@@ -343,4 +447,273 @@ def get_user_sessions(user_id, limit=20):
     """Get user's recent chat sessions"""
     return ChatSession.query.filter_by(user_id=user_id)\
                       .order_by(ChatSession.created_at.desc())\
-                      .limit(limit).all()
\ No newline at end of file
+                      .limit(limit).all()
+
+def list_sessions(user_id=None, session_ids=None, limit=20, messages_per_session=0, raw_json=False):
+    """List chat sessions with message counts, and optionally their latest messages
+
+    Sessions are selected by ``user_id`` or by a list of ``session_ids``, newest first.
+    Counts come from an aggregate subquery and messages (with their file uploads) are
+    loaded in bulk, so the number of SQL statements doesn't grow with the number of
+    sessions: one for the sessions, plus two when ``messages_per_session`` is set.
+    ``raw_json`` leaves the messages' JSON columns as fragments for a JSON response.
+    """
+    if session_ids is not None:
+        condition = ChatSession.session_id.in_([_uuid_value(session_id) for session_id in session_ids])
+    else:
+        condition = ChatSession.user_id == _uuid_value(user_id)
+
+    counts = db.select(Message.session_id, db.func.count(Message.id).label('message_count'))\
+               .join(ChatSession, ChatSession.session_id == Message.session_id)\
+               .where(condition)\
+               .group_by(Message.session_id)\
+               .subquery()
+    rows = db.session.execute(
+        db.select(ChatSession, db.func.coalesce(counts.c.message_count, 0))
+          .outerjoin(counts, counts.c.session_id == ChatSession.session_id)
+          .where(condition)
+          .options(raiseload('*'))
+          .order_by(ChatSession.created_at.desc(), ChatSession.id.desc())
+          .limit(limit)
+    ).all()
+
+    sessions = [session.to_dict(message_count=count) for session, count in rows]
+    if messages_per_session and sessions:
+        messages = _latest_messages([session.session_id for session, _ in rows], messages_per_session, raw_json)
+        for data in sessions:
+            data['messages'] = messages.get(data['session_id'], [])
+    return sessions
+
+def get_session_history(session_id, limit=50, cursor=None, direction='older', raw_json=False):
+    """Get a session with its message count and a page of messages, or None if it doesn't exist
+
+    See ``get_message_page`` for ``cursor``, ``direction`` and ``raw_json``.
+    """
+    sessions = list_sessions(session_ids=[session_id], limit=1)
+    if not sessions:
+        return None
+    return {**sessions[0], **get_message_page(session_id, limit, cursor, direction, raw_json)}
+
+def encode_cursor(message):
+    """Encode a message's (created_at, id) position as an opaque cursor"""
+    raw = json.dumps([message.created_at.isoformat(), message.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id), raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, message_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def get_message_page(session_id, limit=50, cursor=None, direction='older', raw_json=False):
+    """Get a page of a session's messages using keyset pagination
+
+    Messages are ordered by ``(created_at, id)`` and read through the
+    ``ix_messages_session_created`` index, so a page costs the same at any depth.
+    ``direction='older'`` pages backwards from ``cursor`` (from the newest message when
+    no cursor is given) and ``'newer'`` pages forwards (from the oldest). Messages are
+    always returned oldest first, with ``cursors`` to continue in either direction;
+    a cursor is None when there is nothing more that way. ``raw_json`` leaves JSON
+    columns as fragments for a JSON response.
+    """
+    if direction not in ('older', 'newer'):
+        raise ValueError(f"Invalid direction: {direction}")
+
+    position = db.tuple_(Message.created_at, Message.id)
+    query = db.select(Message).where(Message.session_id == _uuid_value(session_id))
+    if direction == 'older':
+        if cursor:
+            query = query.where(position < decode_cursor(cursor))
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    else:
+        if cursor:
+            query = query.where(position > decode_cursor(cursor))
+        query = query.order_by(Message.created_at.asc(), Message.id.asc())
+
+    # One extra row tells whether another page follows
+    messages = list(db.session.execute(
+        query.options(selectinload(Message.file_uploads), raiseload('*')).limit(limit + 1)
+    ).scalars())
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == 'older':
+        messages.reverse()
+
+    # Paging from a cursor means there are messages on the other side of it
+    older = messages and (has_more if direction == 'older' else bool(cursor))
+    newer = messages and (has_more if direction == 'newer' else bool(cursor))
+    return {
+        'messages': [message.to_dict(include_files=True, raw_json=raw_json) for message in messages],
+        'cursors': {
+            'older': encode_cursor(messages[0]) if older else None,
+            'newer': encode_cursor(messages[-1]) if newer else None
+        }
+    }
+
+def _latest_messages(session_ids, per_session, raw_json=False):
+    """Get the latest messages of each session, oldest first, keyed by session id"""
+    ranked = db.select(
+        Message.id,
+        db.func.row_number().over(
+            partition_by=Message.session_id,
+            order_by=(Message.created_at.desc(), Message.id.desc())
+        ).label('rank')
+    ).where(Message.session_id.in_(session_ids)).subquery()
+
+    messages = db.session.execute(
+        db.select(Message)
+          .join(ranked, ranked.c.id == Message.id)
+          .where(ranked.c.rank <= per_session)
+          .options(selectinload(Message.file_uploads), raiseload('*'))
+          .order_by(Message.session_id, Message.created_at, Message.id)
+    ).scalars()
+
+    grouped = {}
+    for message in messages:
+        grouped.setdefault(str(message.session_id), []).append(message.to_dict(include_files=True, raw_json=raw_json))
+    return grouped
+
+def user_has_data(user_id):
+    """Whether anything is stored for a user: the user row, sessions, uploads or health records"""
+    user_id = _uuid_value(user_id)
+    return any(db.session.scalar(db.select(model.id).where(model.user_id == user_id).limit(1)) is not None
+               for model in (User, ChatSession, FileUpload, HealthRecord))
+
+def iter_user_data(user_id, batch_size=500, raw_json=False):
+    """Yield everything stored for a user as ``(record type, dict)`` pairs
+
+    In order: the user ('user', when there is a users row), each of their sessions
+    with a message count ('session') followed by its messages ('message'), then file
+    uploads of the user or attached to their messages ('file_upload') and health
+    records of the user or their sessions ('health_record'). ``raw_json`` leaves JSON
+    columns as fragments for a JSON encoder.
+
+    Rows are read in keyset batches of ``batch_size`` and the session is closed before
+    a batch is handed out, so memory doesn't grow with the size of the history and no
+    transaction (or SQLite read lock) stays open while the caller is consuming rows.
+    """
+    user_id = _uuid_value(user_id)
+    owned_sessions = db.select(ChatSession.session_id).where(ChatSession.user_id == user_id)
+
+    user = db.session.execute(db.select(User).where(User.user_id == user_id)).scalar()
+    if user is not None:
+        data = user.to_dict()
+        db.session.close()
+        yield 'user', data
+
+    def sessions_with_counts(sessions):
+        counts = dict(db.session.execute(
+            db.select(Message.session_id, db.func.count(Message.id))
+              .where(Message.session_id.in_([session.session_id for session in sessions]))
+              .group_by(Message.session_id)
+        ).all())
+        return [session.to_dict(message_count=counts.get(session.session_id, 0)) for session in sessions]
+
+    for sessions in _keyset_batches(db.select(ChatSession).where(ChatSession.user_id == user_id),
+                                    (ChatSession.created_at, ChatSession.id), batch_size, sessions_with_counts):
+        for session in sessions:
+            yield 'session', session
+            for messages in _keyset_batches(
+                db.select(Message).where(Message.session_id == _uuid_value(session['session_id'])),
+                (Message.created_at, Message.id), batch_size,
+                lambda rows: [message.to_dict(raw_json=raw_json) for message in rows]
+            ):
+                for message in messages:
+                    yield 'message', message
+
+    owned_messages = db.select(Message.message_id).where(Message.session_id.in_(owned_sessions))
+    for uploads in _keyset_batches(
+        db.select(FileUpload).where(db.or_(FileUpload.user_id == user_id, FileUpload.message_id.in_(owned_messages))),
+        (FileUpload.id,), batch_size, lambda rows: [upload.to_dict(raw_json) for upload in rows]
+    ):
+        for upload in uploads:
+            yield 'file_upload', upload
+
+    for records in _keyset_batches(
+        db.select(HealthRecord).where(db.or_(HealthRecord.user_id == user_id,
+                                             HealthRecord.session_id.in_(owned_sessions))),
+        (HealthRecord.id,), batch_size, lambda rows: [record.to_dict(raw_json) for record in rows]
+    ):
+        for record in records:
+            yield 'health_record', record
+
+def _keyset_batches(query, keys, batch_size, serialize):
+    """Run ``query`` in batches of ``batch_size`` rows ordered by the ``keys`` columns
+
+    Each batch is serialized and the session closed before it is yielded.
+    """
+    after = None
+    while True:
+        page = query.where(db.tuple_(*keys) > after) if after is not None else query
+        rows = db.session.execute(
+            page.options(raiseload('*')).order_by(*keys).limit(batch_size)
+        ).scalars().all()
+        if not rows:
+            return
+        after = tuple(getattr(rows[-1], key.key) for key in keys)
+        batch = serialize(rows)
+        db.session.close()
+        yield batch
+        if len(rows) < batch_size:
+            return
+
+def save_analysis_logs(rows):
+    """Insert AIAnalysisLog rows (column dicts) in a single transaction"""
+    rows = [{
+        **row,
+        'input_data': json.dumps(row['input_data']) if row.get('input_data') is not None else None,
+        'output_data': json.dumps(row['output_data']) if row.get('output_data') is not None else None
+    } for row in rows]
+    try:
+        db.session.execute(db.insert(AIAnalysisLog), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def find_upload_analysis(analysis_key):
+    """Find the latest stored analysis saved under ``analysis_key``"""
+    results = db.session.execute(
+        db.select(FileUpload.analysis_results)
+        .where(FileUpload.analysis_key == analysis_key, FileUpload.is_processed.is_(True))
+        .order_by(FileUpload.created_at.desc()).limit(1)
+    ).scalar()
+    if isinstance(results, str):
+        results = json_loads(results)
+    return (results or {}).get('response')
+
+def get_file_upload(file_id):
+    """Get a file upload by its file_id"""
+    return FileUpload.query.filter_by(file_id=file_id).first()
+
+def update_upload_analysis(file_id, analysis_results, analysis_key=None):
+    """Store analysis results for an upload and mark it processed"""
+    upload = get_file_upload(file_id)
+    if upload:
+        upload.analysis_results = json.dumps(analysis_results)
+        upload.analysis_key = analysis_key
+        upload.is_processed = True
+        db.session.commit()
+    return upload
+
+def save_file_upload(original_filename, file_type, file_size, mime_type, content_hash,
+                     analysis_results=None, message_id=None, user_id=None, analysis_key=None):
+    """Save uploaded file metadata and, if available, its analysis results"""
+    upload = FileUpload(
+        original_filename=original_filename,
+        file_type=file_type,
+        file_size=file_size,
+        mime_type=mime_type,
+        content_hash=content_hash,
+        analysis_key=analysis_key,
+        analysis_results=json.dumps(analysis_results) if analysis_results is not None else None,
+        is_processed=analysis_results is not None,
+        message_id=message_id,
+        user_id=user_id
+    )
+    db.session.add(upload)
+    db.session.commit()
+    return upload
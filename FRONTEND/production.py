@@ -0,0 +1,79 @@
+"""
+AarogyaLink Production Server
+Pre-fork multi-worker WSGI serving with gunicorn (Linux / macOS)
+
+The app is imported (and its provider clients warmed up) once in the master process
+(``preload_app``) and the workers are forked from it, so the heavy imports
+(google.generativeai, SQLAlchemy) are shared copy-on-write instead of being loaded by
+every worker. Each worker serves requests on a pool of threads (``gthread`` workers).
+
+Graceful reload: ``kill -HUP <master pid>`` starts fresh workers and lets the old ones
+finish their requests (within ``graceful_timeout``). Because the app is preloaded, HUP
+does not pick up code changes; for a new release send ``USR2`` (starts a new master
+with the new code) and then ``TERM`` to the old master.
+"""
+
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    """Two workers per core plus one, capped at 8 since caches and limits are per worker"""
+    return min(multiprocessing.cpu_count() * 2 + 1, 8)
+
+
+def production_options(host='0.0.0.0', port=5000, workers=None, threads=None):
+    """Build gunicorn settings from the arguments and SERVER_* environment variables"""
+    return {
+        'bind': f"{host}:{port}",
+        'workers': workers or int(os.environ.get('SERVER_WORKERS', default_workers())),
+        'threads': threads or int(os.environ.get('SERVER_THREADS', 8)),
+        'worker_class': 'gthread',
+        'preload_app': True,
+        # Streamed chat responses can outlive the provider deadline
+        'timeout': int(os.environ.get('SERVER_TIMEOUT_SECONDS', 120)),
+        'graceful_timeout': int(os.environ.get('SERVER_GRACEFUL_TIMEOUT_SECONDS', 30)),
+        # gthread workers hand kept-alive connections back through their poller, which
+        # tripled p95 latency in benchmarks/serve_dev_vs_production.py; off by default
+        'keepalive': int(os.environ.get('SERVER_KEEPALIVE_SECONDS', 0)),
+        'backlog': int(os.environ.get('SERVER_BACKLOG', 2048)),
+        # Recycle workers after this many requests (0 = never), staggered by the jitter
+        'max_requests': int(os.environ.get('SERVER_MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 0)),
+        'accesslog': os.environ.get('SERVER_ACCESS_LOG') or None,
+        'errorlog': '-',
+        'loglevel': os.environ.get('SERVER_LOG_LEVEL', 'info'),
+        'proc_name': 'aarogyalink'
+    }
+
+
+def serve(application, options, post_fork=None, worker_exit=None):
+    """Serve a WSGI app with gunicorn until the master is stopped
+
+    ``post_fork()`` runs in each new worker before it accepts requests, to replace
+    resources inherited from the master such as database connections, and
+    ``worker_exit()`` runs as a worker shuts down.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Production mode needs gunicorn (pip install gunicorn); it doesn't run on Windows")
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+            if post_fork:
+                self.cfg.set('post_fork', lambda server, worker: post_fork())
+            if worker_exit:
+                self.cfg.set('worker_exit', lambda server, worker: worker_exit())
+
+        def load(self):
+            return application
+
+    logger.info(f"Starting {options['workers']} workers x {options['threads']} threads on {options['bind']}")
+    ProductionServer().run()
@@ -0,0 +1,115 @@
+"""
+AarogyaLink Prompt Templates
+Provider prompts compiled once per mode and language at startup, with the fixed
+preamble kept apart from the per-request text so Gemini can take it as a system
+instruction instead of at the top of every message
+"""
+
+import textwrap
+
+PREAMBLE = """
+    You are Dr. AarogyaLink, a friendly AI health companion.
+    Keep responses short and conversational - like texting a doctor friend.
+
+    **Response style:**
+    - Acknowledge their concern briefly
+    - Ask 1-2 key questions to understand better
+    - Give quick helpful thoughts
+    - Keep total response under 3-4 sentences
+
+    **Example format:**
+    "That sounds uncomfortable! When did this start? Have you tried [simple remedy]? If it gets worse or doesn't improve in a day or two, I'd suggest seeing a doctor."
+
+    **Tone:** Friendly, caring, conversational - like a knowledgeable friend.
+"""
+
+VOICE_NOTE = """
+    **Special Note for Voice Input:**
+    The user has provided their health concern via voice input. Please ensure your response is clear and easy to understand when read aloud.
+    Consider that the user may have speech or hearing difficulties, so avoid complex medical jargon unless necessary.
+"""
+
+LANGUAGE_NOTE = "**Language:** Reply in {name}, whatever language the user writes in."
+
+# Per-request part of each mode: the text around the user's message or image
+# description, after any conversation history
+USER_FORMATS = {
+    'text': ("User Query: ", "\n\nRemember: Keep response conversational and under 3-4 sentences."),
+    'voice': ("User Query: ", "\n\nRemember: Keep response conversational and under 3-4 sentences."),
+    'image': ("Analyze this health image briefly: ", "\n\nKeep response under 3 sentences.")
+}
+
+# Languages offered by the frontend (static/js/language.js)
+LANGUAGES = {'en': 'English', 'hi': 'Hindi', 'pa': 'Punjabi', 'or': 'Odia'}
+
+
+class Prompt(str):
+    """A rendered prompt
+
+    The string itself is the full prompt, for providers without system instructions
+    and for cache and coalescing keys. ``system`` is the template's fixed preamble,
+    ``user`` the per-request part and ``template`` the ``(mode, language)`` key of
+    the template that rendered it.
+    """
+
+    def __new__(cls, text, system, user, template):
+        prompt = super().__new__(cls, text)
+        prompt.system = system
+        prompt.user = user
+        prompt.template = template
+        return prompt
+
+
+class PromptTemplate:
+    """One compiled template: a fixed system preamble and the text around each message
+
+    Rendering only concatenates the message (and history) with strings built here.
+    """
+
+    def __init__(self, key, system, prefix, suffix):
+        self.key = key
+        self.system = system
+        self.prefix = prefix
+        self.suffix = suffix
+        self._head = system + "\n\n"
+
+    def render(self, content, history=None):
+        user = self.prefix + content + self.suffix
+        if history:
+            user = history + "\n\n" + user
+        return Prompt(self._head + user, self.system, user, self.key)
+
+
+def compile_template(mode, language='en', language_name='English'):
+    """Build the template for a mode ('text', 'voice' or 'image') and language code"""
+    sections = [PREAMBLE]
+    if mode == 'voice':
+        sections.append(VOICE_NOTE)
+    if language != 'en':
+        sections.append(LANGUAGE_NOTE.format(name=language_name))
+    system = "\n\n".join(textwrap.dedent(section).strip() for section in sections)
+    return PromptTemplate((mode, language), system, *USER_FORMATS[mode])
+
+
+class PromptTemplates:
+    """Every mode and language's template, compiled once
+
+    Unknown languages fall back to ``default_language``.
+    """
+
+    def __init__(self, languages=None, default_language='en'):
+        self.languages = languages or LANGUAGES
+        self.default_language = default_language
+        self.templates = {
+            (mode, language): compile_template(mode, language, name)
+            for mode in USER_FORMATS for language, name in self.languages.items()
+        }
+
+    def get(self, mode, language='en'):
+        return self.templates.get((mode, language)) or self.templates[(mode, self.default_language)]
+
+    def render(self, mode, content, language='en', history=None):
+        return self.get(mode, language).render(content, history)
+
+    def __iter__(self):
+        return iter(self.templates.values())
@@ -0,0 +1,65 @@
+"""
+AarogyaLink Provider Registry
+Provider clients built on first use, so importing the app doesn't load their SDKs
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRegistry:
+    """Named provider clients, each built once by its factory when first needed
+
+    ``get`` builds a client on first use and returns the same instance afterwards;
+    a factory that raises is logged and the provider stays unavailable (None).
+    ``warm_up`` builds clients ahead of the first request, e.g. in a pre-fork
+    server's master, and ``set`` replaces a client outright.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._clients = {}
+        self._build_ms = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        try:
+            return self._clients[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._clients:
+                started = time.perf_counter()
+                try:
+                    self._clients[name] = self._factories[name]()
+                except Exception as e:
+                    logger.error(f"Failed to initialize {name} client: {e}")
+                    self._clients[name] = None
+                self._build_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+            return self._clients[name]
+
+    def set(self, name, client):
+        with self._lock:
+            self._clients[name] = client
+
+    def loaded(self, name):
+        """Whether a client has been built (without building it)"""
+        return self._clients.get(name) is not None
+
+    def warm_up(self, names=None):
+        """Build the named clients (all by default) now instead of on first use"""
+        for name in names or list(self._factories):
+            self.get(name)
+
+    def stats(self):
+        """Get which clients are built and how long each took for the health endpoint"""
+        return {
+            name: {'loaded': self.loaded(name), 'build_ms': self._build_ms.get(name)}
+            for name in self._factories
+        }
@@ -0,0 +1,196 @@
+"""
+AarogyaLink Admission Control
+Token-bucket rate limits per client and route, with in-memory or SQLite-file bucket
+storage, and a global cap on concurrent requests that call providers
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+# Idle buckets are dropped every this many takes, once they would have refilled
+PRUNE_EVERY = 1000
+
+
+def parse_limit(value):
+    """Parse a limit like '30/60' (30 requests per 60 seconds) into (capacity, refill per second)"""
+    count, _, seconds = str(value).partition('/')
+    count, seconds = int(count), float(seconds or 1)
+    return count, count / seconds
+
+
+def refill(tokens, updated, capacity, rate, now):
+    """Tokens in a bucket at ``now`` after refilling since ``updated``"""
+    return min(capacity, tokens + max(now - updated, 0) * rate)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict; limits apply per process"""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated, seconds to refill)
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def reopen(self):
+        # Nothing to reopen; a forked worker keeps its own copy of the buckets
+        pass
+
+    def take(self, key, capacity, rate, cost=1, now=None):
+        """Take ``cost`` tokens from a bucket; returns (allowed, seconds until allowed)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, 0))
+            tokens = refill(tokens, updated, capacity, rate, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, capacity / rate)
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < v[2]}
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by every worker process that opens it
+
+    Each take runs in an immediate transaction, so concurrent workers see a consistent
+    bucket. Putting the file on a tmpfs such as /dev/shm keeps it in shared memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, idle_after REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def reopen(self):
+        """Open a new connection, e.g. in a worker process forked after the store was created"""
+        with self._lock:
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+
+    def take(self, key, capacity, rate, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = refill(row[0], row[1], capacity, rate, now) if row else capacity
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                self._db.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated, idle_after) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + capacity / rate)
+                )
+
+                self._takes += 1
+                if self._takes % PRUNE_EVERY == 0:
+                    self._db.execute("DELETE FROM rate_limit_buckets WHERE idle_after < ?", (now,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+
+class RateLimiter:
+    """Token buckets per client and route
+
+    ``limits`` maps a route to ``(capacity, refill per second)``; routes without a
+    limit are always admitted. Each client identity (an IP address, and the user id
+    when one is given) has its own bucket per route, and a request must get a token
+    from all of them.
+    """
+
+    def __init__(self, limits, store=None):
+        self.limits = limits
+        self.store = store or MemoryBucketStore()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, route, identities):
+        """Admit a request; returns (allowed, seconds to wait before retrying)"""
+        limit = self.limits.get(route)
+        if limit is None:
+            return True, 0.0
+
+        wait = 0.0
+        for identity in identities:
+            allowed, retry_after = self.store.take(f"{route}\x1f{identity}", *limit)
+            if not allowed:
+                wait = max(wait, retry_after)
+        with self._lock:
+            if wait:
+                self.rejected += 1
+            else:
+                self.allowed += 1
+        return not wait, wait
+
+    def stats(self):
+        """Get limiter counters for the health endpoint"""
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'buckets': len(self.store),
+                'storage': type(self.store).__name__,
+                'limits': {route: f"{capacity}/{round(capacity / rate, 3)}s"
+                           for route, (capacity, rate) in self.limits.items()}
+            }
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on how many requests may be calling providers at once"""
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._active = 0
+        self._lock = threading.Lock()
+        self.peak = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                self.rejected += 1
+                return False
+            self._active += 1
+            self.peak = max(self.peak, self._active)
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = max(self._active - 1, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'peak': self.peak,
+                'rejected': self.rejected
+            }
+
+
+def retry_after_header(seconds):
+    """Whole seconds for a Retry-After header, at least 1"""
+    return str(max(math.ceil(seconds), 1))
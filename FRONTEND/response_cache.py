@@ -0,0 +1,151 @@
+"""
+AarogyaLink Response Cache
+TTL + LRU cache of provider responses keyed on a normalized health query
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Filler words that don't change what is being asked. Verbs, pronouns and tense stay:
+# "do I need a doctor" and "I had chest pain" must not share an answer with
+# "I need a doctor" and "I have chest pain"
+STOPWORDS = {'a', 'an', 'the', 'hi', 'hello', 'hey', 'please', 'just', 'really'}
+
+
+def canonicalize_message(message):
+    """Normalize a user message so trivially different phrasings share a cache key
+
+    Unicode is NFKC-folded and lowercased, punctuation is dropped, whitespace is
+    collapsed and filler words are removed. Word order is kept.
+    """
+    text = unicodedata.normalize('NFKC', message or '').lower()
+    text = re.sub(r"[^\w\s]", '', text)
+    words = [word for word in text.split() if word not in STOPWORDS]
+    return ' '.join(words) or text.strip()
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU response cache with a memory cap and optional SQLite backing
+
+    Entries are JSON-serializable dicts. When ``path`` is set, entries are also written
+    to a SQLite file so they survive restarts; memory misses fall through to it.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=1000, max_bytes=8 * 1024 * 1024, path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path = path
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def reopen(self):
+        """Open a new SQLite connection, e.g. in a worker process forked after the cache was created"""
+        if self.path:
+            with self._lock:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def make_key(source, language, message):
+        """Build a cache key from the input mode, language and canonical message"""
+        raw = f"{source}\x1f{language}\x1f{canonicalize_message(message)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                self._remove(key)
+
+            value = self._load(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._store(key, value, now + self.ttl_seconds)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                self._db.commit()
+
+    def _load(self, key, now):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, key, value, expires_at):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self):
+        """Get cache counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'persistent': self._db is not None
+            }
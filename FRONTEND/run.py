@@ -4,6 +4,7 @@ AarogyaLink Backend Runner
 Simple script to run the Flask application with proper configuration
 """
 
+import argparse
 import os
 import sys
 import webbrowser
@@ -17,9 +18,6 @@ load_dotenv()
 # Add current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Import the Flask app
-from app import app
-
 def open_browser(url, delay=1.5):
     """Open the URL in Microsoft Edge browser after a delay"""
     def open_browser_delayed():
@@ -42,11 +40,47 @@ def open_browser(url, delay=1.5):
     # Run browser opening in a separate thread to not block Flask startup
     threading.Thread(target=open_browser_delayed, daemon=True).start()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the AarogyaLink backend")
+    parser.add_argument('--mode', choices=['dev', 'production'], default=os.environ.get('SERVER_MODE', 'dev'),
+                        help="'dev' runs Flask's development server and opens a browser; 'production' "
+                             "runs pre-fork gunicorn workers (default: $SERVER_MODE or dev)")
+    parser.add_argument('--host', default=os.environ.get('FLASK_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('FLASK_PORT', 5000)))
+    parser.add_argument('--workers', type=int, help='production worker processes (default: $SERVER_WORKERS)')
+    parser.add_argument('--threads', type=int, help='production threads per worker (default: $SERVER_THREADS)')
+    return parser.parse_args()
+
+def run_production(host, port, workers=None, threads=None):
+    """Serve with pre-fork gunicorn workers; the app is imported once here, before forking"""
+    import app as backend
+    from production import serve, production_options
+    
+    backend.warm_up()
+    options = production_options(host, port, workers, threads)
+    print("=" * 60)
+    print("🏥 AarogyaLink Backend Server (production)")
+    print("=" * 60)
+    print(f"🌐 Server URL: http://{host}:{port}")
+    print(f"⚙️  Workers: {options['workers']} x {options['threads']} threads (preloaded app)")
+    print("🔄 Graceful reload: kill -HUP <master pid>")
+    print("=" * 60)
+    serve(backend.app, options, post_fork=backend.after_fork, worker_exit=backend.close_background_writers)
+
 if __name__ == '__main__':
+    args = parse_args()
+    host, port = args.host, args.port
+    
+    if args.mode == 'production':
+        run_production(host, port, args.workers, args.threads)
+        sys.exit(0)
+    
+    # Import the Flask app
+    from app import app, warm_up
+    warm_up()
+    
     # Get configuration from environment variables
     debug = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
-    host = os.environ.get('FLASK_HOST', '0.0.0.0')
-    port = int(os.environ.get('FLASK_PORT', 5000))
     
     print("=" * 60)
     print("🏥 AarogyaLink Backend Server")
@@ -0,0 +1,136 @@
+"""
+AarogyaLink Single-Flight
+Coalesce concurrent identical provider calls so they share one call and its result
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FlightTimeout(TimeoutError):
+    """Raised to a follower when the call it joined hasn't finished in time"""
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.task = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, handing its outcome to every caller
+
+    The first caller for a key (the leader) makes the call; callers arriving while it
+    runs (followers) wait up to ``timeout`` seconds and receive the same result, or
+    the same exception if the call raised. A follower that times out gets
+    ``FlightTimeout`` while the call carries on for the others. Keys are released
+    as soon as the call finishes, so nothing is cached. Results are shared objects
+    and must be treated as read-only.
+
+    Threads use ``do`` and coroutines use ``do_async``; each has its own set of
+    in-flight calls. An async call runs as a task of its own, so a leader whose
+    request is cancelled doesn't cancel the call its followers are waiting on.
+    """
+
+    def __init__(self, timeout=35.0):
+        self.timeout = timeout
+        self._flights = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a key from the parts that fully determine a call, e.g. prompt and image hash"""
+        raw = '\x1f'.join(str(part) for part in parts)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def do(self, key, func):
+        """Return ``func()``, sharing one call among concurrent callers with the same key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as e:
+                flight.error = e
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+                if flight.followers:
+                    logger.info(f"Shared one provider call with {flight.followers} identical requests")
+            return flight.result
+
+        if not flight.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise FlightTimeout(f"Coalesced call did not finish within {self.timeout}s")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def do_async(self, key, func):
+        """Async variant of ``do``; ``func`` returns an awaitable"""
+        with self._lock:
+            flight = self._tasks.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._tasks[key] = _Flight()
+                flight.task = asyncio.ensure_future(func())
+                flight.task.add_done_callback(lambda task: self._finish_task(key, flight))
+                self.calls += 1
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+
+        if leader:
+            return await asyncio.shield(flight.task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise FlightTimeout(f"Coalesced call did not finish within {self.timeout}s")
+
+    def _finish_task(self, key, flight):
+        with self._lock:
+            if self._tasks.get(key) is flight:
+                del self._tasks[key]
+            if not flight.task.cancelled() and flight.task.exception() is not None:
+                self.errors += 1
+        if flight.followers:
+            logger.info(f"Shared one provider call with {flight.followers} identical requests")
+
+    def stats(self):
+        """Get coalescing counters for the health endpoint"""
+        with self._lock:
+            return {
+                'in_flight': len(self._flights) + len(self._tasks),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'follower_timeouts': self.timeouts,
+                'errors': self.errors,
+                'timeout': self.timeout
+            }
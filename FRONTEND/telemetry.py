@@ -0,0 +1,129 @@
+"""
+AarogyaLink Provider Telemetry
+Per-call latency, token and cost records buffered in memory and written to
+ai_analysis_log in batches by a background thread
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from models import save_analysis_logs
+
+logger = logging.getLogger(__name__)
+
+
+def gemini_usage(response):
+    """Get token counts from a Gemini response's usage_metadata, or {} if there are none"""
+    metadata = getattr(response, 'usage_metadata', None)
+    if not metadata:
+        return {}
+    return {
+        'prompt_tokens': getattr(metadata, 'prompt_token_count', 0) or 0,
+        'output_tokens': getattr(metadata, 'candidates_token_count', 0) or 0,
+        'total_tokens': getattr(metadata, 'total_token_count', 0) or 0
+    }
+
+
+class TelemetryRecorder:
+    """Record provider calls without touching the database on the request path
+
+    ``record`` appends a row to a bounded ``deque``, whose appends and pops are atomic,
+    so request threads never take a lock or wait on I/O. When the buffer is full the
+    oldest unwritten records are overwritten. A background thread drains the buffer
+    every ``flush_interval`` seconds and inserts the rows in batches of ``batch_size``.
+    ``prices`` maps a service to ``(input, output)`` USD per million tokens.
+    """
+
+    def __init__(self, app, capacity=10000, batch_size=200, flush_interval=2.0, prices=None):
+        self.app = app
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prices = prices or {}
+        self._buffer = deque(maxlen=capacity)
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        # Counters are only approximate under concurrency; they are never locked
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def _start(self):
+        # Started on first use so importing the app doesn't spawn threads
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                    self._thread.start()
+
+    def cost(self, service, usage):
+        """Compute the USD cost of a call from its token usage"""
+        input_price, output_price = self.prices.get(service, (0.0, 0.0))
+        return (usage.get('prompt_tokens', 0) * input_price + usage.get('output_tokens', 0) * output_price) / 1_000_000
+
+    def record(self, service, started, usage=None, error=None, input_data=None, output_data=None):
+        """Record a provider call that began at ``time.perf_counter()`` value ``started``"""
+        usage = usage or {}
+        if len(self._buffer) == self.capacity:
+            self.dropped += 1
+        self._buffer.append({
+            'ai_service': service,
+            'processing_time_ms': int((time.perf_counter() - started) * 1000),
+            'tokens_used': usage.get('total_tokens') or None,
+            'cost_usd': self.cost(service, usage) if usage else None,
+            'success': error is None,
+            'error_message': str(error)[:1000] if error is not None else None,
+            'input_data': input_data,
+            'output_data': {**(output_data or {}), **usage} or None,
+            'created_at': datetime.utcnow()
+        })
+        self.recorded += 1
+        if self._thread is None:
+            self._start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far in batches"""
+        with self._flush_lock:
+            while self._buffer:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._buffer.popleft())
+                    except IndexError:
+                        break
+                try:
+                    with self.app.app_context():
+                        save_analysis_logs(rows)
+                    self.written += len(rows)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(rows)} telemetry records: {e}")
+                    self.failed += 1
+                    return
+
+    def close(self):
+        """Stop the background thread and write any buffered records"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        """Get recorder counters for the health endpoint"""
+        return {
+            'buffered': len(self._buffer),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_batches': self.failed,
+            'capacity': self.capacity
+        }
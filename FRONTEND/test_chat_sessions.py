@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Chat Session Tests
+Checks that clients can only continue and read back chat sessions the server issued to
+them, and that other reads need the admin token
+"""
+
+from models import Message
+
+
+def chat(client, message, session_id=None):
+    response = client.post('/api/chat', json={'message': message, 'session_id': session_id})
+    assert response.status_code == 200
+    return response.get_json()['session_id']
+
+
+def test_only_issued_session_ids_are_continued(backend):
+    client = backend.app.test_client()
+    token = chat(client, "I have a fever")
+    session_id = backend.session_from_token(token)
+    assert session_id and token.startswith(session_id)
+
+    assert chat(client, "It started yesterday", token) == token
+
+    # A bare or forged id starts a new session instead of writing to this one
+    for forged in (session_id, f"{session_id}.{'0' * 64}", "not-a-session"):
+        assert backend.session_from_token(chat(client, "Show me their history", forged)) != session_id
+
+    backend.message_writer.flush()
+    with backend.app.app_context():
+        assert Message.query.filter_by(session_id=session_id).count() == 4
+
+
+def test_history_needs_the_session_token_or_the_admin_token(backend, monkeypatch):
+    monkeypatch.setattr(backend, 'EXPORT_ADMIN_TOKEN', 's3cret')
+    client = backend.app.test_client()
+    token = chat(client, "I have a headache")
+    session_id = backend.session_from_token(token)
+    backend.message_writer.flush()
+
+    for url in (f"/api/sessions/{session_id}/history", f"/api/sessions?ids={session_id}",
+                "/api/sessions?user_id=00000000-0000-4000-9000-000000000001"):
+        assert client.get(url).status_code == 401
+        assert client.get(url, headers={'Authorization': 'Bearer guess'}).status_code == 401
+    assert client.get(f"/api/sessions/{session_id}/history",
+                      headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+    # The client that was given the session can read it back
+    history = client.get(f"/api/sessions/{token}/history").get_json()
+    assert history['session']['session_id'] == session_id
+    sessions = client.get(f"/api/sessions?ids={token}").get_json()['sessions']
+    assert [session['session_id'] for session in sessions] == [session_id]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Circuit Breaker Tests
+Checks opening on errors and slow calls, half-open probing and p95 routing
+"""
+
+from circuit_breaker import CircuitBreaker, ProviderRouter, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker('teachable', window=10, min_calls=4, error_rate=0.5, slow_call_seconds=5,
+                             open_seconds=30, half_open_probes=1, clock=clock)
+
+    for seconds, success in [(0.1, True), (0.1, False), (0.1, True)]:
+        assert breaker.allow()
+        breaker.record(seconds, success)
+    assert breaker.state == CLOSED
+
+    # A slow call counts as a failure even though it succeeded
+    breaker.record(6.0, True)
+    assert breaker.state == OPEN
+    assert not breaker.allow() and not breaker.available()
+
+    clock.now = 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(0.2, False)
+    assert breaker.state == OPEN
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record(0.2, True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['recent_calls'] == 0
+    assert breaker.stats()['rejected'] == 2
+
+
+def test_cancelled_probe_is_released():
+    clock = FakeClock()
+    breaker = CircuitBreaker('gemini', min_calls=1, open_seconds=10, clock=clock)
+    breaker.record(0.1, False)
+    clock.now = 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_route_skips_open_providers_and_prefers_lower_p95():
+    router = ProviderRouter(['gemini', 'teachable'], preferred='teachable', min_calls=3)
+    assert router.route(['gemini', 'teachable']) == ['teachable', 'gemini']
+
+    for _ in range(5):
+        router.record('gemini', 0.4, True)
+        router.record('teachable', 1.2, True)
+    assert router.route(['gemini', 'teachable']) == ['gemini', 'teachable']
+
+    for _ in range(5):
+        router.record('gemini', 0.1, False)
+    assert router.breakers['gemini'].state == OPEN
+    assert router.route(['gemini', 'teachable']) == ['teachable']
+    assert router.stats()['teachable']['p95_ms'] == 1200.0
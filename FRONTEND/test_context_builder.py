@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Context Builder Tests
+Checks the token budget and the incremental rolling summary
+"""
+
+import uuid
+
+from models import db, ChatSession, Message
+from context_builder import ContextBuilder, estimate_tokens, format_turn, render_context
+
+
+def add_turns(session_id, start, count):
+    for index in range(start, start + count):
+        db.session.add(Message(session_id=session_id, sender_type='user' if index % 2 == 0 else 'ai',
+                               message_type='text', content=f"Turn {index:02d} " + "x" * 30))
+    db.session.commit()
+
+
+def test_window_fits_budget_and_summary_is_incremental(app):
+    session_id = str(uuid.uuid4())
+    db.session.add(ChatSession(session_id=session_id))
+    db.session.commit()
+    add_turns(session_id, 0, 4)
+
+    calls = []
+
+    def summarizer(previous, turns):
+        calls.append([turn['content'][:7] for turn in turns])
+        return ' '.join(filter(None, [previous] + [turn['content'][:7] for turn in turns]))
+
+    turn_tokens = estimate_tokens(format_turn({'role': 'ai', 'content': "Turn 00 " + "x" * 30}))
+    builder = ContextBuilder(max_tokens=3 * turn_tokens + 50, summary_tokens=50, summarizer=summarizer)
+
+    context = builder.build(session_id)
+    assert [turn['content'][:7] for turn in context['turns']] == ["Turn 01", "Turn 02", "Turn 03"]
+    assert context['tokens']['history'] <= 3 * turn_tokens
+    assert context['summary'] == "Turn 00"
+    assert calls == [["Turn 00"]]
+
+    # Nothing new fell out of the window, so the summary isn't recomputed
+    assert builder.build(session_id)['summary'] == "Turn 00"
+    assert len(calls) == 1
+
+    add_turns(session_id, 4, 2)
+    context = builder.build(session_id)
+    assert calls[-1] == ["Turn 01", "Turn 02"]
+    assert context['summary'] == "Turn 00 Turn 01 Turn 02"
+    assert [turn['content'][:7] for turn in context['turns']] == ["Turn 03", "Turn 04", "Turn 05"]
+
+    session = db.session.get(ChatSession, 1)
+    assert session.symptoms_summary == "Turn 00 Turn 01 Turn 02"
+    assert "Turn 02" in render_context(context) and "Turn 05" in render_context(context)
+
+
+def test_pending_messages_are_included_once(app):
+    session_id = str(uuid.uuid4())
+    db.session.add(ChatSession(session_id=session_id))
+    db.session.commit()
+    add_turns(session_id, 0, 1)
+    stored = Message.query.first()
+
+    pending = [
+        {'message_id': str(stored.message_id), 'session_id': session_id, 'sender_type': 'user', 'content': stored.content},
+        {'message_id': str(uuid.uuid4()), 'session_id': session_id, 'sender_type': 'ai', 'content': "Queued reply"}
+    ]
+    builder = ContextBuilder(pending=lambda value: [row for row in pending if row['session_id'] == value])
+
+    context = builder.build(session_id)
+    assert [turn['content'] for turn in context['turns']] == [stored.content, "Queued reply"]
+    assert context['summary'] is None
+    assert render_context(builder.build(str(uuid.uuid4()))) == ''
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Data Export Tests
+Checks the NDJSON export's records, its batching and gzip output, that a
+batch doesn't hold the database while it is being consumed, and the endpoint's token
+"""
+
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from data_export import export_records, export_stream
+from models import db, User, ChatSession, Message, FileUpload, HealthRecord, user_has_data
+
+USER_ID = str(uuid.uuid4())
+
+
+def add_user_data(sessions=3, messages_per_session=4):
+    """A user with sessions, messages, an upload on each first message and a health record"""
+    started = datetime(2024, 1, 1)
+    db.session.add(User(user_id=USER_ID, username='asha'))
+    for index in range(sessions):
+        session = ChatSession(user_id=USER_ID, session_name=f"Session {index}",
+                              created_at=started + timedelta(days=index))
+        db.session.add(session)
+        db.session.flush()
+        for position in range(messages_per_session):
+            message = Message(session_id=session.session_id, sender_type='user', message_type='text',
+                              content=f"Message {index}.{position}",
+                              message_metadata=json.dumps({"position": position}),
+                              created_at=started + timedelta(days=index, minutes=position))
+            db.session.add(message)
+            if position == 0:
+                db.session.flush()
+                db.session.add(FileUpload(message_id=message.message_id, original_filename='rash.png',
+                                          analysis_results=json.dumps({"response": "A mild rash"})))
+        db.session.add(HealthRecord(session_id=session.session_id, record_type='symptom',
+                                    record_data=json.dumps({"symptom": "fever"})))
+    # Another user's rows stay out of the export
+    other = ChatSession(user_id=str(uuid.uuid4()))
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Message(session_id=other.session_id, content="Not exported"))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def read_export(app, **kwargs):
+    return [json.loads(line) for line in b''.join(export_stream(USER_ID, app.json.dumps, **kwargs)).splitlines()]
+
+
+@pytest.mark.parametrize('raw_json', [False, True])
+def test_export_records(app, raw_json):
+    add_user_data()
+
+    records = read_export(app, batch_size=3, raw_json=raw_json)
+    types = [record['type'] for record in records]
+    assert types[:3] == ['export', 'user', 'session']
+    assert types[-1] == 'end'
+    assert records[-1]['counts'] == {'user': 1, 'session': 3, 'message': 12, 'file_upload': 3, 'health_record': 3}
+
+    # Each session is followed by its messages, in order, with JSON columns decoded
+    messages = [record['data'] for record in records if record['type'] == 'message']
+    assert [message['content'] for message in messages[:5]] == \
+        ["Message 0.0", "Message 0.1", "Message 0.2", "Message 0.3", "Message 1.0"]
+    assert messages[1]['metadata'] == {"position": 1}
+    assert types[types.index('session') + 5] == 'session'
+    uploads = [record['data'] for record in records if record['type'] == 'file_upload']
+    assert uploads[0]['analysis_results'] == {"response": "A mild rash"}
+
+    assert user_has_data(USER_ID)
+    assert not user_has_data(str(uuid.uuid4()))
+
+
+def test_export_gzip(app):
+    add_user_data(sessions=1, messages_per_session=2)
+
+    plain = b''.join(export_stream(USER_ID, app.json.dumps))
+    compressed = b''.join(export_stream(USER_ID, app.json.dumps, compress=True))
+    # Only the export timestamp in the header differs
+    assert gzip.decompress(compressed).splitlines()[1:] == plain.splitlines()[1:]
+
+
+def test_export_reads_in_batches_without_holding_a_transaction(app):
+    add_user_data(sessions=1, messages_per_session=10)
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    counts = {}
+    for record in export_records(USER_ID, batch_size=4):
+        # Rows are handed out with the session closed, so writers aren't locked out meanwhile
+        assert not db.session().in_transaction()
+        counts[record['type']] = counts.get(record['type'], 0) + 1
+    assert counts['message'] == 10
+
+    # Messages are read in three bounded keyset queries (4 + 4 + 2)
+    pages = [statement for statement in statements if statement.startswith('SELECT messages.id')]
+    assert len(pages) == 3
+    assert all('LIMIT' in statement for statement in pages)
+
+
+def test_export_endpoint_needs_the_admin_token(backend, monkeypatch):
+    client = backend.app.test_client()
+    url = f"/api/users/{uuid.uuid4()}/export"
+
+    # Off unless a token is configured
+    monkeypatch.setattr(backend, 'EXPORT_ADMIN_TOKEN', None)
+    assert client.get(url, headers={'Authorization': 'Bearer '}).status_code == 404
+
+    monkeypatch.setattr(backend, 'EXPORT_ADMIN_TOKEN', 's3cret')
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers={'Authorization': 'Bearer guess'}).status_code == 401
+    response = client.get(url, headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 404 and response.get_json() == {"error": "User not found"}
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Fake Provider Tests
+Checks the distributions, seeded error rates and response shapes of the offline providers
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from fake_providers import (FakeProvider, FakeGeminiModel, FakeTeachableClient, FakeProviderError,
+                            parse_distribution)
+from telemetry import gemini_usage
+
+
+def test_distributions_and_seeded_error_rate():
+    rng = random.Random(0)
+    assert parse_distribution('0.25')(rng) == 0.25
+    assert all(0.1 <= parse_distribution('uniform:0.1,0.2')(rng) <= 0.2 for _ in range(100))
+    assert all(parse_distribution('normal:0.0,1.0')(rng) >= 0 for _ in range(100))
+    with pytest.raises(ValueError):
+        parse_distribution('zipf:1')
+
+    def failures(name, seed):
+        provider = FakeProvider(name, latency=0, error_rate=0.2, seed=seed)
+        return [provider.draw('hello')[1] for _ in range(1000)]
+
+    assert failures('gemini', 7) == failures('gemini', 7)
+    assert failures('gemini', 7) != failures('teachable', 7)
+    assert 150 < sum(failures('gemini', 7)) < 250
+
+
+def test_fake_clients_answer_like_the_real_ones():
+    gemini = FakeGeminiModel(FakeProvider('gemini', latency=0, output_tokens=50))
+    response = gemini.generate_content('I have a cough')
+    assert response.text and gemini_usage(response)['output_tokens'] == 50
+
+    chunks = list(gemini.generate_content('I have a cough', stream=True))
+    assert ''.join(chunk.text for chunk in chunks) == response.text
+    assert gemini_usage(chunks[-1]) and not gemini_usage(chunks[0])
+
+    async def stream():
+        return [chunk.text async for chunk in await gemini.generate_content_async('hi', stream=True)]
+    assert ''.join(asyncio.run(stream()))
+
+    failing = FakeGeminiModel(FakeProvider('gemini', latency=0, error_rate=1.0))
+    with pytest.raises(FakeProviderError):
+        failing.generate_content('hi')
+
+    teachable = FakeTeachableClient(FakeProvider('teachable', latency=0, output_tokens=30))
+    body = teachable.post('https://example.invalid/completions', json={'prompt': 'hi'}).json()
+    assert body['completion'] and body['usage']['completion_tokens'] == 30
+    assert teachable.stats.to_dict()['requests'] == 1
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Import Time Tests
+Checks that importing the app stays within a time budget and leaves the provider
+SDKs, Pillow and the browser module to be imported on first use
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative seconds for `import app` reported by -X importtime; override on slow machines
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_TIME_BUDGET_SECONDS', 1.0))
+
+LAZY_MODULES = ('google.generativeai', 'PIL', 'requests', 'webbrowser')
+
+# Passed through to the subprocess; app settings (e.g. FAKE_PROVIDERS set by a
+# fixture) are not, so the result doesn't depend on which tests ran first
+SYSTEM_VARIABLES = ('PATH', 'HOME', 'SYSTEMROOT', 'TMPDIR', 'TEMP', 'TMP')
+
+
+def import_times(tmp_path):
+    """Import the app in a fresh interpreter; returns {module: cumulative seconds}"""
+    env = {
+        **{name: os.environ[name] for name in SYSTEM_VARIABLES if name in os.environ},
+        'PYTHONPATH': FRONTEND_DIR,
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'import.db'}"
+    }
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)', line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return times
+
+
+def test_app_import_is_lazy_and_within_budget(tmp_path):
+    times = import_times(tmp_path)
+
+    assert 'app' in times
+    imported = [name for name in LAZY_MODULES if name in times]
+    assert imported == [], f"imported at app import: {imported}"
+    assert times['app'] < IMPORT_BUDGET_SECONDS, \
+        f"app import took {times['app']:.3f}s (budget {IMPORT_BUDGET_SECONDS}s)"
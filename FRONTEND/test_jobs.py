@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Upload Job Tests
+Checks validation of the job status endpoint's query parameters
+"""
+
+import uuid
+
+import pytest
+
+
+@pytest.mark.parametrize('wait', ['abc', 'nan', 'inf', '-inf', ''])
+def test_bad_wait_is_rejected(backend, wait):
+    response = backend.app.test_client().get(f"/api/jobs/{uuid.uuid4()}?wait={wait}")
+    assert response.status_code == 400
+
+
+def test_wait_is_clamped(backend, monkeypatch):
+    waits = []
+    monkeypatch.setattr(backend.job_queue, 'wait', lambda job_id, timeout: waits.append(timeout))
+    client = backend.app.test_client()
+
+    for wait in ('-5', '0', '2.5', '1e9'):
+        assert client.get(f"/api/jobs/{uuid.uuid4()}?wait={wait}").status_code == 404
+    assert waits == [2.5, backend.JOB_MAX_WAIT_SECONDS]
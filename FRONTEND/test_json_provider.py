@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink JSON Provider Tests
+Checks that FastJSONProvider matches Flask's default output, embeds JSON fragments
+verbatim (decoding them without orjson) and that decoded JSON columns are reused
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import FastJSONProvider, JSONFragment
+from models import Message
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_output_matches_default_provider(app):
+    data = {"b": [1, 2.5, None, True], "a": {"when": datetime(2024, 1, 2, 3, 4, 5), "text": "fever"}}
+    fast, default = FastJSONProvider(app), DefaultJSONProvider(app)
+
+    assert fast.dumps(data) == default.dumps(data, separators=(',', ':'))
+    assert fast.loads(fast.dumps(data)) == default.loads(default.dumps(data))
+    with app.app_context():
+        assert json.loads(fast.response(data).get_data()) == json.loads(default.response(data).get_data())
+        assert fast.response(data).mimetype == 'application/json'
+
+
+def test_fragments_embedded_verbatim_or_decoded(app, monkeypatch):
+    provider = FastJSONProvider(app)
+    data = {"metadata": JSONFragment('{"position": 0, "tags": ["a"]}')}
+
+    if json_provider.orjson is not None:
+        assert provider.dumps(data) == '{"metadata":{"position": 0, "tags": ["a"]}}'
+
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    assert json.loads(provider.dumps(data)) == {"metadata": {"position": 0, "tags": ["a"]}}
+
+
+def test_json_column_decoded_once_per_text():
+    message = Message(content="hello", message_metadata='{"position": 0}')
+
+    first = message.to_dict()['metadata']
+    assert first == {"position": 0}
+    assert message.to_dict()['metadata'] is first
+
+    message.message_metadata = '{"position": 1}'
+    assert message.to_dict()['metadata'] == {"position": 1}
+
+    raw = message.to_dict(raw_json=True)['metadata']
+    assert isinstance(raw, JSONFragment) and raw.raw == '{"position": 1}'
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Message Writer Tests
+Checks that a failing batch is retried and then written row by row, dropping only
+the rows that can't be stored
+"""
+
+import uuid
+
+import message_writer
+from message_writer import MessageWriter
+from models import db, Message
+
+
+def message_row(session_id, content, message_id=None):
+    return {'message_id': message_id or str(uuid.uuid4()), 'session_id': session_id,
+            'sender_type': 'user', 'message_type': 'text', 'content': content}
+
+
+def test_a_bad_row_only_drops_itself(app):
+    writer = MessageWriter(app)
+    session_id = str(uuid.uuid4())
+    duplicate = str(uuid.uuid4())
+    writer.add_session({'session_id': session_id})
+    writer.add_message(message_row(session_id, "First", message_id=duplicate))
+    writer.flush()
+
+    # The repeated message id fails the whole batch, then only that row is left out
+    for content in ("Second", "Third"):
+        writer.add_message(message_row(session_id, content))
+    writer.add_message(message_row(session_id, "Repeated", message_id=duplicate))
+    writer.close()
+
+    assert sorted(message.content for message in Message.query.all()) == ["First", "Second", "Third"]
+    stats = writer.stats()
+    assert (stats['written'], stats['batches'], stats['failed_batches'], stats['dropped']) == (4, 1, 1, 1)
+
+
+def test_a_failed_batch_is_retried_once(app, monkeypatch):
+    calls = []
+
+    def flaky_save(sessions, messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        save_chat_batch(sessions, messages)
+
+    save_chat_batch = message_writer.save_chat_batch
+    monkeypatch.setattr(message_writer, 'save_chat_batch', flaky_save)
+    writer = MessageWriter(app)
+    session_id = str(uuid.uuid4())
+    writer.add_session({'session_id': session_id})
+    for content in ("First", "Second"):
+        writer.add_message(message_row(session_id, content))
+    writer.close()
+
+    assert calls == [2, 2]
+    assert db.session.query(Message).count() == 2
+    assert writer.stats()['dropped'] == 0
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Metrics Tests
+Checks the Prometheus text rendering of counters, gauges, histograms and collectors
+"""
+
+import threading
+
+from metrics import MetricsRegistry
+
+
+def test_render_counters_gauges_and_histograms():
+    registry = MetricsRegistry(prefix='test_')
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    in_flight = registry.gauge('in_flight', 'In flight')
+    latency = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    registry.register_collector(lambda: [('cache_hit_ratio', 'gauge', 'Hit ratio', [({'cache': 'a"b'}, 0.25)])])
+
+    def work():
+        for _ in range(1000):
+            requests.inc('/api/chat')
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe('/api/chat', value=value)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_requests_total counter' in lines
+    assert 'test_requests_total{route="/api/chat"} 4000' in lines
+    assert 'test_in_flight 1' in lines
+    assert 'test_latency_seconds_bucket{route="/api/chat",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/api/chat",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/api/chat",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_sum{route="/api/chat"} 4.05' in lines
+    assert 'test_latency_seconds_count{route="/api/chat"} 4' in lines
+    assert 'test_cache_hit_ratio{cache="a\\"b"} 0.25' in lines
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Model Query Tests
+Checks that the bulk session/history helpers and the stored analysis lookup run a fixed
+number of SQL statements
+"""
+
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import (db, ChatSession, Message, FileUpload, get_user_sessions, list_sessions,
+                    get_session_history, get_message_page, find_upload_analysis, save_file_upload)
+
+USER_ID = str(uuid.uuid4())
+
+
+def add_sessions(count, messages_per_session=3):
+    """Create sessions for USER_ID, each with messages and an upload on the first message"""
+    started = datetime(2024, 1, 1)
+    for index in range(count):
+        session = ChatSession(user_id=USER_ID, session_name=f"Session {index}",
+                              created_at=started + timedelta(hours=index))
+        db.session.add(session)
+        db.session.flush()
+        for position in range(messages_per_session):
+            message = Message(session_id=session.session_id, sender_type='user' if position % 2 == 0 else 'ai',
+                              message_type='text', content=f"Message {position}",
+                              message_metadata=json.dumps({"position": position}),
+                              created_at=started + timedelta(hours=index, minutes=position))
+            db.session.add(message)
+            if position == 0:
+                db.session.flush()
+                db.session.add(FileUpload(message_id=message.message_id, original_filename='rash.png',
+                                          file_type='image', file_size=100, content_hash='0' * 64))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+class QueryCounter:
+    """Count SQL statements sent to the engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+@pytest.mark.parametrize('sessions', [1, 5, 40])
+def test_list_sessions_query_count_is_constant(app, sessions):
+    add_sessions(sessions)
+
+    with QueryCounter(db.engine) as counter:
+        result = list_sessions(user_id=USER_ID, limit=100)
+    assert counter.count == 1
+    assert len(result) == sessions
+    assert all(session['message_count'] == 3 for session in result)
+
+    db.session.expunge_all()
+    with QueryCounter(db.engine) as counter:
+        result = list_sessions(user_id=USER_ID, limit=100, messages_per_session=2)
+    assert counter.count == 3
+    assert all(len(session['messages']) == 2 for session in result)
+
+
+def test_list_sessions_matches_lazy_serialization(app):
+    add_sessions(4)
+
+    with QueryCounter(db.engine) as counter:
+        lazy = [session.to_dict() for session in get_user_sessions(USER_ID)]
+    # The per-session path issues one extra query per session
+    assert counter.count == 1 + 4
+
+    assert list_sessions(user_id=USER_ID) == lazy
+
+
+def test_session_history(app):
+    add_sessions(2, messages_per_session=5)
+    session_id = list_sessions(user_id=USER_ID)[0]['session_id']
+    db.session.expunge_all()
+
+    with QueryCounter(db.engine) as counter:
+        history = get_session_history(session_id, limit=3)
+    assert counter.count == 3
+
+    assert history['message_count'] == 5
+    assert [message['content'] for message in history['messages']] == ["Message 2", "Message 3", "Message 4"]
+    assert all(message['file_uploads'] == [] for message in history['messages'])
+
+    full = get_session_history(session_id)
+    assert full['messages'][0]['file_uploads'][0]['original_filename'] == 'rash.png'
+    assert full['messages'][0]['metadata'] == {"position": 0}
+
+    assert get_session_history(str(uuid.uuid4())) is None
+
+
+def test_message_page_keyset_both_directions(app):
+    add_sessions(1, messages_per_session=7)
+    session_id = list_sessions(user_id=USER_ID)[0]['session_id']
+
+    def contents(page):
+        return [message['content'] for message in page['messages']]
+
+    newest = get_message_page(session_id, limit=3)
+    assert contents(newest) == ["Message 4", "Message 5", "Message 6"]
+    assert newest['cursors']['newer'] is None
+
+    middle = get_message_page(session_id, limit=3, cursor=newest['cursors']['older'])
+    assert contents(middle) == ["Message 1", "Message 2", "Message 3"]
+    oldest = get_message_page(session_id, limit=3, cursor=middle['cursors']['older'])
+    assert contents(oldest) == ["Message 0"]
+    assert oldest['cursors']['older'] is None
+
+    forward = get_message_page(session_id, limit=3, cursor=oldest['cursors']['newer'], direction='newer')
+    assert contents(forward) == contents(middle)
+    last = get_message_page(session_id, limit=3, cursor=forward['cursors']['newer'], direction='newer')
+    assert contents(last) == contents(newest)
+    assert last['cursors']['newer'] is None
+
+    assert contents(get_message_page(session_id, limit=2, direction='newer')) == ["Message 0", "Message 1"]
+    with pytest.raises(ValueError):
+        get_message_page(session_id, cursor='not-a-cursor')
+
+
+def test_keyset_page_uses_composite_index(app):
+    add_sessions(1, messages_per_session=4)
+    session_id = list_sessions(user_id=USER_ID)[0]['session_id']
+    cursor = get_message_page(session_id, limit=2)['cursors']['older']
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        get_message_page(session_id, limit=2, cursor=cursor)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    statement, parameters = statements[0]
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'ix_messages_session_created' in details
+    assert 'TEMP B-TREE' not in details
+
+
+def test_find_upload_analysis_is_one_indexed_query(app):
+    for index in range(3):
+        save_file_upload('rash.png', 'image', 100, 'image/png', '0' * 64, analysis_key='a' * 64,
+                         analysis_results={"response": {"primary_response": f"Analysis {index}"}})
+    save_file_upload('rash.png', 'image', 100, 'image/png', '0' * 64, analysis_key='b' * 64,
+                     analysis_results={"response": {"primary_response": "Other description"}})
+    for upload in FileUpload.query.filter_by(analysis_key='a' * 64):
+        upload.created_at = datetime(2024, 1, 1) + timedelta(minutes=upload.id)
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert find_upload_analysis('a' * 64) == {"primary_response": "Analysis 2"}
+    assert find_upload_analysis('c' * 64) is None
+    assert len(statements) == 2 and all('LIMIT' in statement for statement in statements)
+    assert 'ix_file_uploads_analysis_key' in {index.name for index in FileUpload.__table__.indexes}
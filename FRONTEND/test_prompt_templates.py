@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Prompt Template Tests
+Checks the compiled templates' system/message split, language fallback and history
+"""
+
+from prompt_templates import Prompt, PromptTemplates
+
+
+def test_render_splits_preamble_from_message():
+    templates = PromptTemplates()
+    prompt = templates.render('text', 'I have a headache', 'hi', history='Patient: It started yesterday')
+
+    assert isinstance(prompt, Prompt)
+    assert prompt.template == ('text', 'hi')
+    assert prompt.system.startswith('You are Dr. AarogyaLink')
+    assert 'Reply in Hindi' in prompt.system
+    assert 'I have a headache' not in prompt.system
+    assert prompt.user.startswith('Patient: It started yesterday\n\nUser Query: I have a headache')
+    assert prompt == f"{prompt.system}\n\n{prompt.user}"
+
+
+def test_modes_and_language_fallback():
+    templates = PromptTemplates()
+    voice = templates.get('voice', 'en')
+    image = templates.render('image', 'a rash on the arm', 'xx')
+
+    assert 'Voice Input' in voice.system
+    assert 'Voice Input' not in templates.get('text', 'en').system
+    assert 'Reply in' not in templates.get('text', 'en').system
+    assert image.template == ('image', 'en')
+    assert image.user.startswith('Analyze this health image briefly: a rash on the arm')
+    assert len(list(templates)) == 3 * 4
+    # Compiled preambles carry no source indentation
+    assert all('\n    ' not in template.system for template in templates)
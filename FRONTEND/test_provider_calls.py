@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Provider Call Tests
+Checks that call_providers answers from the hedge when the preferred provider is slow,
+only hedges while the provider pool has a free worker, and counts deadlines from when
+a call starts running
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+def slow_provider(seconds, text, calls=None):
+    """A fake provider call that takes ``seconds`` and records that it ran"""
+    def call():
+        if calls is not None:
+            calls.append(text)
+        time.sleep(seconds)
+        return {"text": text}
+    return call
+
+
+@pytest.fixture
+def providers(backend, monkeypatch):
+    """Replace the provider calls with fakes: providers(gemini=call, teachable=call)"""
+    monkeypatch.setattr(backend, 'PROVIDER_EXECUTION_MODE', 'parallel')
+    monkeypatch.setitem(backend.PROVIDER_DEADLINES, 'gemini', 0.3)
+    monkeypatch.setitem(backend.PROVIDER_DEADLINES, 'teachable', 0.3)
+
+    def use(**calls):
+        monkeypatch.setattr(backend.health_api, 'provider_calls', lambda prompt: calls)
+    return use
+
+
+def test_slow_preferred_provider_is_abandoned_at_its_deadline(backend, providers):
+    providers(gemini=slow_provider(2.0, "gemini"), teachable=slow_provider(0.05, "teachable"))
+
+    started = time.monotonic()
+    results = backend.health_api.call_providers("I have a headache")
+    elapsed = time.monotonic() - started
+
+    assert results == {"teachable": {"text": "teachable"}}
+    assert 0.25 < elapsed < 1.0
+
+
+def test_hedge_skipped_while_pool_is_full(backend, providers, monkeypatch):
+    calls = []
+    providers(gemini=slow_provider(0.01, "gemini", calls), teachable=slow_provider(0.01, "teachable", calls))
+    # Every worker is taken, e.g. by calls earlier requests abandoned
+    monkeypatch.setattr(backend, 'PROVIDER_MAX_WORKERS', backend.provider_pool_calls)
+
+    results = backend.health_api.call_providers("I have a headache")
+
+    assert results == {"gemini": {"text": "gemini"}}
+    assert calls == ["gemini"]
+
+
+def test_deadline_counts_from_when_the_call_starts(backend, providers, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(backend, 'provider_executor', executor)
+    providers(gemini=slow_provider(0.1, "gemini"))
+
+    # The only worker is busy for longer than the deadline before the call gets to run
+    release = threading.Event()
+    executor.submit(release.wait, 0.5)
+    try:
+        results = backend.health_api.call_providers("I have a headache")
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert results == {"gemini": {"text": "gemini"}}
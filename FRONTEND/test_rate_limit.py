@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Admission Control Tests
+Checks token-bucket refill and Retry-After for both bucket stores, and the concurrency cap
+"""
+
+import pytest
+
+from rate_limit import (RateLimiter, ConcurrencyLimiter, MemoryBucketStore, SQLiteBucketStore,
+                        parse_limit, retry_after_header)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return MemoryBucketStore() if request.param == 'memory' else SQLiteBucketStore(str(tmp_path / 'buckets.db'))
+
+
+def test_bucket_allows_burst_then_refills(store):
+    capacity, rate = parse_limit('3/6')
+    assert (capacity, rate) == (3, 0.5)
+
+    assert [store.take('ip:1', capacity, rate, now=100)[0] for _ in range(3)] == [True] * 3
+    allowed, retry_after = store.take('ip:1', capacity, rate, now=100)
+    assert not allowed and retry_after == pytest.approx(2.0)
+    assert retry_after_header(retry_after) == '2'
+
+    # Other clients have their own bucket
+    assert store.take('ip:2', capacity, rate, now=100)[0]
+
+    # One token is back after two seconds
+    assert store.take('ip:1', capacity, rate, now=102)[0]
+    assert not store.take('ip:1', capacity, rate, now=102)[0]
+
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path):
+    first = SQLiteBucketStore(str(tmp_path / 'buckets.db'))
+    second = SQLiteBucketStore(str(tmp_path / 'buckets.db'))
+    assert first.take('ip:1', 2, 1.0, now=10)[0]
+    assert second.take('ip:1', 2, 1.0, now=10)[0]
+    assert not first.take('ip:1', 2, 1.0, now=10)[0]
+
+
+def test_limiter_checks_every_identity_and_skips_unlimited_routes():
+    limiter = RateLimiter({'/api/upload': (1, 0.1)})
+    assert limiter.check('/api/upload', ['ip:1', 'user:a']) == (True, 0.0)
+
+    # A new user id doesn't get around the client's IP bucket
+    allowed, retry_after = limiter.check('/api/upload', ['ip:1', 'user:b'])
+    assert not allowed and retry_after > 0
+    assert limiter.check('/api/contact', ['ip:1'])[0]
+    assert limiter.stats()['rejected'] == 1
+
+
+def test_concurrency_limiter():
+    limiter = ConcurrencyLimiter(2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+    assert limiter.stats() == {'active': 2, 'max_concurrent': 2, 'peak': 2, 'rejected': 1}
+
+
+def test_only_upload_jobs_skip_the_provider_cap(backend, monkeypatch):
+    monkeypatch.setattr(backend, 'rate_limiter', None)
+    monkeypatch.setattr(backend, 'provider_concurrency', ConcurrencyLimiter(0))
+    client = backend.app.test_client()
+
+    # The job flag means nothing on other routes, so it doesn't get a chat around the cap
+    for url in ('/api/chat', '/api/chat?async=true'):
+        response = client.post(url, json={'message': 'I have a fever'})
+        assert response.status_code == 429
+        assert response.headers['Retry-After']
+    assert client.post('/api/upload', data={}).status_code == 429
+
+    # An upload job is admitted (and turned away here only for having no file)
+    assert client.post('/api/upload', data={'async': 'true'}).status_code == 400
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Response Cache Tests
+Checks which phrasings of a query share a cache key
+"""
+
+import pytest
+
+from response_cache import ResponseCache
+
+
+def key(message):
+    return ResponseCache.make_key('text', 'en', message)
+
+
+@pytest.mark.parametrize('first, second', [
+    ("do I need a doctor", "I need a doctor"),
+    ("I have chest pain", "I had chest pain"),
+    ("I was dizzy", "I am dizzy"),
+    ("my child has been coughing", "my child has coughing"),
+    ("I got a rash", "I have a rash"),
+])
+def test_meaningful_words_change_the_key(first, second):
+    assert key(first) != key(second)
+
+
+def test_fillers_case_and_punctuation_share_a_key():
+    assert key("Hi, I have a fever, please help!") == key("i have fever help")
+    assert key("I just   really have THE fever") == key("I have fever")
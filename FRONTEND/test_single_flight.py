@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Single-Flight Tests
+Checks that concurrent identical calls share one call, its result and its errors
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, FlightTimeout
+
+
+def run_concurrently(count, target):
+    results, threads = [None] * count, []
+    for index in range(count):
+        def run(index=index):
+            try:
+                results[index] = target()
+            except Exception as e:
+                results[index] = e
+        threads.append(threading.Thread(target=run))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_result_and_error():
+    flight = SingleFlight(timeout=5)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"text": "shared"}
+
+    results = run_concurrently(8, lambda: flight.do("key", slow))
+    assert len(calls) == 1
+    assert all(result == {"text": "shared"} for result in results)
+    assert flight.stats()['coalesced'] == 7
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("provider down")
+
+    results = run_concurrently(4, lambda: flight.do("key", failing))
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()['in_flight'] == 0
+
+    # Finished calls aren't cached
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_follower_times_out_while_leader_finishes():
+    flight = SingleFlight(timeout=0.05)
+    leader = threading.Thread(target=lambda: flight.do("key", lambda: time.sleep(0.3)))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(FlightTimeout):
+        flight.do("key", lambda: "not called")
+    leader.join()
+    assert flight.stats()['follower_timeouts'] == 1
+
+
+def test_async_calls_share_one_task():
+    flight = SingleFlight(timeout=5)
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "shared"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", slow))
+        await asyncio.sleep(0)
+        followers = [flight.do_async("key", slow) for _ in range(3)]
+        # Cancelling the leader's request doesn't cancel the shared call
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["shared"] * 3
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+AarogyaLink Upload Ingestion Tests
+Checks that an upload's size and hash come from the bytes received, whatever
+Content-Length the client sent, for files held in memory or spooled to disk
+"""
+
+import hashlib
+import io
+import tempfile
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage, Headers
+
+from upload_ingest import UploadBuffer
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 56
+
+
+def test_size_ignores_the_client_content_length(backend):
+    data = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(data, 'PNG')
+    png = data.getvalue()
+
+    # A claimed length over the limit neither rejects the file nor becomes its size
+    file = FileStorage(stream=io.BytesIO(png), filename='rash.png', content_type='image/png',
+                       headers=Headers([('Content-Length', str(64 * 1024 * 1024))]))
+    upload, error = backend.prepare_upload(file, 'auto')
+    assert error is None
+    assert upload['size'] == len(png)
+    assert upload['content_hash'] == hashlib.sha256(png).hexdigest()
+    backend.release_upload(upload)
+
+
+def test_spooled_to_disk():
+    spooled = tempfile.SpooledTemporaryFile(max_size=16)
+    spooled.write(PNG)
+    spooled.rollover()
+
+    buffer = UploadBuffer(spooled)
+    assert buffer.size == len(PNG) and bytes(buffer.view) == PNG
+    assert (buffer.file_type, buffer.mime_type) == ('image', 'image/png')
+    buffer.release()
+    spooled.close()
@@ -0,0 +1,150 @@
+"""
+AarogyaLink Upload Ingestion
+Single-pass access to uploaded file bodies without copying them around
+"""
+
+import hashlib
+import io
+import mmap
+import os
+
+# (offset, signature, file type, mime type) checked against the first bytes of a file
+SIGNATURES = [
+    (0, b'\x89PNG\r\n\x1a\n', 'image', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image', 'image/jpeg'),
+    (0, b'GIF87a', 'image', 'image/gif'),
+    (0, b'GIF89a', 'image', 'image/gif'),
+    (0, b'BM', 'image', 'image/bmp'),
+    (0, b'II*\x00', 'image', 'image/tiff'),
+    (0, b'MM\x00*', 'image', 'image/tiff'),
+    (0, b'ID3', 'audio', 'audio/mpeg'),
+    (0, b'OggS', 'audio', 'audio/ogg'),
+    (0, b'fLaC', 'audio', 'audio/flac'),
+    (0, b'\x1aE\xdf\xa3', 'audio', 'audio/webm'),
+    (4, b'ftyp', 'audio', 'audio/mp4'),
+]
+
+SNIFF_BYTES = 16
+
+
+def sniff_file_type(header):
+    """Determine (file type, mime type) from the first bytes of a file
+
+    Returns ``('unknown', None)`` when the signature isn't recognized.
+    """
+    header = bytes(header[:SNIFF_BYTES])
+
+    # RIFF containers carry the format at offset 8
+    if header.startswith(b'RIFF'):
+        if header[8:12] == b'WEBP':
+            return 'image', 'image/webp'
+        if header[8:12] == b'WAVE':
+            return 'audio', 'audio/wav'
+
+    for offset, signature, file_type, mime_type in SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return file_type, mime_type
+
+    # MPEG audio frame sync (MP3 without ID3 tag, ADTS AAC)
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        return 'audio', 'audio/aac' if header[1] & 0x06 == 0 else 'audio/mpeg'
+
+    return 'unknown', None
+
+
+class UploadBuffer:
+    """Read-only, zero-copy view of an uploaded file's bytes
+
+    Werkzeug spools multipart files into a ``SpooledTemporaryFile``: small files stay
+    in a BytesIO, larger ones roll over to a temporary file on disk. The buffer
+    exposes the in-memory bytes directly or memory-maps the temporary file, so the
+    body is never read into a second Python bytes object. ``size`` is the number of
+    bytes actually received, never a client-sent Content-Length. Call ``release()``
+    before the request ends so Werkzeug can close the underlying file.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._mmap = None
+        self.view = self._map(stream)
+        self.size = len(self.view)
+        self.file_type, self.mime_type = sniff_file_type(self.view[:SNIFF_BYTES])
+        self.content_hash = hashlib.sha256(self.view).hexdigest()
+
+    def _map(self, stream):
+        # SpooledTemporaryFile keeps the real file object in _file
+        raw = getattr(stream, '_file', stream)
+
+        if isinstance(raw, io.BytesIO):
+            return raw.getbuffer().toreadonly()
+
+        try:
+            raw.flush()
+            fileno = raw.fileno()
+            if os.fstat(fileno).st_size == 0:
+                return memoryview(b'')
+            self._mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            return memoryview(self._mmap)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            stream.seek(0)
+            return memoryview(stream.read()).toreadonly()
+
+    def open(self):
+        """Get a file object positioned at the start of the upload, for readers like PIL"""
+        if self._stream is None:
+            return io.BufferedReader(MemoryReader(self.view))
+        self._stream.seek(0)
+        return self._stream
+
+    def detach(self):
+        """Get a copy of the buffer that owns its bytes, so it can outlive the request"""
+        detached = object.__new__(UploadBuffer)
+        detached.__dict__.update(self.__dict__)
+        detached._stream = None
+        detached._mmap = None
+        detached.view = memoryview(bytes(self.view))
+        return detached
+
+    def release(self):
+        """Release the view and any memory map over the upload"""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+class MemoryReader(io.RawIOBase):
+    """Seekable file object over a memoryview, so readers like PIL need no BytesIO copy"""
+
+    def __init__(self, view):
+        self._view = memoryview(view).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()